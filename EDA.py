@@ -14,12 +14,22 @@ from scipy.stats import chi2_contingency
 import warnings
 warnings.filterwarnings('ignore')
 
+from stage_cache import StageCache, frame_fingerprint
+from delay_cube import DelayCube, CAUSES
+from flight_query import FlightQuery, refresh_store
+from codeshare_dedup import CodeshareIndex, KEY_COLS as CODESHARE_KEY
+
 # Configuración de visualización
 plt.style.use('default')
 sns.set_palette("husl")
 pd.set_option('display.max_columns', None)
 pd.set_option('display.width', None)
 
+# Caché de etapas costosas (llave: huella del CSV + código de la etapa + parámetros)
+CACHE = StageCache('cache', max_bytes=2 * 1024**3)
+
+DEDUP_CODESHARES = True    # una fila por vuelo físico (colapsa códigos compartidos, DUP)
+
 print("="*80)
 print("ANÁLISIS EXPLORATORIO DE DATOS - DESEMPEÑO DE VUELOS")
 print("="*80)
@@ -41,6 +51,16 @@ print(df.dtypes)
 print(f"\n📈 Estadísticas descriptivas:")
 print(df.describe())
 
+# Códigos compartidos: el mismo vuelo físico aparece una vez por código comercial
+if DEDUP_CODESHARES and all(c in df.columns for c in CODESHARE_KEY):
+    codeshares = CodeshareIndex().fit(df)
+    cs = codeshares.summary()
+    print(f"\n✈️  Códigos compartidos: {int(cs['filas']):,} filas → {int(cs['vuelos_fisicos']):,} vuelos físicos "
+          f"(−{cs['reduccion_pct']:.1f}%, {int(cs['con_codigo_compartido']):,} con más de un código)")
+    df = codeshares.collapse(df).reset_index(drop=True)
+# Columnas de la fuente deduplicada (las FLAG_* se agregan después): base del almacén Parquet
+source_cols = list(df.columns)
+
 # ============================================================================
 # 2. ANÁLISIS DE VALORES NULOS
 # ============================================================================
@@ -92,27 +112,29 @@ numeric_cols = ['DEP_DELAY', 'ARR_DELAY', 'TAXI_OUT', 'TAXI_IN',
                 'AIR_TIME', 'DISTANCE', 'ACTUAL_ELAPSED_TIME']
 numeric_cols = [col for col in numeric_cols if col in df.columns]
 
-outliers_summary = []
-for col in numeric_cols:
-    data = df[col].dropna()
-    if len(data) > 0:
-        Q1 = data.quantile(0.25)
-        Q3 = data.quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        outliers = ((data < lower_bound) | (data > upper_bound)).sum()
-        outliers_summary.append({
-            'Variable': col,
-            'Outliers': outliers,
-            '% Outliers': round(outliers / len(data) * 100, 2),
-            'Q1': Q1,
-            'Q3': Q3,
-            'Min': data.min(),
-            'Max': data.max()
-        })
-
-outliers_df = pd.DataFrame(outliers_summary).sort_values('% Outliers', ascending=False)
+def outliers_iqr():
+    outliers_summary = []
+    for col in numeric_cols:
+        data = df[col].dropna()
+        if len(data) > 0:
+            Q1 = data.quantile(0.25)
+            Q3 = data.quantile(0.75)
+            IQR = Q3 - Q1
+            lower_bound = Q1 - 1.5 * IQR
+            upper_bound = Q3 + 1.5 * IQR
+            outliers = ((data < lower_bound) | (data > upper_bound)).sum()
+            outliers_summary.append({
+                'Variable': col,
+                'Outliers': outliers,
+                '% Outliers': round(outliers / len(data) * 100, 2),
+                'Q1': Q1,
+                'Q3': Q3,
+                'Min': data.min(),
+                'Max': data.max()
+            })
+    return pd.DataFrame(outliers_summary).sort_values('% Outliers', ascending=False)
+
+outliers_df = CACHE.get_or_compute('eda_outliers_iqr', outliers_iqr, frames=[df[numeric_cols]])
 print("\n📊 Resumen de Outliers (método IQR):")
 print(outliers_df.to_string(index=False))
 
@@ -278,6 +300,27 @@ print("   • FLAG_CONTROLLABLE_DELAY: Retrasos atribuibles a la aerolínea (mej
 print("   • FLAG_OPERATIONAL_ISSUE: Cancelaciones/desvíos afectan confiabilidad de marca")
 print("   • FLAG_FAST_FLIGHT: Oportunidad para comunicar eficiencia operacional")
 
+# Cubo de minutos de retraso por causa × aerolínea × aeropuerto × mes × hora
+cube_cols = ['MKT_UNIQUE_CARRIER', 'ORIGIN', 'FL_DATE', 'CRS_DEP_TIME']
+if all(col in df.columns for col in cube_cols) and any(col in df.columns for col in CAUSES.values()):
+    cube = DelayCube.from_dict(CACHE.get_or_compute(
+        'eda_delay_cube', lambda: DelayCube.from_frame(df).to_dict(),
+        frames=[df[DelayCube.input_columns(df)]]))
+    print(f"\n📊 Cubo de retrasos por causa: {cube.minutes.shape} "
+          f"({cube.nbytes() / 1024**2:.1f} MB)")
+    print("\n   Participación de cada causa en los minutos de retraso (%):")
+    print(cube.share().round(1).to_string())
+    print("\n   Participación por aerolínea (%):")
+    print(cube.share(by='carrier').dropna().round(1).to_string())
+    busiest = cube.rollup(by='airport')['FLIGHTS'].idxmax()
+    evening = cube.share(airport=busiest, hour=range(17, 22))
+    print(f"\n   Ejemplo de consulta — {busiest}, salidas 17-21 h (%):")
+    print(evening.round(1).to_string())
+
+    print("\n💡 HALLAZGOS - CAUSAS DE RETRASO:")
+    print("   • LATE_AIRCRAFT/CARRIER son controlables por la aerolínea; NAS/WEATHER no")
+    print("   • El cubo responde cortes por aeropuerto/mes/hora sin reagrupar el frame")
+
 # ============================================================================
 # 7. ANÁLISIS DE TIMELINE Y FACETAS DE VUELO
 # ============================================================================
@@ -354,6 +397,30 @@ print("   • TAXI_OUT/IN son oportunidades de optimización aeroportuaria")
 print("   • Recuperación de tiempo: pilotos compensan retrasos acelerando en aire")
 print("   • Vuelos que salen tarde suelen llegar con menor retraso (eficiencia operativa)")
 
+# Consultas ad-hoc sobre el almacén Parquet particionado (YEAR/MONTH/aerolínea):
+# preguntas nuevas sin editar este script ni recargar el CSV completo
+STORE_PATH = 'store'
+STORE_COLS = ['FL_DATE', 'ORIGIN', 'MKT_UNIQUE_CARRIER', 'CRS_DEP_TIME', 'DEP_DELAY']
+if all(c in df.columns for c in STORE_COLS):
+    # Mismo frame deduplicado que el resto del análisis; se reconstruye solo si cambia su contenido
+    flights = df[source_cols]
+    if refresh_store(flights, STORE_PATH, frame_fingerprint(flights)):
+        print(f"\n💾 Almacén Parquet reconstruido en {STORE_PATH}/ ({len(flights):,} vuelos)")
+    top_airport = df['ORIGIN'].value_counts().idxmax()
+    top_carrier = df['MKT_UNIQUE_CARRIER'].value_counts().idxmax()
+    query = (FlightQuery(STORE_PATH)
+             .filter(ORIGIN=top_airport, MKT_UNIQUE_CARRIER=top_carrier, IS_WEEKEND=1)
+             .groupby('DEP_HOUR')
+             .agg(vuelos=('DEP_DELAY', 'count'), retraso_medio=('DEP_DELAY', 'mean'),
+                  pct_dep_15=('DEP_DELAY_15', 'mean')))
+    print(f"\n🔎 Consulta al almacén — {top_carrier} en {top_airport}, fines de semana, por hora:")
+    print(query.explain())
+    print(query.collect().round(2).to_string())
+    print(f"   (desde la terminal: python flight_query.py query {STORE_PATH} --where ORIGIN={top_airport} "
+          f"--where MKT_UNIQUE_CARRIER={top_carrier} --where IS_WEEKEND=1 --by DEP_HOUR)")
+else:
+    print(f"\n⚠️  Sin columnas {STORE_COLS}: se omite el almacén Parquet")
+
 # ============================================================================
 # 8. VARIABLES OBJETIVO PARA MODELACIÓN SUPERVISADA
 # ============================================================================
@@ -439,8 +506,11 @@ for target in binary_targets:
         print(f"   Test Chi² (asociación con variables categóricas):")
         for cat_var in ['MKT_UNIQUE_CARRIER', 'ORIGIN', 'DEST'][:2]:  # Limitar para brevedad
             if cat_var in df.columns:
-                contingency = pd.crosstab(df[cat_var], df[target])
-                chi2, p_value, _, _ = chi2_contingency(contingency)
+                def chi2_test():
+                    chi2_, p_, _, _ = chi2_contingency(pd.crosstab(df[cat_var], df[target]))
+                    return {'chi2': chi2_, 'p': p_}
+                res = CACHE.get_or_compute('eda_chi2', chi2_test, frames=[df[[cat_var, target]]])
+                chi2, p_value = float(res['chi2']), float(res['p'])
                 sig = "***" if p_value < 0.001 else "**" if p_value < 0.01 else "*" if p_value < 0.05 else "ns"
                 print(f"      {cat_var}: χ²={chi2:.1f}, p={p_value:.4f} {sig}")
         
@@ -504,7 +574,8 @@ if len(regression_targets) > 0 and len(predictors) > 0:
     analysis_cols = regression_targets + predictors
     analysis_cols = [col for col in analysis_cols if col in df.columns]
     
-    corr_matrix = df[analysis_cols].corr()
+    corr_matrix = CACHE.get_or_compute('eda_corr_targets', lambda: df[analysis_cols].corr(),
+                                       frames=[df[analysis_cols]])
     
     # Mostrar solo correlaciones de targets con predictores
     for target in regression_targets:
@@ -519,7 +590,8 @@ if 'ARR_DELAY' in df.columns and len(predictors) > 0:
     analysis_vars = ['ARR_DELAY'] + predictors[:6]
     analysis_vars = [col for col in analysis_vars if col in df.columns]
     
-    corr_matrix = df[analysis_vars].corr()
+    corr_matrix = CACHE.get_or_compute('eda_corr_heatmap', lambda: df[analysis_vars].corr(),
+                                       frames=[df[analysis_vars]])
     
     fig, ax = plt.subplots(figsize=(10, 8))
     sns.heatmap(corr_matrix, annot=True, fmt='.2f', cmap='coolwarm', center=0,
@@ -0,0 +1,159 @@
+"""
+================================================================================
+RED DE AEROPUERTOS - PROPAGACIÓN DE RETRASOS (SECCIÓN 6.2)
+================================================================================
+Propósito:
+    Calcular las features de flujo inbound propuestas en la sección 6.2
+    (ORIGIN_INBOUND_AVG_DELAY_1H, ORIGIN_INBOUND_PCT_LATE_1H) y su extensión
+    a k saltos: el retraso que viene "río arriba" de los aeropuertos que
+    alimentan al origen.
+
+Modelo:
+    • El tiempo se divide en franjas de una hora UTC (índice absoluto h):
+      salida y llegada de un vuelo entre zonas horarias quedan en la misma
+      escala (schedule_minutes → airport_timezones.py).
+    • Cada vuelo operado es una arista origen → destino que sale en la franja
+      hd (salida real) y llega en la franja ha (llegada real).
+    • x[h, a]  = retraso promedio de llegada de los vuelos que aterrizaron en
+                 el aeropuerto a durante la franja h (presión inbound).
+    • F        = matriz dispersa (H·n × H·n) que, para cada (ha, destino),
+                 promedia sobre sus vuelos inbound el estado (hd, origen) del
+                 que salieron. Respeta el tiempo (hd ≤ ha).
+    • Retraso a k saltos:  u1 = x,  u_k = F · u_{k-1}
+      Es decir, el retraso inbound que tenían los aeropuertos de origen de
+      los vuelos que ahora llegan, k-1 eslabones atrás.
+    • Centralidad de hub: PageRank sobre el grafo agregado de flujos
+      (iteración de potencia con matrices dispersas).
+
+    Todo el periodo se procesa con unas pocas multiplicaciones
+    matriz-vector dispersas, sin loops por aeropuerto ni por hora.
+
+Uso:
+    net = AirportNetwork(df, k_hops=3)
+    df = df.join(net.features(df))
+    net.centrality()                      # tabla por aeropuerto
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from incremental import schedule_minutes
+
+LATE_THRESHOLD = 15
+PAGERANK_DAMPING = 0.85
+
+
+class AirportNetwork:
+    """Grafo dirigido de aeropuertos rebanado por hora."""
+
+    def __init__(self, df, k_hops=3, dep_col='_DEP_MIN', arr_col='_ARR_MIN',
+                 origin_col='ORIGIN', dest_col='DEST'):
+        self.k_hops = k_hops
+        self.dep_col, self.arr_col = dep_col, arr_col
+        self.origin_col, self.dest_col = origin_col, dest_col
+
+        codes, self.airports = pd.factorize(pd.concat([df[origin_col], df[dest_col]],
+                                                      ignore_index=True))
+        self.n = len(self.airports)
+        o, d = codes[:len(df)], codes[len(df):]
+
+        dep_min, arr_min = self._times(df)
+        dep_delay = df['DEP_DELAY'].to_numpy(dtype=np.float64)
+        arr_delay = df['ARR_DELAY'].to_numpy(dtype=np.float64)
+        ok = ~np.isnan(arr_delay) & ~np.isnan(dep_delay) & (o >= 0) & (d >= 0)
+
+        hd = np.floor((dep_min[ok] + dep_delay[ok]) / 60).astype(np.int64)
+        ha = np.floor((arr_min[ok] + arr_delay[ok]) / 60).astype(np.int64)
+        self.h0 = int(min(hd.min(), ha.min())) if ok.any() else 0
+        self.n_hours = int(max(hd.max(), ha.max())) - self.h0 + 2 if ok.any() else 1
+        hd -= self.h0
+        ha -= self.h0
+
+        # Agregados inbound por (franja, aeropuerto)
+        size = self.n_hours * self.n
+        row = ha * self.n + d[ok]
+        self.count = np.bincount(row, minlength=size).astype(np.float64)
+        self.delay_sum = np.bincount(row, weights=arr_delay[ok], minlength=size)
+        self.late = np.bincount(row, weights=arr_delay[ok] > LATE_THRESHOLD, minlength=size)
+        self.x = _ratio(self.delay_sum, self.count)
+
+        # Matriz de flujo respetando el tiempo, normalizada por fila
+        col = hd * self.n + o[ok]
+        w = 1.0 / self.count[row]
+        self.flow = sparse.csr_matrix((w, (row, col)), shape=(size, size))
+
+        # Grafo agregado (todas las horas) para centralidad
+        self.adjacency = sparse.csr_matrix(
+            (np.ones(ok.sum()), (o[ok], d[ok])), shape=(self.n, self.n))
+
+    def _times(self, df):
+        if self.dep_col in df.columns and self.arr_col in df.columns:
+            return (df[self.dep_col].to_numpy(dtype=np.float64),
+                    df[self.arr_col].to_numpy(dtype=np.float64))
+        dep, arr = schedule_minutes(df)
+        return dep.astype(np.float64), arr.astype(np.float64)
+
+    # ── Propagación ─────────────────────────────────────────────────────────
+    def upstream(self):
+        """Lista [u1, ..., uk] de retraso a k saltos, cada una (H·n,)."""
+        out = [self.x]
+        for _ in range(1, self.k_hops):
+            out.append(self.flow @ out[-1])
+        return out
+
+    def centrality(self):
+        """Tabla por aeropuerto: grado de entrada/salida, vuelos y PageRank."""
+        a = self.adjacency
+        out_w = np.asarray(a.sum(axis=1)).ravel()
+        # Matriz de transición (fila = origen) y PageRank por potencia
+        p = sparse.diags(_ratio(np.ones(self.n), out_w)) @ a
+        rank = np.full(self.n, 1.0 / self.n)
+        dangling = out_w == 0
+        for _ in range(100):
+            new = (PAGERANK_DAMPING * (p.T @ rank + rank[dangling].sum() / self.n)
+                   + (1 - PAGERANK_DAMPING) / self.n)
+            if np.abs(new - rank).sum() < 1e-10:
+                rank = new
+                break
+            rank = new
+        return pd.DataFrame({
+            'n_destinos': np.diff(a.indptr),
+            'n_origenes': np.diff(a.tocsc().indptr),
+            'vuelos_salida': out_w,
+            'vuelos_llegada': np.asarray(a.sum(axis=0)).ravel(),
+            'pagerank': rank,
+        }, index=pd.Index(self.airports, name='AIRPORT')).sort_values('pagerank', ascending=False)
+
+    # ── Features por vuelo ──────────────────────────────────────────────────
+    def features(self, df):
+        """Features de flujo inbound en ORIGIN durante la hora previa a la salida.
+
+        Usa la franja anterior a CRS_DEP (información ya observada al salir).
+        """
+        dep_min, _ = self._times(df)
+        a = self.airports.get_indexer(df[self.origin_col])
+        h = np.floor(dep_min / 60).astype(np.int64) - 1 - self.h0
+        ok = (a >= 0) & (h >= 0) & (h < self.n_hours)
+        idx = np.where(ok, h * self.n + np.where(a >= 0, a, 0), 0)
+
+        def take(values):
+            return np.where(ok, values[idx], np.nan)
+
+        out = pd.DataFrame(index=df.index)
+        out['ORIGIN_INBOUND_COUNT_1H'] = take(self.count)
+        out['ORIGIN_INBOUND_AVG_DELAY_1H'] = take(np.where(self.count > 0, self.x, np.nan))
+        out['ORIGIN_INBOUND_PCT_LATE_1H'] = take(np.where(self.count > 0,
+                                                          _ratio(self.late, self.count) * 100, np.nan))
+        for k, u in enumerate(self.upstream()[1:], start=2):
+            out[f'ORIGIN_UPSTREAM_DELAY_{k}HOP'] = take(u)
+
+        rank = self.centrality()['pagerank']
+        out['ORIGIN_HUB_PAGERANK'] = df[self.origin_col].map(rank).to_numpy(dtype=np.float64)
+        out['DEST_HUB_PAGERANK'] = df[self.dest_col].map(rank).to_numpy(dtype=np.float64)
+        return out
+
+
+def _ratio(num, den):
+    return np.divide(num, den, out=np.zeros(len(num)), where=den > 0)
@@ -0,0 +1,153 @@
+"""
+================================================================================
+HORA LOCAL → UTC POR AEROPUERTO - TABLA DE ZONAS HORARIAS SIN CONEXIÓN
+================================================================================
+Propósito:
+    Todos los tiempos de BTS (CRS_DEP_TIME, ARR_TIME, WHEELS_OFF, ...) están
+    en hora local hhmm del aeropuerto correspondiente. Cualquier ventana que
+    cruce aeropuertos (flujo inbound hacia ORIGIN, rotación de matrículas
+    entre zonas horarias, propagación en la red) queda desfasada 1-6 h si se
+    compara en hora local. Aquí cada tiempo se lleva a minutos UTC desde la
+    época, con horario de verano (DST) según la zona IANA del aeropuerto.
+
+Tabla (data/airport_timezones.csv, incluida en el repositorio):
+    AIRPORT_ID (ID del DOT, puede faltar), AIRPORT (código IATA), TZ (IANA).
+    Resolución por fila: AIRPORT_ID → código IATA → estado de
+    {lado}_CITY_NAME ('Dallas/Fort Worth, TX') con la zona predominante del
+    estado. Los aeropuertos de estados con varias zonas (panhandle de
+    Florida, El Paso, oeste de Dakota, ...) están listados explícitamente.
+
+Funcionamiento:
+    • El desfase se calcula una vez por (zona, fecha, antes/después de las
+      02:00) —el cambio de DST en EE. UU. ocurre a las 02:00 locales— con
+      zoneinfo vía pandas, y se reparte a las filas con un índice inverso.
+    • Llegada programada: FL_DATE + CRS_ARR_TIME en la zona de DEST,
+      llevada al primer instante ≥ la salida UTC (módulo 1 día): resuelve
+      vuelos nocturnos y cruces de zona sin depender del orden hhmm local.
+    • Tiempos reales: salida/llegada UTC programadas + DEP_DELAY/ARR_DELAY.
+
+Uso:
+    dep_utc, arr_utc = utc_schedule_minutes(df)     # NaN en filas con aeropuerto sin zona
+    tz = airport_timezones(df, 'DEST')
+    wheels_off = local_to_utc(df['FL_DATE'], df['WHEELS_OFF'], airport_timezones(df))
+================================================================================
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+TZ_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'airport_timezones.csv')
+DST_SWITCH_MIN = 120            # 02:00 local
+_AFTER_SWITCH_MIN = 240         # instante de referencia "después" (04:00 local)
+
+# Zona predominante por estado/territorio (respaldo para aeropuertos no listados)
+STATE_TZ = {
+    **dict.fromkeys(['CT', 'DC', 'DE', 'FL', 'GA', 'IN', 'KY', 'MA', 'MD', 'ME', 'MI', 'NC', 'NH',
+                     'NJ', 'NY', 'OH', 'PA', 'RI', 'SC', 'VA', 'VT', 'WV'], 'America/New_York'),
+    **dict.fromkeys(['AL', 'AR', 'IA', 'IL', 'KS', 'LA', 'MN', 'MO', 'MS', 'ND', 'NE', 'OK', 'SD',
+                     'TN', 'TX', 'WI'], 'America/Chicago'),
+    **dict.fromkeys(['CO', 'ID', 'MT', 'NM', 'UT', 'WY'], 'America/Denver'),
+    **dict.fromkeys(['CA', 'NV', 'OR', 'WA'], 'America/Los_Angeles'),
+    'AZ': 'America/Phoenix', 'AK': 'America/Anchorage', 'HI': 'Pacific/Honolulu',
+    'PR': 'America/Puerto_Rico', 'VI': 'America/St_Thomas', 'TT': 'Pacific/Saipan',
+    'GU': 'Pacific/Guam', 'AS': 'Pacific/Pago_Pago',
+}
+
+
+def load_table(path=TZ_PATH):
+    """Tabla AIRPORT_ID / AIRPORT / TZ."""
+    table = pd.read_csv(path, dtype={'AIRPORT': str, 'TZ': str})
+    table['AIRPORT_ID'] = table['AIRPORT_ID'].astype('Int64')
+    return table
+
+
+def airport_timezones(df, side='ORIGIN', table=None):
+    """Zona IANA por fila para el aeropuerto `side` ('ORIGIN' o 'DEST'); NaN si no se resuelve."""
+    table = load_table() if table is None else table
+    code_col, id_col = side, f'{side}_AIRPORT_ID'
+    city_col, state_col = f'{side}_CITY_NAME', f'{side}_STATE_ABR'
+    # Una resolución por aeropuerto distinto, luego se reparte a las filas
+    cols = [c for c in (id_col, code_col, state_col, city_col) if c in df.columns]
+    if not cols:
+        return pd.Series(np.nan, index=df.index, dtype=object, name=f'{side}_TZ')
+    group = df.groupby(cols, sort=False, dropna=False).ngroup().to_numpy()
+    _, first = np.unique(group, return_index=True)
+    airports = df[cols].iloc[first].reset_index(drop=True)
+    tz = pd.Series(np.nan, index=airports.index, dtype=object)
+    if id_col in airports:
+        by_id = table.dropna(subset=['AIRPORT_ID']).set_index('AIRPORT_ID')['TZ']
+        tz = tz.fillna(pd.to_numeric(airports[id_col], errors='coerce').map(by_id))
+    if code_col in airports:
+        tz = tz.fillna(airports[code_col].map(table.set_index('AIRPORT')['TZ']))
+    if state_col in airports:
+        tz = tz.fillna(airports[state_col].map(STATE_TZ))
+    if city_col in airports:
+        tz = tz.fillna(airports[city_col].astype(str).str.rsplit(', ', n=1).str[-1].str[:2].map(STATE_TZ))
+    return pd.Series(tz.to_numpy()[group], index=df.index, name=f'{side}_TZ')
+
+
+def utc_offsets(tz, day, minute):
+    """Desfase local − UTC en minutos por fila.
+
+    `tz`: zona por fila; `day`: días desde la época (fecha local); `minute`:
+    minutos locales desde medianoche. Un cálculo por (zona, día, antes/después
+    del cambio de DST).
+    """
+    codes, zones = pd.factorize(np.asarray(tz, dtype=object))
+    day = np.asarray(day, dtype=np.int64)
+    after = (np.asarray(minute, dtype=np.float64) >= DST_SWITCH_MIN).astype(np.int64)
+    d0 = day.min() if len(day) else 0
+    n_days = int(day.max() - d0 + 1) if len(day) else 1
+    key = (np.maximum(codes, 0).astype(np.int64) * n_days + (day - d0)) * 2 + after
+    keys, inverse = np.unique(key, return_inverse=True)
+
+    zone_of = keys // (2 * n_days)
+    local = ((keys // 2) % n_days + d0) * 1440 + np.where(keys % 2, _AFTER_SWITCH_MIN, 0)
+    offsets = np.full(len(keys), np.nan)
+    for z, zone in enumerate(zones):
+        sel = zone_of == z
+        naive = pd.DatetimeIndex(local[sel].astype('datetime64[m]'))
+        utc = (naive.tz_localize(zone, ambiguous='NaT', nonexistent='shift_forward')
+               .tz_convert('UTC').tz_localize(None))
+        offsets[sel] = (naive - utc).total_seconds().to_numpy() / 60
+    return np.where(codes >= 0, offsets[inverse], np.nan)
+
+
+def _hhmm(values):
+    hhmm = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+    return (hhmm // 100) * 60 + hhmm % 100
+
+
+def _days(dates):
+    return (pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[D]').astype(np.int64))
+
+
+def local_to_utc(dates, hhmm, tz):
+    """Fecha local + hhmm local en la zona `tz` → minutos UTC desde la época (float, NaN si falta)."""
+    day, minute = _days(dates), _hhmm(hhmm)
+    return day * 1440 + minute - utc_offsets(tz, day, np.nan_to_num(minute))
+
+
+def utc_schedule_minutes(df, table=None):
+    """(salida, llegada) programadas en minutos UTC; NaN solo en filas cuyo aeropuerto no tiene zona.
+
+    La salida es NaN si ORIGIN no tiene zona; la llegada, si falta cualquiera
+    de las dos. missing_timezones() dice cuáles faltan.
+    """
+    origin_tz = airport_timezones(df, 'ORIGIN', table)
+    dest_tz = airport_timezones(df, 'DEST', table)
+    dep = local_to_utc(df['FL_DATE'], df['CRS_DEP_TIME'], origin_tz)
+    arr_raw = local_to_utc(df['FL_DATE'], df['CRS_ARR_TIME'], dest_tz)
+    arr = dep + np.mod(arr_raw - dep, 1440)
+    return dep, arr
+
+
+def missing_timezones(df, table=None):
+    """Aeropuertos sin zona resuelta (para completar data/airport_timezones.csv)."""
+    out = []
+    for side in ('ORIGIN', 'DEST'):
+        tz = airport_timezones(df, side, table)
+        out.extend(pd.unique(df.loc[tz.isna(), side]))
+    return sorted(set(out))
@@ -0,0 +1,164 @@
+"""
+================================================================================
+KNN CON ÍNDICE PRECONSTRUIDO - UN ÁRBOL POR FOLD, TODAS LAS COMBINACIONES
+================================================================================
+Propósito:
+    En model.ipynb, KNeighborsClassifier entra a RandomizedSearchCV con una
+    rejilla 4×2×2 (n_neighbors × weights × metric). Cada combinación vuelve a
+    hacer la búsqueda de vecinos desde cero, O(n_train × n_test) por fold.
+    Pero n_neighbors y weights solo cambian cómo se combinan los vecinos, no
+    quiénes son. Aquí:
+        • Por fold y por métrica se escala (y opcionalmente se reduce con PCA)
+          el train una vez y se construye un KDTree.
+        • Se consulta una sola vez con k_max = max(n_neighbors).
+        • Cada (n_neighbors, weights) se evalúa tomando las primeras k
+          columnas de esa consulta: sin volver a tocar el índice.
+
+Uso:
+    search = TreeKNNSearch(param_grids['KNeighborsClassifier'], cv=5).fit(X_train, y_train)
+    search.best_params_, search.best_score_, search.best_estimator_
+    TreeKNNClassifier(n_neighbors=7, weights='distance').fit(X, y)   # modelo final
+================================================================================
+"""
+
+import itertools
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.decomposition import PCA
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.neighbors import BallTree, KDTree
+
+_TREES = {'kd_tree': KDTree, 'ball_tree': BallTree}
+
+
+class _Space:
+    """Imputación por mediana + estandarización (+ PCA) ajustadas en train."""
+
+    def __init__(self, n_components=None, random_state=42):
+        self.n_components = n_components
+        self.random_state = random_state
+
+    def fit_transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        self.median_ = np.nanmedian(X, axis=0)
+        self.median_ = np.where(np.isnan(self.median_), 0.0, self.median_)
+        X = np.where(np.isnan(X), self.median_, X)
+        self.mean_ = X.mean(axis=0)
+        self.scale_ = X.std(axis=0)
+        self.scale_[self.scale_ == 0] = 1.0
+        Z = (X - self.mean_) / self.scale_
+        self.pca_ = None
+        if self.n_components is not None and self.n_components < Z.shape[1]:
+            self.pca_ = PCA(n_components=self.n_components, random_state=self.random_state)
+            Z = self.pca_.fit_transform(Z)
+        return Z
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        Z = (np.where(np.isnan(X), self.median_, X) - self.mean_) / self.scale_
+        return self.pca_.transform(Z) if self.pca_ is not None else Z
+
+
+def _vote(y_neighbors, dist, weights):
+    """P(clase 1) desde vecinos ya ordenados (misma regla que sklearn)."""
+    if weights == 'uniform':
+        return y_neighbors.mean(axis=1)
+    with np.errstate(divide='ignore'):
+        w = 1.0 / dist
+    exact = np.isinf(w)
+    rows = exact.any(axis=1)
+    w[rows] = exact[rows]                  # coincidencia exacta: solo esos vecinos
+    return (w * y_neighbors).sum(axis=1) / w.sum(axis=1)
+
+
+class TreeKNNClassifier(ClassifierMixin, BaseEstimator):
+    """KNN binario servido por un KDTree/BallTree sobre features escaladas."""
+
+    def __init__(self, n_neighbors=5, weights='uniform', metric='euclidean',
+                 n_components=None, algorithm='kd_tree', leaf_size=40):
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.metric = metric
+        self.n_components = n_components
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        self.classes_ = np.unique(y)
+        self.y_ = (y == self.classes_[-1]).astype(np.float64)
+        self.space_ = _Space(self.n_components)
+        self.tree_ = _TREES[self.algorithm](self.space_.fit_transform(X), metric=self.metric,
+                                            leaf_size=self.leaf_size)
+        return self
+
+    def kneighbors(self, X, k=None):
+        return self.tree_.query(self.space_.transform(X), k=k or self.n_neighbors)
+
+    def predict_proba(self, X):
+        dist, idx = self.kneighbors(X)
+        p = _vote(self.y_[idx], dist, self.weights)
+        return np.column_stack([1 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.predict_proba(X)[:, 1] > 0.5).astype(int)]
+
+
+class TreeKNNSearch:
+    """Búsqueda exhaustiva de la rejilla KNN con un índice por fold y métrica.
+
+    Expone best_params_, best_score_ (AUC medio), cv_results_ y
+    best_estimator_ como RandomizedSearchCV.
+    """
+
+    def __init__(self, param_grid, cv=5, n_components=None, algorithm='kd_tree',
+                 refit=True, random_state=None):
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_components = n_components
+        self.algorithm = algorithm
+        self.refit = refit
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+        pos = (y == np.unique(y)[-1]).astype(np.float64)
+        ks = sorted(self.param_grid.get('n_neighbors', [5]))
+        weights = self.param_grid.get('weights', ['uniform'])
+        metrics = self.param_grid.get('metric', ['euclidean'])
+        k_max = ks[-1]
+
+        folds = StratifiedKFold(n_splits=self.cv, shuffle=self.random_state is not None,
+                                random_state=self.random_state).split(X, y)
+        scores = {}
+        for fold, (tr, va) in enumerate(folds):
+            space = _Space(self.n_components)
+            Z_tr = space.fit_transform(X[tr])
+            Z_va = space.transform(X[va])
+            for metric in metrics:
+                tree = _TREES[self.algorithm](Z_tr, metric=metric)
+                dist, idx = tree.query(Z_va, k=min(k_max, len(tr)))
+                y_nb = pos[tr][idx]
+                for k, w in itertools.product(ks, weights):
+                    p = _vote(y_nb[:, :k], dist[:, :k], w)
+                    scores.setdefault((k, w, metric), []).append(roc_auc_score(pos[va], p))
+
+        rows = [{'param_n_neighbors': k, 'param_weights': w, 'param_metric': m,
+                 'mean_test_score': np.mean(s), 'std_test_score': np.std(s)}
+                for (k, w, m), s in scores.items()]
+        self.cv_results_ = pd.DataFrame(rows).sort_values('mean_test_score', ascending=False,
+                                                          ignore_index=True)
+        self.cv_results_['rank_test_score'] = np.arange(1, len(rows) + 1)
+        best = self.cv_results_.iloc[0]
+        self.best_params_ = {'n_neighbors': int(best['param_n_neighbors']),
+                             'weights': best['param_weights'], 'metric': best['param_metric']}
+        self.best_score_ = float(best['mean_test_score'])
+        if self.refit:
+            self.best_estimator_ = TreeKNNClassifier(n_components=self.n_components,
+                                                     algorithm=self.algorithm,
+                                                     **self.best_params_).fit(X, y)
+        return self
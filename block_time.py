@@ -0,0 +1,199 @@
+"""
+================================================================================
+TABLA DE REFERENCIA DE TIEMPOS DE BLOQUE POR RUTA - BOCETOS DE CUANTILES
+================================================================================
+Propósito:
+    La sección 2.4 definía BLOCK_PADDING_MIN contra
+    groupby('ROUTE_ID')['CRS_ELAPSED_TIME'].transform('min'):
+        • un solo vuelo atípico define el mínimo de toda la ruta,
+        • se recalcula sobre el frame completo en cada corrida,
+        • mezcla meses futuros en la referencia de meses pasados (leakage).
+    Aquí cada ruta guarda histogramas a 1 minuto (bocetos exactos) de tiempo
+    programado (CRS_ELAPSED_TIME), real (ACTUAL_ELAPSED_TIME) y en aire
+    (AIR_TIME). Los histogramas se suman mes a mes y de ellos salen p5/p50/p95.
+
+Features (lookup por código entero de ruta):
+    BLOCK_PADDING_MIN       CRS_ELAPSED_TIME − p5 programado de la ruta
+    BLOCK_PADDING_PCT       holgura relativa al p5 programado (%)
+    EXPECTED_AIR_TIME       p50 de AIR_TIME de la ruta
+    MAKEUP_POTENTIAL_MIN    CRS_ELAPSED_TIME − p50 real: minutos que el
+                            itinerario permite recuperar en un vuelo típico
+    ROUTE_ELAPSED_SPREAD    p95 − p5 del tiempo real (predictibilidad)
+
+Funcionamiento:
+    • El boceto se guarda en formato largo disperso (ROUTE_ID, MINUTE) →
+      conteos: solo minutos observados, se fusiona con una suma.
+    • Cuantiles de todas las rutas a la vez: suma acumulada global y un
+      searchsorted por cuantil (sin loops por ruta).
+    • rolling_block_features(): las features de cada mes salen de la tabla
+      construida con los meses ANTERIORES y después se actualiza.
+    • La tabla registra los días (FL_DATE) que ya sumó y se guardan con los
+      bocetos: update() rechaza días repetidos, que se contarían dos veces
+      y filtrarían el mes evaluado a su propia referencia.
+
+Uso:
+    table = BlockTimeTable().update(df_enero).update(df_febrero)
+    feats = table.features(df_marzo)
+    table.save('state/block_time.parquet')
+================================================================================
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from route_keys import route_id
+
+METRICS = {'CRS': 'CRS_ELAPSED_TIME', 'ACT': 'ACTUAL_ELAPSED_TIME', 'AIR': 'AIR_TIME'}
+MAX_MINUTES = 1500
+QUANTILES = {'P5': 0.05, 'P50': 0.50, 'P95': 0.95}
+FEATURES = ['BLOCK_PADDING_MIN', 'BLOCK_PADDING_PCT', 'EXPECTED_AIR_TIME',
+            'MAKEUP_POTENTIAL_MIN', 'ROUTE_ELAPSED_SPREAD']
+
+
+def _routes(frame):
+    return frame['ROUTE_ID'] if 'ROUTE_ID' in frame.columns else route_id(frame)
+
+
+class BlockTimeTable:
+    """Histogramas a 1 minuto por ruta, acumulables por mes."""
+
+    def __init__(self, hist=None, dates=()):
+        self.hist = hist
+        self.dates = set(dates)         # días ya sumados ('YYYY-MM-DD')
+        self._quantiles = None
+
+    @staticmethod
+    def _days(frame, date_col):
+        if date_col not in frame.columns:
+            return set()
+        return set(pd.to_datetime(frame[date_col]).dt.strftime('%Y-%m-%d').dropna().unique())
+
+    def covers(self, frame, date_col='FL_DATE'):
+        """Días del frame que ya están en la tabla (ordenados)."""
+        return sorted(self._days(frame, date_col) & self.dates)
+
+    # ── Boceto ──────────────────────────────────────────────────────────────
+    @staticmethod
+    def sketch(frame):
+        """Conteos (ROUTE_ID, MINUTE) → columnas CRS/ACT/AIR de un lote."""
+        routes = _routes(frame).to_numpy(dtype=np.int64)
+        parts = []
+        for name, col in METRICS.items():
+            if col not in frame.columns:
+                continue
+            minutes = pd.to_numeric(frame[col], errors='coerce').to_numpy(dtype=np.float64)
+            ok = np.isfinite(minutes) & (minutes >= 0)
+            packed = routes[ok] * (MAX_MINUTES + 1) + np.minimum(np.rint(minutes[ok]), MAX_MINUTES).astype(np.int64)
+            keys, counts = np.unique(packed, return_counts=True)
+            parts.append(pd.Series(counts, name=name, index=pd.MultiIndex.from_arrays(
+                [keys // (MAX_MINUTES + 1), keys % (MAX_MINUTES + 1)], names=['ROUTE_ID', 'MINUTE'])))
+        return pd.concat(parts, axis=1).fillna(0).astype(np.int64).sort_index()
+
+    def update(self, frame, date_col='FL_DATE'):
+        """Suma el boceto del lote (p. ej. un mes) a la tabla; error si repite días."""
+        days = self._days(frame, date_col)
+        repeated = sorted(days & self.dates)
+        if repeated:
+            raise ValueError(f"Días ya incluidos en los bocetos: {repeated[:5]}... "
+                             f"({len(repeated)} en total); se contarían dos veces")
+        new = self.sketch(frame)
+        self.hist = new if self.hist is None else self.hist.add(new, fill_value=0).astype(np.int64).sort_index()
+        self.dates |= days
+        self._quantiles = None
+        return self
+
+    # ── Cuantiles ───────────────────────────────────────────────────────────
+    def quantiles(self):
+        """Una fila por ruta: N y p5/p50/p95 de CRS, ACT y AIR (minutos)."""
+        if self._quantiles is not None:
+            return self._quantiles
+        out = {}
+        for name in self.hist.columns:
+            sub = self.hist.loc[self.hist[name] > 0, name]
+            routes = sub.index.get_level_values('ROUTE_ID').to_numpy()
+            minutes = sub.index.get_level_values('MINUTE').to_numpy()
+            counts = sub.to_numpy(dtype=np.float64)
+            uniq, start = np.unique(routes, return_index=True)
+            cum = np.cumsum(counts)
+            total = np.add.reduceat(counts, start)
+            offset = cum[start] - counts[start]
+            frame = {f'{name}_N': pd.Series(total, index=uniq)}
+            for label, q in QUANTILES.items():
+                pos = np.searchsorted(cum, offset + q * total, side='left')
+                frame[f'{name}_{label}'] = pd.Series(minutes[pos].astype(np.float64), index=uniq)
+            out.update(frame)
+        self._quantiles = pd.DataFrame(out).rename_axis('ROUTE_ID')
+        return self._quantiles
+
+    # ── Features ────────────────────────────────────────────────────────────
+    def features(self, frame, min_flights=5):
+        """Features de tiempo de bloque por lookup de ROUTE_ID (rutas con < min_flights → NaN)."""
+        q = self.quantiles()
+        routes = _routes(frame).to_numpy(dtype=np.int64)
+        keys = q.index.to_numpy()
+        pos = np.minimum(np.searchsorted(keys, routes), max(len(keys) - 1, 0))
+        found = (keys[pos] == routes) if len(keys) else np.zeros(len(routes), dtype=bool)
+
+        def lookup(col, n_col):
+            if col not in q.columns:
+                return np.full(len(routes), np.nan)
+            values = np.where(q[n_col].to_numpy() >= min_flights, q[col].to_numpy(), np.nan)
+            return np.where(found, values[pos], np.nan)
+
+        crs = pd.to_numeric(frame['CRS_ELAPSED_TIME'], errors='coerce').to_numpy(dtype=np.float64)
+        crs_p5 = lookup('CRS_P5', 'CRS_N')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            padding_pct = np.where(crs_p5 > 0, (crs - crs_p5) / crs_p5 * 100, np.nan)
+        return pd.DataFrame({
+            'BLOCK_PADDING_MIN': crs - crs_p5,
+            'BLOCK_PADDING_PCT': np.round(padding_pct, 2),
+            'EXPECTED_AIR_TIME': lookup('AIR_P50', 'AIR_N'),
+            'MAKEUP_POTENTIAL_MIN': crs - lookup('ACT_P50', 'ACT_N'),
+            'ROUTE_ELAPSED_SPREAD': lookup('ACT_P95', 'ACT_N') - lookup('ACT_P5', 'ACT_N'),
+        }, index=frame.index)
+
+    # ── Persistencia ────────────────────────────────────────────────────────
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        hist = self.hist.copy(deep=False)
+        hist.attrs = {'dates': sorted(self.dates)}      # viaja en los metadatos del parquet
+        hist.to_parquet(path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        hist = pd.read_parquet(path)
+        return cls(hist, hist.attrs.pop('dates', ()))
+
+
+def rolling_block_features(df, table=None, date_col='FL_DATE', min_flights=5, warm_start=False):
+    """Features de cada mes con la tabla de los meses anteriores; regresa (features, tabla).
+
+    `table` permite partir de un estado previo (p. ej. cargado de state/);
+    si ya contiene días de `df` se lanza ValueError antes de calcular nada.
+    Sin estado previo el primer mes no tiene referencia (NaN); con
+    warm_start=True ese primer mes usa su propio boceto (único mes in-sample).
+    """
+    table = BlockTimeTable() if table is None else table
+    repeated = table.covers(df, date_col)
+    if repeated:
+        raise ValueError(f"El estado previo ya incluye {len(repeated)} días de este frame "
+                         f"({repeated[0]} … {repeated[-1]}): sus features usarían su propio mes")
+    month = pd.to_datetime(df[date_col]).dt.to_period('M')
+    parts = []
+    for period in sorted(month.unique()):
+        rows = df[(month == period).to_numpy()]
+        if table.hist is None and warm_start:
+            table.update(rows, date_col)
+            parts.append(table.features(rows, min_flights))
+            continue
+        if table.hist is not None:
+            parts.append(table.features(rows, min_flights))
+        else:
+            parts.append(pd.DataFrame(np.nan, index=rows.index, columns=FEATURES))
+        table.update(rows, date_col)
+    return pd.concat(parts).reindex(df.index), table
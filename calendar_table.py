@@ -0,0 +1,145 @@
+"""
+================================================================================
+DIMENSIÓN CALENDARIO - UNA FILA POR FECHA (FERIADOS FEDERALES DE EE.UU.)
+================================================================================
+Propósito:
+    Las secciones 2.2-2.3 calculaban dt.dayofweek, dt.day_name(), dt.month,
+    dt.year, dt.quarter, SEASON e IS_PEAK_TRAVEL fila por fila, aunque los
+    millones de vuelos caen en unos cientos de fechas distintas. Aquí:
+        • Se construye una tabla calendario con una fila por fecha, incluyendo
+          feriados federales y distancia en días al feriado más cercano.
+        • Las features por fila se difunden con un código entero de fecha
+          (días desde 1970-01-01): O(fechas) en lugar de O(filas).
+
+Feriados (5 U.S.C. 6103, reglas fijas, sin red):
+    Año Nuevo, MLK (3er lunes de enero, desde 1986), Presidentes (3er lunes
+    de febrero), Memorial Day (último lunes de mayo), Juneteenth (19 de junio,
+    desde 2021), Independencia, Labor Day (1er lunes de septiembre), Colón
+    (2º lunes de octubre), Veteranos, Acción de Gracias (4º jueves de
+    noviembre) y Navidad. Los de fecha fija que caen en sábado se observan el
+    viernes y en domingo el lunes.
+
+Uso:
+    cal = calendar_table('2024-01-01', '2024-12-31')
+    df = df.join(calendar_features(df['FL_DATE']))
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+SEASON_MAP = {12: 'Invierno', 1: 'Invierno', 2: 'Invierno',
+              3: 'Primavera', 4: 'Primavera', 5: 'Primavera',
+              6: 'Verano', 7: 'Verano', 8: 'Verano',
+              9: 'Otoño', 10: 'Otoño', 11: 'Otoño'}
+PEAK_TRAVEL_MONTHS = (6, 7, 8, 11, 12)
+DOW_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# (nombre, mes, día fijo) y (nombre, mes, día de la semana, n-ésimo; -1 = último)
+_FIXED = [("New Year's Day", 1, 1, None), ('Juneteenth', 6, 19, 2021),
+          ('Independence Day', 7, 4, None), ('Veterans Day', 11, 11, None),
+          ('Christmas Day', 12, 25, None)]
+_FLOATING = [('Martin Luther King Jr. Day', 1, 0, 3, 1986), ("Washington's Birthday", 2, 0, 3, None),
+             ('Memorial Day', 5, 0, -1, None), ('Labor Day', 9, 0, 1, None),
+             ('Columbus Day', 10, 0, 2, None), ('Thanksgiving Day', 11, 3, 4, None)]
+
+
+def _nth_weekday(year, month, weekday, n):
+    if n > 0:
+        first = pd.Timestamp(year, month, 1)
+        return first + pd.Timedelta(days=(weekday - first.dayofweek) % 7 + 7 * (n - 1))
+    last = pd.Timestamp(year, month, 1) + pd.offsets.MonthEnd(0)
+    return last - pd.Timedelta(days=(last.dayofweek - weekday) % 7)
+
+
+def _observed(day):
+    if day.dayofweek == 5:
+        return day - pd.Timedelta(days=1)
+    if day.dayofweek == 6:
+        return day + pd.Timedelta(days=1)
+    return day
+
+
+def federal_holidays(years):
+    """Feriados federales (fecha observada) para los años dados."""
+    rows = []
+    for year in years:
+        for name, month, day, since in _FIXED:
+            if since is None or year >= since:
+                rows.append((_observed(pd.Timestamp(year, month, day)), name))
+        for name, month, weekday, n, since in _FLOATING:
+            if since is None or year >= since:
+                rows.append((_nth_weekday(year, month, weekday, n), name))
+    out = pd.DataFrame(rows, columns=['DATE', 'HOLIDAY_NAME'])
+    return out.sort_values('DATE').reset_index(drop=True)
+
+
+def date_code(dates):
+    """Código entero de fecha: días desde 1970-01-01 (int32)."""
+    values = pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[D]')
+    return values.astype(np.int64).astype(np.int32)
+
+
+def calendar_table(start, end):
+    """Tabla calendario con una fila por fecha entre start y end (inclusive).
+
+    Índice: DATE_CODE. Los textos (DOW_NAME, SEASON, HOLIDAY_NAME) son
+    category para que difundirlos sea un take de códigos enteros.
+    DAYS_TO_NEXT_HOLIDAY / DAYS_SINCE_HOLIDAY cuentan hacia
+    el feriado observado siguiente / anterior (0 el propio día).
+    """
+    dates = pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq='D')
+    cal = pd.DataFrame({'DATE': dates})
+    cal['DOW'] = dates.dayofweek.astype(np.int8)                # 0=Lunes
+    cal['DOW_NAME'] = pd.Categorical(dates.day_name(), categories=DOW_NAMES)
+    cal['IS_WEEKEND'] = (cal['DOW'] >= 5).astype(np.int8)
+    cal['MONTH'] = dates.month.astype(np.int8)
+    cal['YEAR'] = dates.year.astype(np.int16)
+    cal['QUARTER'] = dates.quarter.astype(np.int8)
+    cal['SEASON'] = cal['MONTH'].map(SEASON_MAP).astype('category')
+    cal['IS_PEAK_TRAVEL'] = cal['MONTH'].isin(PEAK_TRAVEL_MONTHS).astype(np.int8)
+
+    # Un año extra a cada lado para que los extremos tengan feriado vecino
+    hol = federal_holidays(range(dates[0].year - 1, dates[-1].year + 2))
+    hol_code = date_code(hol['DATE']).astype(np.int64)
+    code = date_code(dates).astype(np.int64)
+    nxt = np.searchsorted(hol_code, code, side='left')
+    prev = np.searchsorted(hol_code, code, side='right') - 1
+    cal['IS_HOLIDAY'] = (hol_code[nxt] == code).astype(np.int8)
+    cal['HOLIDAY_NAME'] = pd.Categorical(np.where(cal['IS_HOLIDAY'] == 1,
+                                                  hol['HOLIDAY_NAME'].to_numpy()[nxt], None))
+    cal['DAYS_TO_NEXT_HOLIDAY'] = (hol_code[nxt] - code).astype(np.int16)
+    cal['DAYS_SINCE_HOLIDAY'] = (code - hol_code[prev]).astype(np.int16)
+    cal['DAYS_TO_NEAREST_HOLIDAY'] = np.minimum(cal['DAYS_TO_NEXT_HOLIDAY'],
+                                                cal['DAYS_SINCE_HOLIDAY'])
+    cal.index = pd.Index(code.astype(np.int32), name='DATE_CODE')
+    return cal
+
+
+def calendar_features(dates, columns=None):
+    """Difunde la tabla calendario a cada fila vía el código entero de fecha.
+
+    Fechas ya parseadas se convierten a código sin hashing; si vienen como
+    texto, solo las fechas distintas se parsean. El resto es un take por
+    posición sobre la tabla.
+    """
+    dates = pd.Series(dates)
+    if dates.dtype.kind == 'M':
+        valid = dates.notna().to_numpy()
+        row_code = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    else:
+        codes, uniq = pd.factorize(dates)
+        valid = codes >= 0
+        row_code = date_code(uniq).astype(np.int64)[np.where(valid, codes, 0)] if len(uniq) else codes
+    if not valid.any():
+        raise ValueError("calendar_features: no hay fechas válidas")
+    lo, hi = row_code[valid].min(), row_code[valid].max()
+
+    cal = calendar_table(pd.Timestamp(lo, unit='D'), pd.Timestamp(hi, unit='D')).drop(columns='DATE')
+    if columns is not None:
+        cal = cal[list(columns)]
+    pos = np.where(valid, row_code - lo, 0)
+    out = pd.DataFrame({c: cal[c].take(pos).set_axis(dates.index) for c in cal.columns})
+    if not valid.all():
+        out = out.where(pd.Series(valid, index=dates.index), axis=0)
+    return out
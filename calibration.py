@@ -0,0 +1,217 @@
+"""
+================================================================================
+CALIBRACIÓN DE PROBABILIDADES Y UMBRALES POR COSTO
+================================================================================
+Propósito:
+    model.ipynb solo reporta roc_auc_score y classification_report con el
+    umbral 0.5. Para alertas de DEP_DELAY_15 operaciones necesita:
+        • Curvas ROC/PR completas, AUC, AP, Brier y bins de confiabilidad
+          para todos los candidatos a la vez.
+        • Probabilidades calibradas (isotónica o Platt) ajustadas en un
+          holdout TEMPORAL (fechas posteriores al entrenamiento).
+        • Umbrales por aerolínea que minimizan el costo esperado
+          (falsa alarma vs. retraso no avisado).
+
+Funcionamiento:
+    • Un solo ordenamiento por modelo: de las sumas acumuladas de positivos y
+      negativos salen ROC, PR, AUC y AP sin re-predecir ni recalcular por
+      métrica. Los bins de confiabilidad son un np.bincount.
+    • Umbrales por grupo: un lexsort global por (grupo, -score); el costo de
+      cada corte sale de sumas acumuladas dentro del grupo y el mínimo por
+      grupo de un segundo lexsort. Sin loops por aerolínea.
+
+Uso:
+    summary, curves = evaluate_models(y_test, {'RF': p_rf, 'LR': p_lr})
+    cal = Calibrator('isotonic').fit(p_calib, y_calib)
+    thresholds = cost_thresholds(y_eval, cal.transform(p_eval), carriers, cost_fp=1, cost_fn=5)
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+
+N_BINS = 10
+_EPS = 1e-15
+
+
+# ============================================================================
+# CURVAS Y MÉTRICAS
+# ============================================================================
+def curves(y_true, score):
+    """ROC y PR desde un solo ordenamiento descendente del score.
+
+    Regresa un dict con thresholds, fpr, tpr, precision, recall (un punto
+    por score distinto, empates agrupados).
+    """
+    y = np.asarray(y_true, dtype=np.float64)
+    s = np.asarray(score, dtype=np.float64)
+    order = np.argsort(-s, kind='mergesort')
+    s, y = s[order], y[order]
+    last = np.r_[np.flatnonzero(np.diff(s)), len(s) - 1]   # último índice de cada score
+    tp = np.cumsum(y)[last]
+    fp = (last + 1) - tp
+    pos, neg = max(tp[-1], _EPS), max(fp[-1], _EPS)
+    return {
+        'thresholds': s[last],
+        'fpr': np.r_[0.0, fp / neg],
+        'tpr': np.r_[0.0, tp / pos],
+        'precision': np.r_[1.0, tp / (tp + fp)],
+        'recall': np.r_[0.0, tp / pos],
+    }
+
+
+def reliability_bins(y_true, prob, n_bins=N_BINS):
+    """Bins de igual ancho: probabilidad media, tasa observada y conteo."""
+    y = np.asarray(y_true, dtype=np.float64)
+    p = np.clip(np.asarray(prob, dtype=np.float64), 0, 1)
+    b = np.minimum((p * n_bins).astype(np.int64), n_bins - 1)
+    n = np.bincount(b, minlength=n_bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out = pd.DataFrame({
+            'bin_lo': np.arange(n_bins) / n_bins,
+            'bin_hi': np.arange(1, n_bins + 1) / n_bins,
+            'p_media': np.bincount(b, weights=p, minlength=n_bins) / n,
+            'tasa_observada': np.bincount(b, weights=y, minlength=n_bins) / n,
+            'n': n,
+        })
+    return out
+
+
+def evaluate_models(y_true, scores, n_bins=N_BINS):
+    """Tabla de métricas y curvas para varios modelos.
+
+    `scores` = {nombre: probabilidades}. El AUC de todos los modelos sale de
+    un solo rankdata por columnas (Mann-Whitney); las curvas, de un
+    ordenamiento por modelo.
+    Regresa (DataFrame resumen ordenado por AUC, {nombre: curvas}).
+    """
+    y = np.asarray(y_true, dtype=np.float64)
+    names = list(scores)
+    S = np.column_stack([np.asarray(scores[m], dtype=np.float64) for m in names])
+    n_pos = y.sum()
+    n_neg = len(y) - n_pos
+    ranks = rankdata(S, axis=0)
+    auc = (ranks[y == 1].sum(axis=0) - n_pos * (n_pos + 1) / 2) / max(n_pos * n_neg, _EPS)
+
+    rows, all_curves = [], {}
+    for j, name in enumerate(names):
+        p = S[:, j]
+        c = curves(y, p)
+        c['reliability'] = rel = reliability_bins(y, p, n_bins)
+        all_curves[name] = c
+        pc = np.clip(p, _EPS, 1 - _EPS)
+        rows.append({
+            'model': name,
+            'roc_auc': auc[j],
+            'avg_precision': np.sum(np.diff(c['recall']) * c['precision'][1:]),
+            'brier': np.mean((p - y) ** 2),
+            'log_loss': -np.mean(y * np.log(pc) + (1 - y) * np.log(1 - pc)),
+            'ece': np.nansum(rel['n'] * (rel['p_media'] - rel['tasa_observada']).abs()) / len(y),
+        })
+    summary = pd.DataFrame(rows).sort_values('roc_auc', ascending=False, ignore_index=True)
+    return summary, all_curves
+
+
+# ============================================================================
+# CALIBRACIÓN
+# ============================================================================
+def temporal_split(dates, calib_frac=0.5):
+    """Máscaras (calibración, evaluación): las fechas más recientes evalúan."""
+    d = pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[D]').astype(np.int64)
+    calib = d <= np.quantile(d, calib_frac)
+    return calib, ~calib
+
+
+class Calibrator:
+    """Calibración isotónica o de Platt sobre scores de un modelo ya entrenado."""
+
+    def __init__(self, method='isotonic'):
+        if method not in ('isotonic', 'platt'):
+            raise ValueError("method debe ser 'isotonic' o 'platt'")
+        self.method = method
+
+    @staticmethod
+    def _logit(p):
+        p = np.clip(np.asarray(p, dtype=np.float64), 1e-6, 1 - 1e-6)
+        return np.log(p / (1 - p)).reshape(-1, 1)
+
+    def fit(self, score, y):
+        if self.method == 'isotonic':
+            self.model_ = IsotonicRegression(out_of_bounds='clip', y_min=0, y_max=1)
+            self.model_.fit(np.asarray(score, dtype=np.float64), y)
+        else:
+            self.model_ = LogisticRegression(C=1e6).fit(self._logit(score), y)
+        return self
+
+    def transform(self, score):
+        if self.method == 'isotonic':
+            return self.model_.predict(np.asarray(score, dtype=np.float64))
+        return self.model_.predict_proba(self._logit(score))[:, 1]
+
+
+# ============================================================================
+# UMBRALES POR COSTO
+# ============================================================================
+def cost_thresholds(y_true, prob, groups=None, cost_fp=1.0, cost_fn=5.0, min_count=200):
+    """Umbral por grupo (p. ej. aerolínea) que minimiza FP·cost_fp + FN·cost_fn.
+
+    Se alerta cuando prob >= umbral. Grupos con menos de `min_count` vuelos
+    usan el umbral global. Incluye el costo con el umbral 0.5 como referencia.
+    """
+    y = np.asarray(y_true, dtype=np.float64)
+    p = np.asarray(prob, dtype=np.float64)
+    if groups is None:
+        labels, names = np.zeros(len(y), dtype=np.int64), ['TODOS']
+    else:
+        labels, names = pd.factorize(pd.Series(groups).to_numpy())
+
+    table = _group_thresholds(y, p, labels, len(names), cost_fp, cost_fn)
+    table.index = pd.Index(names, name='grupo')
+    global_t = _group_thresholds(y, p, np.zeros(len(y), dtype=np.int64), 1, cost_fp, cost_fn)
+    small = table['n'] < min_count
+    table.loc[small, 'umbral'] = global_t['umbral'].iloc[0]
+    table['usa_global'] = small
+
+    # Costo con el umbral elegido y con 0.5, por grupo
+    t_row = table['umbral'].to_numpy()[labels]
+    for col, alert in [('costo', p >= t_row), ('costo_umbral_0.5', p >= 0.5)]:
+        cost = np.where(alert & (y == 0), cost_fp, 0.0) + np.where(~alert & (y == 1), cost_fn, 0.0)
+        table[col] = np.bincount(labels, weights=cost, minlength=len(names))
+    alert = p >= t_row
+    tp = np.bincount(labels, weights=alert & (y == 1), minlength=len(names))
+    table['precision'] = tp / np.maximum(np.bincount(labels, weights=alert, minlength=len(names)), 1)
+    table['recall'] = tp / np.maximum(table['positivos'].to_numpy(), 1)
+    return table.sort_values('n', ascending=False)
+
+
+def _group_thresholds(y, p, labels, n_groups, cost_fp, cost_fn):
+    order = np.lexsort((-p, labels))
+    g, ys, ps = labels[order], y[order], p[order]
+    n = np.bincount(g, minlength=n_groups)
+    pos = np.bincount(g, weights=ys, minlength=n_groups)
+    start = np.r_[0, np.cumsum(n)[:-1]]
+
+    # Alertar a los primeros k de cada grupo (k = posición + 1)
+    cum_tp = np.cumsum(ys)
+    base_tp = np.r_[0.0, cum_tp][start][g]
+    tp = cum_tp - base_tp
+    k = np.arange(len(ys)) - start[g] + 1
+    fp = k - tp
+    cost = fp * cost_fp + (pos[g] - tp) * cost_fn
+    # Solo cortes entre scores distintos (empates se alertan juntos)
+    boundary = np.r_[(ps[1:] != ps[:-1]) | (g[1:] != g[:-1]), True]
+    cost = np.where(boundary, cost, np.inf)
+
+    best = np.lexsort((cost, g))
+    first = best[np.r_[0, np.cumsum(n)[:-1]][n > 0]]
+    out = pd.DataFrame({'n': n, 'positivos': pos, 'umbral': np.inf})
+    groups_with_rows = np.flatnonzero(n > 0)
+    best_cost = cost[first]
+    no_alert = pos[groups_with_rows] * cost_fn         # no alertar nunca
+    use = best_cost < no_alert
+    out.loc[groups_with_rows[use], 'umbral'] = ps[first[use]]
+    out['umbral'] = out['umbral'].replace(np.inf, 1.0 + _EPS)
+    return out
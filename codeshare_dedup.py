@@ -0,0 +1,130 @@
+"""
+================================================================================
+DEDUPLICACIÓN DE CÓDIGO COMPARTIDO - UNA FILA POR OPERACIÓN FÍSICA
+================================================================================
+Propósito:
+    El archivo de marketing lista un mismo vuelo físico una vez por cada
+    código comercial (MKT_UNIQUE_CARRIER / MKT_CARRIER_FL_NUM); la bandera
+    DUP marca las copias. Ninguno de los scripts deduplicaba, así que un
+    vuelo con tres códigos contaba tres veces en el scorecard de aerolíneas,
+    en los conteos de congestión por aeropuerto-hora y como filas de
+    entrenamiento. Aquí se colapsa a una fila por operación con la lista de
+    códigos comerciales.
+
+Llave de operación física:
+    (FL_DATE, OP_UNIQUE_CARRIER, TAIL_NUM, ORIGIN, CRS_DEP_TIME)
+    Cada componente se codifica a entero y se empaqueta en un int64 (base
+    mixta con la cardinalidad de cada columna); la agrupación es un
+    pd.factorize sobre ese entero, sin tuplas ni strings por fila.
+    Las filas sin TAIL_NUM reciben llave propia: sin matrícula no se puede
+    confirmar que sean la misma operación y no se fusionan.
+
+Funcionamiento:
+    • Representante de cada operación: la fila con DUP == 'N' (el registro
+      original); si no hay, la primera en el orden del archivo.
+    • MKT_CODES: códigos comerciales de la operación unidos con '|'
+      ('DL1811|AF7021'), el del representante primero; N_MKT_CODES: cuántos.
+      Es un string y no una lista para que el frame siga siendo hasheable
+      (groupby, category, parquet); codes() da las listas.
+
+Uso:
+    index = CodeshareIndex().fit(df)
+    flights = index.collapse(df)             # una fila por vuelo físico
+    index.summary()
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+KEY_COLS = ['FL_DATE', 'OP_UNIQUE_CARRIER', 'TAIL_NUM', 'ORIGIN', 'CRS_DEP_TIME']
+CODE_COLS = ('MKT_UNIQUE_CARRIER', 'MKT_CARRIER_FL_NUM')
+CODE_SEP = '|'
+
+
+def _codes(s):
+    """Códigos enteros ≥ 0 y cardinalidad; nulos → -1."""
+    if pd.api.types.is_datetime64_any_dtype(s):
+        s = s.dt.normalize()
+    codes, uniques = pd.factorize(s)
+    return codes.astype(np.int64), len(uniques)
+
+
+def physical_key(df, key_cols=KEY_COLS):
+    """Llave int64 de operación física por fila (filas con nulos → llave única negativa)."""
+    key = np.zeros(len(df), dtype=np.int64)
+    missing = np.zeros(len(df), dtype=bool)
+    capacity = 1
+    for col in key_cols:
+        codes, size = _codes(df[col])
+        capacity *= size + 1
+        if capacity >= 2 ** 63:
+            raise OverflowError(f"La llave empaquetada no cabe en int64 al agregar {col}")
+        key = key * (size + 1) + np.maximum(codes, 0)
+        missing |= codes < 0
+    # Sin componente completo no se fusiona: llave propia negativa por fila
+    key[missing] = -1 - np.flatnonzero(missing)
+    return key
+
+
+def marketing_codes(df, code_cols=CODE_COLS):
+    """'AA1234' por fila a partir de aerolínea y número de vuelo comerciales."""
+    carrier, number = code_cols
+    number = pd.to_numeric(df[number], errors='coerce').astype('Int64').astype(str)
+    return df[carrier].astype(str) + number
+
+
+class CodeshareIndex:
+    """Grupo de operación física por fila y fila representante de cada grupo."""
+
+    def __init__(self, key_cols=KEY_COLS, code_cols=CODE_COLS, dup_col='DUP'):
+        self.key_cols = list(key_cols)
+        self.code_cols = code_cols
+        self.dup_col = dup_col
+
+    def fit(self, df):
+        group, _ = pd.factorize(physical_key(df, self.key_cols))
+        n = len(df)
+        # Original (DUP == 'N') primero, luego orden del archivo
+        original = (df[self.dup_col].to_numpy() == 'N') if self.dup_col in df.columns else np.ones(n, bool)
+        order = np.lexsort((np.arange(n), ~original, group))
+        starts = np.flatnonzero(np.r_[True, group[order][1:] != group[order][:-1]])
+
+        self.group_ = group                          # grupo por fila (orden del frame)
+        self.order_ = order                          # filas ordenadas por grupo, representante primero
+        self.starts_ = starts
+        self.representative_ = order[starts]         # posición de la fila representante de cada grupo
+        self.size_ = np.diff(np.r_[starts, n])
+        self.n_rows_, self.n_groups_ = n, len(starts)
+        self.n_without_original_ = int((~original[self.representative_]).sum())
+        return self
+
+    def codes(self, df):
+        """Lista de códigos comerciales por grupo (alineada con representative_)."""
+        if not all(c in df.columns for c in self.code_cols):
+            return None
+        values = marketing_codes(df, self.code_cols).to_numpy()[self.order_]
+        return [list(part) for part in np.split(values, self.starts_[1:])]
+
+    def collapse(self, df):
+        """Una fila por operación física con MKT_CODES y N_MKT_CODES."""
+        out = df.iloc[np.sort(self.representative_)].copy()
+        rank = np.argsort(self.representative_)
+        codes = self.codes(df)
+        if codes is not None:
+            out['MKT_CODES'] = [CODE_SEP.join(codes[i]) for i in rank]
+        out['N_MKT_CODES'] = self.size_[rank]
+        return out
+
+    def summary(self):
+        return pd.Series({'filas': self.n_rows_, 'vuelos_fisicos': self.n_groups_,
+                          'filas_eliminadas': self.n_rows_ - self.n_groups_,
+                          'reduccion_pct': 100 * (1 - self.n_groups_ / max(self.n_rows_, 1)),
+                          'con_codigo_compartido': int((self.size_ > 1).sum()),
+                          'sin_registro_original': self.n_without_original_})
+
+
+def dedupe_codeshares(df, **kwargs):
+    """Atajo: (frame colapsado, CodeshareIndex)."""
+    index = CodeshareIndex(**kwargs).fit(df)
+    return index.collapse(df), index
@@ -0,0 +1,112 @@
+"""
+================================================================================
+PASAJEROS EN CONEXIÓN - INTERVAL JOIN EN HUBS (SECCIÓN 6.3)
+================================================================================
+Propósito:
+    Para cada salida, contar y resumir las llegadas de la MISMA aerolínea al
+    mismo aeropuerto dentro de una ventana previa a CRS_DEP_TIME (por defecto
+    60-90 min antes), de donde salen N_CONNECTING_PAX_ESTIMATED y
+    FLAG_HELD_FOR_CONNECTIONS.
+
+Algoritmo:
+    Un self-join ingenuo por aeropuerto-día es O(n²). Aquí:
+      1. Las llegadas se ordenan una vez por (aeropuerto, aerolínea, hora).
+      2. Cada salida busca los extremos de su ventana con np.searchsorted
+         sobre esa llave compuesta (dos búsquedas binarias).
+      3. Conteos, retraso promedio y % de llegadas tarde salen de sumas
+         acumuladas (prefix sums) evaluadas en esos extremos.
+    Costo total O((n_llegadas + n_salidas) · log n).
+
+Notas:
+    • La aerolínea por defecto es MKT_UNIQUE_CARRIER: las conexiones se
+      venden por red comercial (regionales operan para la marca principal).
+    • Llegada y salida son del MISMO aeropuerto, pero la fecha de la llegada
+      se deduce del vuelo que viene de otra zona horaria: con minutos UTC
+      (schedule_minutes → airport_timezones.py) los nocturnos y los días de
+      cambio de DST caen en la ventana correcta.
+    • Sin datos de PNR, los pasajeros se estiman con supuestos explícitos de
+      asientos, factor de ocupación y fracción en conexión.
+
+Uso:
+    df = df.join(connection_features(df, window=(60, 90)))
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+from incremental import schedule_minutes
+
+CONNECT_WINDOW_MIN = (60, 90)        # minutos antes de la salida: [90, 60]
+HELD_THRESHOLD = 3                   # llegadas en ventana para FLAG_HELD
+SEATS_PER_FLIGHT = 150
+LOAD_FACTOR = 0.85
+CONNECTING_SHARE = 0.30
+LATE_THRESHOLD = 15
+
+_SHIFT = np.int64(1) << 40
+
+
+def _group_codes(df, airport_col, carrier_col, airports, carriers):
+    a = airports.get_indexer(df[airport_col])
+    c = carriers.get_indexer(df[carrier_col])
+    ok = (a >= 0) & (c >= 0)
+    return np.where(ok, a.astype(np.int64) * len(carriers) + c, -1)
+
+
+def connection_features(df, window=CONNECT_WINDOW_MIN, carrier_col='MKT_UNIQUE_CARRIER',
+                        held_threshold=HELD_THRESHOLD, seats=SEATS_PER_FLIGHT,
+                        load_factor=LOAD_FACTOR, connecting_share=CONNECTING_SHARE):
+    """Features de conexión por salida, alineadas con df.
+
+    `window` = (min_antes, max_antes): se consideran llegadas programadas en
+    [CRS_DEP - max_antes, CRS_DEP - min_antes].
+    """
+    min_before, max_before = window
+    if '_DEP_MIN' in df.columns and '_ARR_MIN' in df.columns:
+        dep_t = df['_DEP_MIN'].to_numpy(dtype=np.int64)
+        arr_t = df['_ARR_MIN'].to_numpy(dtype=np.int64)
+    else:
+        dep_t, arr_t = schedule_minutes(df)
+
+    airports = pd.Index(pd.unique(pd.concat([df['ORIGIN'], df['DEST']], ignore_index=True)
+                                  .dropna()))
+    carriers = pd.Index(pd.unique(df[carrier_col].dropna()))
+    g_arr = _group_codes(df, 'DEST', carrier_col, airports, carriers)
+    g_dep = _group_codes(df, 'ORIGIN', carrier_col, airports, carriers)
+
+    # 1. Llegadas operadas ordenadas por (aeropuerto-aerolínea, hora)
+    operated = g_arr >= 0
+    if 'CANCELLED' in df.columns:
+        operated &= df['CANCELLED'].fillna(0).to_numpy() == 0
+    key = g_arr[operated] * _SHIFT + arr_t[operated]
+    order = np.argsort(key, kind='mergesort')
+    key = key[order]
+    arr_delay = df['ARR_DELAY'].to_numpy(dtype=np.float64)[operated][order]
+
+    def prefix(values):
+        return np.concatenate([[0.0], np.cumsum(values)])
+
+    delay_sum = prefix(np.nan_to_num(arr_delay))
+    delay_n = prefix(~np.isnan(arr_delay))
+    late_n = prefix(arr_delay > LATE_THRESHOLD)
+
+    # 2. Extremos de la ventana para cada salida (dos búsquedas binarias)
+    dep_key = g_dep * _SHIFT + dep_t
+    lo = np.searchsorted(key, dep_key - max_before, side='left')
+    hi = np.searchsorted(key, dep_key - min_before, side='right')
+    valid = g_dep >= 0
+    lo, hi = np.where(valid, lo, 0), np.where(valid, hi, 0)
+
+    # 3. Resúmenes por prefix sums
+    n_conn = (hi - lo).astype(np.float64)
+    n_known = delay_n[hi] - delay_n[lo]
+    out = pd.DataFrame(index=df.index)
+    out['N_CONNECTING_ARRIVALS'] = n_conn
+    out['N_CONNECTING_PAX_ESTIMATED'] = np.round(n_conn * seats * load_factor * connecting_share)
+    out['CONNECTING_AVG_ARR_DELAY'] = np.divide(delay_sum[hi] - delay_sum[lo], n_known,
+                                                out=np.full(len(df), np.nan), where=n_known > 0)
+    out['CONNECTING_PCT_LATE'] = np.divide(late_n[hi] - late_n[lo], n_known,
+                                           out=np.full(len(df), np.nan), where=n_known > 0) * 100
+    out['FLAG_HELD_FOR_CONNECTIONS'] = (n_conn >= held_threshold).astype(int)
+    return out
@@ -0,0 +1,183 @@
+"""
+================================================================================
+CUBO DE RETRASOS POR CAUSA (CAUSA × AEROLÍNEA × AEROPUERTO × MES × HORA)
+================================================================================
+Propósito:
+    Precalcular una sola vez los minutos de retraso por causa (CARRIER,
+    WEATHER, NAS, SECURITY, LATE_AIRCRAFT) en un arreglo denso para que
+    cualquier corte o roll-up ("participación de NAS en ORD en tardes de
+    julio") se responda sumando sobre ejes del cubo en milisegundos, sin
+    volver a agrupar el frame crudo.
+
+Estructura:
+    • minutes[c, k, a, m, h]  float32  minutos de retraso de la causa c
+    • flights[k, a, m, h]     int32    vuelos operados en la celda
+    • with_cause[k, a, m, h]  int32    vuelos con causas reportadas (>15 min)
+    Ejes: k = aerolínea, a = aeropuerto (ORIGIN), m = mes 1-12,
+          h = hora programada de salida 0-23.
+    Se construye con np.bincount sobre un índice plano (un pase por causa)
+    y se guarda en .npz (o vía StageCache con to_dict/from_dict).
+
+Uso:
+    cube = DelayCube.from_frame(df)
+    cube.rollup(by='airport', month=7, hour=range(17, 22))
+    cube.share(airport='ORD', month=7, hour=range(17, 22))['NAS']
+    cube.save('delay_cube.npz');  DelayCube.load('delay_cube.npz')
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+CAUSES = {
+    'CARRIER': 'CARRIER_DELAY',
+    'WEATHER': 'WEATHER_DELAY',
+    'NAS': 'NAS_DELAY',
+    'SECURITY': 'SECURITY_DELAY',
+    'LATE_AIRCRAFT': 'LATE_AIRCRAFT_DELAY',
+}
+DIMS = ('carrier', 'airport', 'month', 'hour')
+
+
+def _months(fl_date):
+    """Mes 1-12 parseando solo las fechas distintas (no cada fila)."""
+    codes, uniq = pd.factorize(fl_date)
+    month = pd.DatetimeIndex(pd.to_datetime(pd.Series(uniq))).month.to_numpy()
+    return np.where(codes >= 0, month[codes], -1)
+
+
+class DelayCube:
+    """Cubo OLAP denso de minutos de retraso por causa."""
+
+    def __init__(self, minutes, flights, with_cause, causes, carriers, airports):
+        self.minutes = minutes
+        self.flights = flights
+        self.with_cause = with_cause
+        self.causes = list(causes)
+        self.labels = {
+            'carrier': pd.Index(carriers),
+            'airport': pd.Index(airports),
+            'month': pd.RangeIndex(1, 13),
+            'hour': pd.RangeIndex(0, 24),
+        }
+
+    # ── Construcción ────────────────────────────────────────────────────────
+    @staticmethod
+    def input_columns(df, carrier_col='MKT_UNIQUE_CARRIER', airport_col='ORIGIN'):
+        """Columnas de df que lee from_frame (para la huella de StageCache)."""
+        cols = [carrier_col, airport_col, 'FL_DATE', 'CRS_DEP_TIME', 'CANCELLED'] + list(CAUSES.values())
+        return [c for c in cols if c in df.columns]
+
+    @classmethod
+    def from_frame(cls, df, carrier_col='MKT_UNIQUE_CARRIER', airport_col='ORIGIN'):
+        """Construye el cubo desde el frame crudo de BTS."""
+        causes = [name for name, col in CAUSES.items() if col in df.columns]
+        k, carriers = pd.factorize(df[carrier_col])
+        a, airports = pd.factorize(df[airport_col])
+        m = _months(df['FL_DATE']) - 1
+        h = (df['CRS_DEP_TIME'].to_numpy(dtype=np.int64) // 100) % 24
+
+        ok = (k >= 0) & (a >= 0) & (m >= 0)
+        if 'CANCELLED' in df.columns:
+            ok &= df['CANCELLED'].fillna(0).to_numpy() == 0
+        shape = (len(carriers), len(airports), 12, 24)
+        idx = np.ravel_multi_index((k[ok], a[ok], m[ok], h[ok]), shape)
+        size = int(np.prod(shape))
+
+        minutes = np.empty((len(causes),) + shape, dtype=np.float32)
+        reported = np.zeros(ok.sum(), dtype=bool)
+        for i, name in enumerate(causes):
+            values = df[CAUSES[name]].to_numpy(dtype=np.float64)[ok]
+            reported |= ~np.isnan(values)
+            minutes[i] = np.bincount(idx, weights=np.nan_to_num(values),
+                                     minlength=size).reshape(shape)
+        flights = np.bincount(idx, minlength=size).astype(np.int32).reshape(shape)
+        with_cause = np.bincount(idx, weights=reported, minlength=size).astype(np.int32).reshape(shape)
+        return cls(minutes, flights, with_cause, causes, carriers, airports)
+
+    # ── Persistencia ────────────────────────────────────────────────────────
+    def to_dict(self):
+        """Arreglos planos (sin pickle) para np.savez / StageCache."""
+        return {
+            'minutes': self.minutes, 'flights': self.flights, 'with_cause': self.with_cause,
+            'causes': np.array(self.causes, dtype=str),
+            'carriers': np.asarray(self.labels['carrier'], dtype=str),
+            'airports': np.asarray(self.labels['airport'], dtype=str),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['minutes'], d['flights'], d['with_cause'], d['causes'].tolist(),
+                   d['carriers'].tolist(), d['airports'].tolist())
+
+    def save(self, path):
+        np.savez_compressed(path, **self.to_dict())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            return cls.from_dict({k: npz[k] for k in npz.files})
+
+    # ── Consultas ───────────────────────────────────────────────────────────
+    def _selectors(self, filters):
+        sel = []
+        for dim in DIMS:
+            value = filters.get(dim)
+            labels = self.labels[dim]
+            if value is None:
+                sel.append(np.arange(len(labels)))
+                continue
+            values = [value] if np.isscalar(value) else list(value)
+            pos = labels.get_indexer(values)
+            sel.append(pos[pos >= 0])
+        return sel
+
+    def slice(self, carrier=None, airport=None, month=None, hour=None):
+        """Sub-cubos (minutes, flights, with_cause) para los filtros dados.
+
+        Cada filtro acepta un valor o una lista/rango de valores.
+        """
+        sel = np.ix_(*self._selectors(dict(carrier=carrier, airport=airport,
+                                           month=month, hour=hour)))
+        return (self.minutes[(slice(None),) + sel], self.flights[sel], self.with_cause[sel])
+
+    def rollup(self, by=(), carrier=None, airport=None, month=None, hour=None):
+        """Minutos por causa y vuelos, agregados a las dimensiones `by`.
+
+        Regresa un DataFrame con una columna por causa más TOTAL_MIN,
+        FLIGHTS y FLIGHTS_WITH_CAUSE (una sola fila si `by` está vacío).
+        """
+        by = [by] if isinstance(by, str) else list(by)
+        filters = dict(carrier=carrier, airport=airport, month=month, hour=hour)
+        sel = self._selectors(filters)
+        minutes, flights, with_cause = self.slice(**filters)
+
+        drop = tuple(i for i, dim in enumerate(DIMS) if dim not in by)
+        keep = [dim for dim in DIMS if dim in by]
+        minutes = minutes.sum(axis=tuple(i + 1 for i in drop), dtype=np.float64)
+        flights = flights.sum(axis=drop, dtype=np.int64)
+        with_cause = with_cause.sum(axis=drop, dtype=np.int64)
+
+        if keep:
+            index = pd.MultiIndex.from_product(
+                [self.labels[dim][sel[DIMS.index(dim)]] for dim in keep], names=keep)
+        else:
+            index = pd.RangeIndex(1)
+        out = pd.DataFrame({cause: minutes[i].ravel() for i, cause in enumerate(self.causes)},
+                           index=index)
+        out['TOTAL_MIN'] = out[self.causes].sum(axis=1)
+        out['FLIGHTS'] = flights.ravel()
+        out['FLIGHTS_WITH_CAUSE'] = with_cause.ravel()
+        if len(keep) == 1:
+            out.index = out.index.get_level_values(0)
+        return out
+
+    def share(self, by=(), **filters):
+        """Participación (%) de cada causa en los minutos de retraso."""
+        table = self.rollup(by=by, **filters)
+        total = table['TOTAL_MIN'].replace(0, np.nan)
+        out = table[self.causes].div(total, axis=0) * 100
+        return out.iloc[0] if not by else out
+
+    def nbytes(self):
+        return self.minutes.nbytes + self.flights.nbytes + self.with_cause.nbytes
@@ -0,0 +1,390 @@
+"""
+================================================================================
+SIMULADOR DE PROPAGACIÓN DE RETRASOS - EVENTOS DISCRETOS (ROTACIONES Y PISTAS)
+================================================================================
+Propósito:
+    Las conclusiones del script de FE señalan el efecto cascada (rotación
+    del avión) y la congestión de pista como la mayor oportunidad. Aquí se
+    reproduce un día de itinerario como eventos para responder preguntas
+    what-if: "si ORD pierde 20% de capacidad de 17 a 20 h, ¿cuántos vuelos
+    aguas abajo llegan >15 min tarde?".
+
+Modelo (por vuelo físico; usar el frame ya colapsado por codeshare_dedup):
+    gate_out   = max(salida programada + retraso exógeno,
+                     gate_in del vuelo anterior de la matrícula + turnaround)
+    pista_sal  = cola FIFO de salidas en ORIGIN: solicitud en gate_out +
+                 taxi-out sin congestión; servicio 60 / tasa(aeropuerto, hora)
+    vuelo      = tiempo en aire programado (bloque − taxis sin congestión)
+    pista_lleg = cola FIFO de llegadas en DEST con su propia tasa
+    gate_in    = wheels_on + taxi-in sin congestión → libera al siguiente
+                 vuelo de la matrícula
+    • Rotaciones: vuelos de la misma TAIL_NUM ordenados por salida
+      programada, encadenados solo si el destino coincide con el siguiente
+      origen y la salida no es anterior a la llegada previa. Turnaround mínimo = min(MIN_TURN_MIN, holgura programada).
+    • Taxis sin congestión: cuantil TAXI_QUANTILE de TAXI_OUT/TAXI_IN por
+      aeropuerto (la espera en cola la pone el simulador).
+    • Tasas por defecto: pico horario programado × CAPACITY_HEADROOM, por
+      aeropuerto y sentido; `capacity` las reemplaza.
+    • Retraso exógeno: CARRIER + WEATHER + SECURITY (lo que no es cascada
+      ni cola; NAS y LATE_AIRCRAFT salen del propio modelo). replay usa el
+      observado; Monte Carlo remuestrea por aerolínea.
+    • Escenarios: lista de recortes (aeropuerto, hora_ini, hora_fin,
+      factor[, 'dep'|'arr'|'both']) en hora LOCAL del aeropuerto; factor 0
+      cierra el aeropuerto esas horas. Si la pista no vuelve a abrir dentro
+      del horizonte, el vuelo queda varado: sus tiempos son inf (cuenta como
+      tarde; medias y minutos se calculan sin varados).
+
+Funcionamiento:
+    Un heap (heapq) de solicitudes de pista (tiempo, tipo, vuelo). Como se
+    atienden en orden de tiempo, cada pista es un servidor FIFO con una sola
+    variable "libre desde". Un vuelo entra al heap cuando se conoce su
+    gate_out (al inicio o al llegar su inbound). Un día nacional (~20 mil
+    vuelos, ~40 mil eventos) corre en décimas de segundo; Monte Carlo
+    reparte corridas en un ProcessPoolExecutor y cada corrida usa los mismos
+    retrasos exógenos para la base y todos los escenarios (números
+    aleatorios comunes: las diferencias son solo del escenario).
+
+Uso:
+    sim = DelaySimulator(day_df)
+    base = sim.replay()
+    cut = sim.replay([('ORD', 17, 20, 0.8)])
+    sim.compare(base, cut, airports=['ORD'])
+    runs = sim.monte_carlo({'ORD -20% 17-20h': [('ORD', 17, 20, 0.8)]}, n_runs=1000, n_jobs=-1)
+    summarize_runs(runs)
+================================================================================
+"""
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from incremental import hhmm_to_minutes, schedule_minutes
+
+LATE_THRESHOLD = 15
+MIN_TURN_MIN = 35
+TAXI_QUANTILE = 0.25
+DEFAULT_TAXI_OUT, DEFAULT_TAXI_IN = 15.0, 7.0
+MIN_AIR_MIN = 10.0
+CAPACITY_HEADROOM = 1.2
+EXOGENOUS_COLS = ('CARRIER_DELAY', 'WEATHER_DELAY', 'SECURITY_DELAY')
+_TAIL_HOURS = 24                     # horas de margen tras la última llegada programada
+
+_DEP, _ARR = 0, 1
+
+
+# ============================================================================
+# NÚCLEO DE EVENTOS
+# ============================================================================
+def _slot(t, free, rates):
+    """(inicio, fin) del servicio en una pista FIFO; salta horas con tasa 0.
+
+    Sin capacidad en el resto del horizonte → (inf, inf): la pista queda
+    cerrada para todo lo que siga en la cola. Una solicitud en inf (avión
+    varado en otro aeropuerto) no ocupa la pista.
+    """
+    if t == np.inf:
+        return t, free
+    g = t if t > free else free
+    if g == np.inf:
+        return g, g
+    h = int(g // 60)
+    last = len(rates) - 1
+    while h <= last and rates[h] <= 0:
+        h += 1
+        g = h * 60.0
+    rate = rates[min(h, last)]
+    if rate <= 0:
+        return np.inf, np.inf
+    return g, g + 60.0 / rate
+
+
+def _simulate(s, exo, dep_rates, arr_rates):
+    """Una corrida sobre el itinerario compilado `s` (minutos del simulador); arrays por vuelo."""
+    n = s['n']
+    sched_dep, turn, nxt = s['sched_dep'], s['turn'], s['next']
+    taxi_out, taxi_in, air = s['taxi_out'], s['taxi_in'], s['air']
+    origin, dest = s['origin'], s['dest']
+    ready = [sched_dep[i] + exo[i] for i in range(n)]
+    gate_out, off, on, gate_in = [np.nan] * n, [np.nan] * n, [np.nan] * n, [np.nan] * n
+    free_dep = [-np.inf] * len(dep_rates)
+    free_arr = [-np.inf] * len(arr_rates)
+
+    heap = [(ready[i] + taxi_out[i], _DEP, i) for i in s['roots']]
+    for i in s['roots']:
+        gate_out[i] = ready[i]
+    heapq.heapify(heap)
+    pop, push = heapq.heappop, heapq.heappush
+    while heap:
+        t, kind, i = pop(heap)
+        if kind == _DEP:
+            a = origin[i]
+            g, free_dep[a] = _slot(t, free_dep[a], dep_rates[a])
+            off[i] = g
+            push(heap, (g + air[i], _ARR, i))
+        else:
+            a = dest[i]
+            g, free_arr[a] = _slot(t, free_arr[a], arr_rates[a])
+            on[i] = g
+            gate_in[i] = g + taxi_in[i]
+            j = nxt[i]
+            if j >= 0:
+                go = max(ready[j], gate_in[i] + turn[j])
+                gate_out[j] = go
+                push(heap, (go + taxi_out[j], _DEP, j))
+    return (np.asarray(ready), np.asarray(gate_out), np.asarray(off),
+            np.asarray(on), np.asarray(gate_in))
+
+
+# ============================================================================
+# COMPILACIÓN DEL ITINERARIO
+# ============================================================================
+def _airport_quantile(values, codes, n_airports, q, default):
+    out = pd.Series(values).groupby(codes).quantile(q).reindex(range(n_airports))
+    return out.fillna(default).to_numpy()
+
+
+def _local_offsets(df, dep, arr, origin, dest, n_airports):
+    """Desfase local − reloj del simulador por aeropuerto (mediana del día), en minutos."""
+    day = pd.to_datetime(df['FL_DATE']).to_numpy().astype('datetime64[m]').astype(np.int64)
+    off_dep = day + hhmm_to_minutes(df['CRS_DEP_TIME']).to_numpy() - dep
+    off_arr = day + hhmm_to_minutes(df['CRS_ARR_TIME']).to_numpy() - arr
+    off = np.concatenate([off_dep, off_arr])
+    off = np.mod(off + 720, 1440) - 720                          # al rango [-12 h, 12 h)
+    codes = np.concatenate([origin, dest])
+    return pd.Series(off).groupby(codes).median().reindex(range(n_airports)).fillna(0).to_numpy()
+
+
+class DelaySimulator:
+    """Itinerario compilado (rotaciones, taxis, tasas) + corridas de eventos discretos."""
+
+    def __init__(self, df, capacity=None, min_turn=MIN_TURN_MIN, taxi_quantile=TAXI_QUANTILE,
+                 headroom=CAPACITY_HEADROOM, drop_cancelled=True):
+        if drop_cancelled:
+            for col in ('CANCELLED', 'DIVERTED'):
+                if col in df.columns:
+                    df = df[df[col].fillna(0) == 0]
+        dep, arr = schedule_minutes(df)
+        ok = ~(np.isnan(dep) | np.isnan(arr))
+        df, dep, arr = df[ok], dep[ok], arr[ok]
+        self.index = df.index
+
+        codes, self.airports = pd.factorize(pd.concat([df['ORIGIN'], df['DEST']], ignore_index=True))
+        origin, dest = codes[:len(df)], codes[len(df):]
+        n_air = len(self.airports)
+        self.t0 = np.floor(dep.min() / 60) * 60
+        sched_dep, sched_arr = dep - self.t0, arr - self.t0
+        self.n_hours = int(np.ceil(sched_arr.max() / 60)) + _TAIL_HOURS
+
+        # Taxis sin congestión por aeropuerto y tiempo en aire programado
+        taxi_out = (_airport_quantile(df['TAXI_OUT'].to_numpy(dtype=float), origin, n_air, taxi_quantile,
+                                      DEFAULT_TAXI_OUT) if 'TAXI_OUT' in df.columns
+                    else np.full(n_air, DEFAULT_TAXI_OUT))[origin]
+        taxi_in = (_airport_quantile(df['TAXI_IN'].to_numpy(dtype=float), dest, n_air, taxi_quantile,
+                                     DEFAULT_TAXI_IN) if 'TAXI_IN' in df.columns
+                   else np.full(n_air, DEFAULT_TAXI_IN))[dest]
+        air = np.maximum(sched_arr - sched_dep - taxi_out - taxi_in, MIN_AIR_MIN)
+
+        # Rotaciones: siguiente vuelo de la misma matrícula si sale de donde llegó este
+        nxt = np.full(len(df), -1, dtype=np.int64)
+        turn = np.zeros(len(df))
+        tail = df['TAIL_NUM'].to_numpy() if 'TAIL_NUM' in df.columns else np.full(len(df), None)
+        has_tail = pd.notna(tail)
+        tail_code = np.where(has_tail, pd.factorize(tail)[0], -1)
+        order = np.lexsort((sched_dep, tail_code))
+        a, b = order[:-1], order[1:]
+        # (con salida programada antes de la llegada previa es un cambio de avión, no rotación)
+        link = ((tail_code[a] == tail_code[b]) & (tail_code[a] >= 0) & (dest[a] == origin[b])
+                & (sched_dep[b] >= sched_arr[a]))
+        nxt[a[link]] = b[link]
+        turn[b[link]] = np.clip(sched_dep[b[link]] - sched_arr[a[link]], 0, min_turn)
+        is_next = np.zeros(len(df), dtype=bool)
+        is_next[nxt[nxt >= 0]] = True
+
+        # Tasas base: movimientos por hora (aeropuerto × hora del simulador)
+        self.base_dep_rates = self._rates(capacity, 'DEP_RATE', origin, sched_dep, headroom)
+        self.base_arr_rates = self._rates(capacity, 'ARR_RATE', dest, sched_arr, headroom)
+        # hora local = reloj del simulador + offsets (mod 1 día)
+        self.offsets = _local_offsets(df, dep, arr, origin, dest, n_air) + self.t0 % 1440
+
+        # Retraso exógeno observado y reservas por aerolínea para remuestrear
+        # (sin columnas de causa: el retraso de salida positivo, que sobreestima)
+        present = [c for c in EXOGENOUS_COLS if c in df.columns]
+        if present:
+            self.exogenous = df[present].fillna(0).sum(axis=1).to_numpy(dtype=float)
+        elif 'DEP_DELAY' in df.columns:
+            self.exogenous = np.clip(df['DEP_DELAY'].fillna(0).to_numpy(dtype=float), 0, None)
+        else:
+            self.exogenous = np.zeros(len(df))
+        if 'OP_UNIQUE_CARRIER' in df.columns:
+            carrier = pd.factorize(df['OP_UNIQUE_CARRIER'])[0]
+        else:
+            carrier = np.zeros(len(df), dtype=np.int64)
+        pool_order = np.argsort(carrier, kind='stable')
+        self._pool = self.exogenous[pool_order]
+        sizes = np.bincount(carrier)
+        self._pool_start = (np.cumsum(sizes) - sizes)[carrier]
+        self._pool_size = sizes[carrier]
+
+        self.sched_dep, self.sched_arr = sched_dep, sched_arr
+        self.origin, self.dest = origin, dest
+        self.n_rotations = int((~is_next).sum())
+        self._compiled = {
+            'n': len(df), 'sched_dep': sched_dep.tolist(), 'turn': turn.tolist(), 'next': nxt.tolist(),
+            'taxi_out': taxi_out.tolist(), 'taxi_in': taxi_in.tolist(), 'air': air.tolist(),
+            'origin': origin.tolist(), 'dest': dest.tolist(), 'roots': np.flatnonzero(~is_next).tolist(),
+        }
+
+    def _rates(self, capacity, col, airport, t, headroom):
+        n_air = len(self.airports)
+        if capacity is not None and col in capacity.columns:
+            rate = capacity.set_index('AIRPORT')[col].reindex(self.airports).to_numpy(dtype=float)
+        else:
+            rate = np.full(n_air, np.nan)
+        hour = np.clip((t // 60).astype(np.int64), 0, self.n_hours - 1)
+        counts = np.bincount(airport * self.n_hours + hour, minlength=n_air * self.n_hours)
+        peak = counts.reshape(n_air, self.n_hours).max(axis=1)
+        rate = np.where(np.isnan(rate), np.maximum(np.ceil(peak * headroom), 1), rate)
+        return np.repeat(rate[:, None], self.n_hours, axis=1)
+
+    # ── Escenarios ──
+    def scenario_rates(self, cuts=()):
+        """Tasas (salidas, llegadas) con los recortes aplicados cada día del horizonte."""
+        dep, arr = self.base_dep_rates.copy(), self.base_arr_rates.copy()
+        position = {a: i for i, a in enumerate(self.airports)}
+        for cut in cuts:
+            airport, start, end, factor = cut[:4]
+            kind = cut[4] if len(cut) > 4 else 'both'
+            if airport not in position:
+                raise KeyError(f"Aeropuerto sin vuelos en el itinerario: {airport}")
+            a = position[airport]
+            # un día de margen a cada lado: el desfase local puede correr el recorte ±12 h
+            for day in range(-1, self.n_hours // 24 + 2):
+                lo = day * 1440 + start * 60 - self.offsets[a]
+                hi = day * 1440 + end * 60 - self.offsets[a]
+                hours = slice(max(int(lo // 60), 0), max(int(np.ceil(hi / 60)), 0))
+                if kind in ('dep', 'both'):
+                    dep[a, hours] *= factor
+                if kind in ('arr', 'both'):
+                    arr[a, hours] *= factor
+        return dep, arr
+
+    def sample_exogenous(self, rng):
+        """Retraso exógeno remuestreado por aerolínea (con reemplazo)."""
+        pick = self._pool_start + (rng.random(len(self._pool_size)) * self._pool_size).astype(np.int64)
+        return self._pool[pick]
+
+    # ── Corridas ──
+    def run(self, exogenous, cuts=(), rates=None):
+        """Una corrida con los retrasos exógenos dados → DataFrame por vuelo."""
+        dep_rates, arr_rates = self.scenario_rates(cuts) if rates is None else rates
+        ready, gate_out, off, on, gate_in = _simulate(self._compiled, list(exogenous),
+                                                      dep_rates.tolist(), arr_rates.tolist())
+        taxi_out, air = np.asarray(self._compiled['taxi_out']), np.asarray(self._compiled['air'])
+        with np.errstate(invalid='ignore'):              # varados: inf − inf en las colas → NaN
+            return pd.DataFrame({
+                'SIM_DEP_DELAY': gate_out - self.sched_dep,
+                'SIM_ARR_DELAY': gate_in - self.sched_arr,
+                'SIM_EXOGENOUS': np.asarray(exogenous),
+                'SIM_ROTATION_DELAY': gate_out - ready,               # espera por el avión inbound
+                'SIM_DEP_QUEUE': off - (gate_out + taxi_out),
+                'SIM_ARR_QUEUE': on - (off + air),
+            }, index=self.index)
+
+    def replay(self, cuts=()):
+        """Día observado: retrasos exógenos reales de cada vuelo."""
+        return self.run(self.exogenous, cuts)
+
+    def compare(self, base, scenario, airports=()):
+        """Vuelos que pasan a >LATE_THRESHOLD por el escenario, en y fuera de los aeropuertos recortados."""
+        late_base = base['SIM_ARR_DELAY'] > LATE_THRESHOLD
+        late_new = (scenario['SIM_ARR_DELAY'] > LATE_THRESHOLD) & ~late_base
+        touches = np.isin(self.origin, self.airports.get_indexer(list(airports))) | \
+            np.isin(self.dest, self.airports.get_indexer(list(airports)))
+        extra = scenario['SIM_ARR_DELAY'] - base['SIM_ARR_DELAY']
+        return pd.Series({
+            'vuelos': len(base),
+            'tarde_base': int(late_base.sum()),
+            'tarde_escenario': int((scenario['SIM_ARR_DELAY'] > LATE_THRESHOLD).sum()),
+            'nuevos_tarde': int(late_new.sum()),
+            'nuevos_tarde_aguas_abajo': int((late_new & ~touches).sum()),
+            'varados': int(np.isinf(scenario['SIM_ARR_DELAY']).sum()),
+            'minutos_extra': float(extra[np.isfinite(extra)].sum()),
+        })
+
+    def monte_carlo(self, scenarios, n_runs=1000, n_jobs=-1, random_state=42):
+        """Corridas × (base + escenarios) con números aleatorios comunes → tabla larga."""
+        airports = {name: [c[0] for c in cuts] for name, cuts in scenarios.items()}
+        rates = {name: self.scenario_rates(cuts) for name, cuts in scenarios.items()}
+        n_jobs = os.cpu_count() if n_jobs in (None, -1) else max(1, n_jobs)
+        n_jobs = min(n_jobs, n_runs)
+        chunks = np.array_split(np.arange(n_runs), n_jobs)
+        seeds = np.random.SeedSequence(random_state).spawn(n_jobs)
+        tasks = [(chunk, seed) for chunk, seed in zip(chunks, seeds)]
+        if n_jobs == 1:
+            _init_worker(self, rates, airports)
+            rows = [r for t in tasks for r in _mc_worker(t)]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                     initargs=(self, rates, airports)) as pool:
+                rows = [r for part in pool.map(_mc_worker, tasks) for r in part]
+        return pd.DataFrame(rows)
+
+
+# ============================================================================
+# MONTE CARLO
+# ============================================================================
+_WORKER = {}
+
+
+def _init_worker(sim, rates, airports):
+    # El itinerario compilado se serializa una vez por proceso, no por corrida
+    _WORKER.update(sim=sim, rates=rates, airports=airports)
+
+
+def _finite_sum(values):
+    values = np.asarray(values)
+    return float(values[np.isfinite(values)].sum())
+
+
+def _metrics(run):
+    arr = run['SIM_ARR_DELAY'].to_numpy()
+    stranded = np.isinf(arr)
+    return {'arr_delay_mean': float(arr[~stranded].mean()) if (~stranded).any() else np.nan,
+            'n_late': int((arr > LATE_THRESHOLD).sum()),
+            'pct_late': float((arr > LATE_THRESHOLD).mean() * 100),
+            'n_stranded': int(stranded.sum()),
+            'rotation_min': _finite_sum(run['SIM_ROTATION_DELAY']),
+            'dep_queue_min': _finite_sum(run['SIM_DEP_QUEUE']),
+            'arr_queue_min': _finite_sum(run['SIM_ARR_QUEUE'])}
+
+
+def _mc_worker(task):
+    chunk, seed = task
+    sim, rates, airports = _WORKER['sim'], _WORKER['rates'], _WORKER['airports']
+    rng = np.random.default_rng(seed)
+    rows = []
+    for run_id in chunk:
+        exo = sim.sample_exogenous(rng)
+        base = sim.run(exo)
+        rows.append({'scenario': 'base', 'run': int(run_id), **_metrics(base),
+                     'nuevos_tarde': 0, 'nuevos_tarde_aguas_abajo': 0})
+        for name, r in rates.items():
+            out = sim.run(exo, rates=r)
+            diff = sim.compare(base, out, airports[name])
+            rows.append({'scenario': name, 'run': int(run_id), **_metrics(out),
+                         'nuevos_tarde': int(diff['nuevos_tarde']),
+                         'nuevos_tarde_aguas_abajo': int(diff['nuevos_tarde_aguas_abajo'])})
+    return rows
+
+
+def summarize_runs(runs, quantiles=(0.05, 0.5, 0.95)):
+    """Media y cuantiles por escenario de la tabla de monte_carlo."""
+    cols = ['n_late', 'pct_late', 'n_stranded', 'arr_delay_mean', 'nuevos_tarde', 'nuevos_tarde_aguas_abajo']
+    grouped = runs.groupby('scenario', sort=False)[cols]
+    out = grouped.mean().add_suffix('_mean')
+    for q in quantiles:
+        out = out.join(grouped.quantile(q).add_suffix(f'_p{int(q * 100)}'))
+    return out
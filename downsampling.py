@@ -0,0 +1,108 @@
+"""
+================================================================================
+SUBMUESTREO DE NEGATIVOS POR MES Y AEROLÍNEA - CON CORRECCIÓN DE PROBABILIDAD
+================================================================================
+Propósito:
+    DEP_DELAY_15 y sobre todo TARGET_DELAYED_60 y CANCELLED están muy
+    desbalanceados. model.ipynb entrena cada candidato con todo el split
+    estratificado, así que la mayor parte del cómputo se va en negativos
+    fáciles. Aquí:
+        • Se conservan todos los positivos y una fracción `rate` de los
+          negativos DENTRO de cada estrato (mes × aerolínea), de modo que la
+          mezcla temporal y por aerolínea no cambia.
+        • La tasa es la misma en todos los estratos: k = n·rate con redondeo
+          estocástico (piso + 1 con probabilidad igual a la fracción), sin
+          mínimo por estrato. Así E[k]/n = rate en cada estrato y una sola
+          corrección sirve también para meses que no están en el
+          entrenamiento; un piso o un techo por estrato sesgaría las
+          probabilidades corregidas de los estratos chicos.
+        • Cada fila lleva un peso de probabilidad inversa: 1 para positivos,
+          negativos_estrato / negativos_conservados para negativos.
+        • Dos formas de volver a la tasa real:
+            - entrenar CON sample_weight → las probabilidades ya están en la
+              escala real;
+            - entrenar SIN pesos → corregir con p·r / (p·r + 1 − p).
+          El AUC no depende de la proporción de negativos.
+
+Uso:
+    sampler = NegativeDownsampler(rate=0.2)
+    X_s, y_s, w = sampler.fit_resample(X_train, y_train, strata=strata_train)
+    model.fit(X_s, y_s)                                  # sin pesos
+    p = sampler.correct(model.predict_proba(X_test)[:, 1])
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+RANDOM_STATE = 42
+
+
+def correct_proba(p, rate):
+    """Probabilidad en la escala real de un modelo entrenado sin pesos con negativos a tasa `rate`."""
+    p = np.asarray(p, dtype=np.float64)
+    return p * rate / (p * rate + 1 - p)
+
+
+def strata_month_carrier(dates, carriers):
+    """Estratos mes × aerolínea a partir de FL_DATE y el código de aerolínea."""
+    month = pd.to_datetime(pd.Series(dates)).dt.to_period('M').astype(str).to_numpy()
+    return pd.DataFrame({'MONTH': month, 'CARRIER': pd.Series(carriers).to_numpy()})
+
+
+class NegativeDownsampler:
+    """Conserva positivos y una fracción fija de negativos por estrato."""
+
+    def __init__(self, rate=0.2, random_state=RANDOM_STATE):
+        if not 0 < rate <= 1:
+            raise ValueError("rate debe estar en (0, 1]")
+        self.rate = rate
+        self.random_state = random_state
+
+    def sample_index(self, y, strata=None):
+        """Posiciones conservadas y sus pesos (sin copiar X)."""
+        y = np.asarray(y)
+        n = len(y)
+        if strata is None:
+            group = np.zeros(n, dtype=np.int64)
+        else:
+            frame = strata if isinstance(strata, pd.DataFrame) else pd.DataFrame({'s': np.asarray(strata)})
+            group = frame.groupby(list(frame.columns), sort=False, dropna=False).ngroup().to_numpy()
+        negative = y == 0
+        n_groups = group.max() + 1 if n else 0
+
+        # Negativos de cada estrato en orden aleatorio; se conservan los primeros k
+        rng = np.random.default_rng(self.random_state)
+        neg_count = np.bincount(group[negative], minlength=n_groups)
+        expected = neg_count * self.rate
+        keep_count = (np.floor(expected) + (rng.random(n_groups) < expected % 1)).astype(np.int64)
+        neg_pos = np.flatnonzero(negative)
+        order = neg_pos[np.lexsort((rng.random(len(neg_pos)), group[neg_pos]))]
+        starts = np.r_[0, np.cumsum(neg_count)[:-1]]
+        rank = np.arange(len(order)) - starts[group[order]]
+        kept_neg = order[rank < keep_count[group[order]]]
+
+        index = np.sort(np.r_[np.flatnonzero(~negative), kept_neg])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            neg_weight = np.where(keep_count > 0, neg_count / keep_count, 1.0)
+        weights = np.where(negative[index], neg_weight[group[index]], 1.0)
+
+        self.rate_ = keep_count.sum() / max(neg_count.sum(), 1)     # tasa realizada (≈ rate)
+        self.n_before_, self.n_after_ = n, len(index)
+        return index, weights
+
+    def fit_resample(self, X, y, strata=None):
+        """(X_s, y_s, sample_weight) conservando índices de pandas."""
+        index, weights = self.sample_index(y, strata)
+        take = (lambda obj: obj.iloc[index]) if hasattr(X, 'iloc') else (lambda obj: np.asarray(obj)[index])
+        y_s = y.iloc[index] if hasattr(y, 'iloc') else np.asarray(y)[index]
+        return take(X), y_s, weights
+
+    def correct(self, p):
+        """Corrige probabilidades de un modelo entrenado SIN pesos (tasa uniforme `rate`)."""
+        return correct_proba(p, self.rate)
+
+    def summary(self):
+        return pd.Series({'filas_antes': self.n_before_, 'filas_despues': self.n_after_,
+                          'reduccion': self.n_before_ / max(self.n_after_, 1),
+                          'tasa_negativos': self.rate_})
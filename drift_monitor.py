@@ -0,0 +1,217 @@
+"""
+================================================================================
+MONITOR DE DRIFT - HISTOGRAMAS MENSUALES COMPACTOS POR FEATURE
+================================================================================
+Propósito:
+    La sección 7.1 de feature_engineering.py solo compara la media de
+    ARR_DELAY entre train y test (alerta si difiere > 5 min) y el modelo
+    mensual de model.ipynb se reentrena a ciegas. Aquí:
+        • Se guardan histogramas de bordes FIJOS por feature (y objetivo) y
+          por periodo (mes). Unos cientos de enteros por feature-mes.
+        • PSI, KS y Jensen-Shannon entre cualquier par de periodos se
+          calculan desde los histogramas, sin volver a cargar datos crudos.
+        • La tabla por feature alimenta una compuerta de reentrenamiento.
+
+Funcionamiento:
+    • fit_edges(): bordes por cuantiles del periodo de referencia (numéricas)
+      o vocabulario de los valores más frecuentes + 'otros' (categóricas).
+      Cada histograma lleva además un bin de nulos.
+    • update(): un searchsorted + np.bincount por feature; con date_col, todos
+      los meses del frame en la misma pasada (código = mes·bins + bin).
+    • KS se aproxima con las CDF en los bordes fijos (solo numéricas).
+    • Bandas de PSI usuales: < 0.10 estable, 0.10-0.25 moderado, > 0.25
+      significativo.
+
+Uso:
+    monitor = DriftMonitor().fit_edges(df_ref, features, target='ARR_DELAY')
+    monitor.update(df, date_col='FL_DATE')            # un histograma por mes
+    table = monitor.compare('2025-01', '2025-02')
+    decision = retrain_gate(table)
+    monitor.save('state/drift');  DriftMonitor.load('state/drift')
+================================================================================
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+N_BINS = 20
+PSI_MODERATE = 0.10
+PSI_SIGNIFICANT = 0.25
+_EPS = 1e-6
+_EDGES = 'edges.json'
+_HISTS = 'histograms.parquet'
+
+
+def _distribution(counts):
+    counts = np.asarray(counts, dtype=np.float64)
+    return (counts + _EPS) / (counts.sum() + _EPS * len(counts))
+
+
+def psi(ref_counts, cur_counts):
+    p, q = _distribution(ref_counts), _distribution(cur_counts)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def js_divergence(ref_counts, cur_counts):
+    """Jensen-Shannon en base 2 (0 = idénticas, 1 = disjuntas)."""
+    p, q = _distribution(ref_counts), _distribution(cur_counts)
+    m = (p + q) / 2
+    return float(0.5 * np.sum(p * np.log2(p / m)) + 0.5 * np.sum(q * np.log2(q / m)))
+
+
+def ks_from_hist(ref_counts, cur_counts):
+    """Máxima distancia entre CDF evaluadas en los bordes (sin el bin de nulos)."""
+    p, q = np.asarray(ref_counts[:-1], float), np.asarray(cur_counts[:-1], float)
+    if not p.sum() or not q.sum():
+        return np.nan
+    return float(np.max(np.abs(np.cumsum(p) / p.sum() - np.cumsum(q) / q.sum())))
+
+
+class DriftMonitor:
+    """Histogramas de bordes fijos por feature y periodo."""
+
+    def __init__(self, n_bins=N_BINS):
+        self.n_bins = n_bins
+        self.specs = {}                 # feature → {'kind', 'edges' | 'vocab'}
+        self.target = None
+        self.hists = {}                 # periodo → {feature: counts}
+
+    # ── Bordes ──────────────────────────────────────────────────────────────
+    def fit_edges(self, df, features, target=None):
+        """Fija los bordes con el periodo de referencia (normalmente train)."""
+        self.target = target
+        cols = list(features) + ([target] if target and target not in features else [])
+        for col in cols:
+            s = df[col]
+            if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+                x = s.to_numpy(dtype=np.float64, na_value=np.nan)
+                x = x[np.isfinite(x)]
+                qs = np.linspace(0, 1, self.n_bins + 1)[1:-1]
+                edges = np.unique(np.quantile(x, qs)) if len(x) else np.array([])
+                self.specs[col] = {'kind': 'num', 'edges': edges.tolist()}
+            else:
+                top = s.astype(str).where(s.notna()).value_counts().index[:self.n_bins - 1]
+                self.specs[col] = {'kind': 'cat', 'vocab': list(map(str, top))}
+        return self
+
+    def _n_bins(self, col):
+        spec = self.specs[col]
+        # numéricas: len(edges)+1 intervalos; categóricas: vocab + 'otros'; ambas + nulos
+        return (len(spec['edges']) + 1 if spec['kind'] == 'num' else len(spec['vocab']) + 1) + 1
+
+    def _bin(self, s, col):
+        spec = self.specs[col]
+        null_bin = self._n_bins(col) - 1
+        if spec['kind'] == 'num':
+            x = s.to_numpy(dtype=np.float64, na_value=np.nan)
+            b = np.searchsorted(np.asarray(spec['edges']), x, side='right')
+            return np.where(np.isnan(x), null_bin, b)
+        codes = pd.Categorical(s.astype(str).where(s.notna()), categories=spec['vocab']).codes
+        return np.where(s.isna().to_numpy(), null_bin,
+                        np.where(codes < 0, len(spec['vocab']), codes)).astype(np.int64)
+
+    # ── Actualización ───────────────────────────────────────────────────────
+    def update(self, df, period=None, date_col=None):
+        """Agrega los conteos de df a `period`, o a cada mes de `date_col`.
+
+        Volver a llamar con el mismo periodo suma conteos (datos por lotes).
+        """
+        if (period is None) == (date_col is None):
+            raise ValueError("Indicar exactamente uno de period o date_col")
+        if date_col is not None:
+            codes, labels = pd.factorize(pd.to_datetime(df[date_col]).dt.to_period('M').astype(str))
+            labels = list(labels)
+        else:
+            codes, labels = np.zeros(len(df), dtype=np.int64), [str(period)]
+
+        for col in self.specs:
+            if col not in df.columns:
+                continue
+            k = self._n_bins(col)
+            counts = np.bincount(codes * k + self._bin(df[col], col),
+                                 minlength=len(labels) * k).reshape(len(labels), k)
+            for label, row in zip(labels, counts):
+                prev = self.hists.setdefault(label, {}).get(col)
+                self.hists[label][col] = row if prev is None else prev + row
+        return self
+
+    @property
+    def periods(self):
+        return sorted(self.hists)
+
+    # ── Comparación ─────────────────────────────────────────────────────────
+    def compare(self, ref, cur):
+        """Tabla de drift por feature entre dos periodos (más drift primero)."""
+        ref, cur = str(ref), str(cur)
+        rows = []
+        for col in self.specs:
+            if col not in self.hists.get(ref, {}) or col not in self.hists.get(cur, {}):
+                continue
+            a, b = self.hists[ref][col], self.hists[cur][col]
+            value = psi(a, b)
+            rows.append({
+                'feature': col,
+                'es_objetivo': col == self.target,
+                'psi': value,
+                'ks': ks_from_hist(a, b) if self.specs[col]['kind'] == 'num' else np.nan,
+                'js': js_divergence(a, b),
+                'nulos_ref': a[-1] / max(a.sum(), 1),
+                'nulos_act': b[-1] / max(b.sum(), 1),
+                'n_ref': int(a.sum()),
+                'n_act': int(b.sum()),
+                'estado': ('significativo' if value > PSI_SIGNIFICANT else
+                           'moderado' if value > PSI_MODERATE else 'estable'),
+            })
+        return pd.DataFrame(rows).sort_values('psi', ascending=False, ignore_index=True)
+
+    def psi_matrix(self, baseline=None):
+        """PSI de cada periodo contra `baseline` (por defecto el primero): feature × periodo."""
+        baseline = str(baseline or self.periods[0])
+        return pd.DataFrame({p: self.compare(baseline, p).set_index('feature')['psi']
+                             for p in self.periods if p != baseline})
+
+    # ── Persistencia ────────────────────────────────────────────────────────
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, _EDGES), 'w') as fh:
+            json.dump({'n_bins': self.n_bins, 'target': self.target, 'specs': self.specs},
+                      fh, indent=2, ensure_ascii=False)
+        rows = [(p, col, i, int(c)) for p, hist in self.hists.items()
+                for col, counts in hist.items() for i, c in enumerate(counts)]
+        pd.DataFrame(rows, columns=['period', 'feature', 'bin', 'count']).to_parquet(
+            os.path.join(path, _HISTS), index=False)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, _EDGES)) as fh:
+            meta = json.load(fh)
+        monitor = cls(meta['n_bins'])
+        monitor.target, monitor.specs = meta['target'], meta['specs']
+        hist_path = os.path.join(path, _HISTS)
+        if os.path.exists(hist_path):
+            long = pd.read_parquet(hist_path).sort_values(['period', 'feature', 'bin'])
+            for (p, col), g in long.groupby(['period', 'feature'], sort=False):
+                monitor.hists.setdefault(p, {})[col] = g['count'].to_numpy(dtype=np.int64)
+        return monitor
+
+
+def retrain_gate(table, psi_max=PSI_SIGNIFICANT, max_drifted_share=0.10, target_psi_max=PSI_MODERATE):
+    """¿Reentrenar? Sí si el objetivo deriva o demasiadas features son significativas.
+
+    Regresa un dict con la decisión, los motivos y las features con drift.
+    """
+    drifted = table.loc[~table['es_objetivo'] & (table['psi'] > psi_max), 'feature'].tolist()
+    n_features = int((~table['es_objetivo']).sum())
+    target_rows = table[table['es_objetivo']]
+    target_psi = float(target_rows['psi'].iloc[0]) if len(target_rows) else np.nan
+    reasons = []
+    if target_psi > target_psi_max:
+        reasons.append(f"PSI del objetivo {target_psi:.3f} > {target_psi_max}")
+    if n_features and len(drifted) / n_features > max_drifted_share:
+        reasons.append(f"{len(drifted)}/{n_features} features con PSI > {psi_max}")
+    return {'reentrenar': bool(reasons), 'motivos': reasons, 'features_drift': drifted,
+            'psi_objetivo': target_psi}
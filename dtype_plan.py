@@ -0,0 +1,166 @@
+"""
+================================================================================
+PLAN DE TIPOS COMPACTO Y DIAGNÓSTICO DE MEMORIA DEL FRAME DE FEATURES
+================================================================================
+Propósito:
+    El frame de features guarda DOW_NAME, SEASON, DEP_PERIOD, ROUTE/ruta como
+    strings y los FLAG_* como int64. Esta etapa:
+        • Reduce numéricos a int8/int16/int32/float32 según su rango.
+        • Convierte strings de baja cardinalidad a category.
+        • Guarda flags 0/1 como bool (o bits empaquetados para disco).
+        • Imprime una tabla de memoria por columna antes/después.
+        • Hace cumplir un presupuesto de memoria configurable.
+
+    El plan refleja el rango visto en entrenamiento; apply_dtype_plan()
+    revisa cada cast a entero/bool y, si los datos nuevos no caben (valores
+    mayores o nulos), usa el entero más ancho que sí cabe o float en vez de
+    desbordar en silencio o fallar con IntCastingNaNError.
+
+Uso:
+    df, plan = optimize_dtypes(df, budget_gb=4)
+    df_nuevo = apply_dtype_plan(df_nuevo, plan)    # mismo plan en scoring
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+# IS_* se deja como int8: se usa como dimensión de pivote y su valor forma parte
+# del nombre de las columnas agregadas ({dimension}_{feature}_IS_WEEKEND_1)
+FLAG_PREFIXES = ('FLAG_',)
+FLAG_COLS = ('CANCELLED', 'DIVERTED')
+MAX_CATEGORY_RATIO = 0.5
+_FLOAT32_EXACT_INT = 2 ** 24
+
+_INT_TYPES = [('int8', np.iinfo(np.int8)), ('int16', np.iinfo(np.int16)),
+              ('int32', np.iinfo(np.int32))]
+_ALL_INTS = _INT_TYPES + [('int64', np.iinfo(np.int64))]
+
+
+def memory_table(df):
+    """Memoria por columna (MB, deep=True) ordenada de mayor a menor."""
+    mem = df.memory_usage(deep=True, index=False) / 1024**2
+    return pd.DataFrame({'dtype': df.dtypes.astype(str), 'MB': mem}).sort_values('MB', ascending=False)
+
+
+def _is_flag(col, s):
+    if not (col.startswith(FLAG_PREFIXES) or col in FLAG_COLS or s.dtype == bool):
+        return False
+    values = pd.unique(s.dropna())
+    return s.notna().all() and set(np.asarray(values, dtype=object).tolist()) <= {0, 1, True, False}
+
+
+def _numeric_dtype(s):
+    if s.dtype.kind == 'b':
+        return 'bool'
+    lo, hi = s.min(), s.max()
+    if pd.isna(lo):
+        return 'float32'
+    if s.dtype.kind in 'iu':
+        for name, info in _INT_TYPES:
+            if info.min <= lo and hi <= info.max:
+                return name
+        return 'int64'
+    # Floats se quedan en float (lotes nuevos pueden traer nulos); float32
+    # salvo enteros grandes que perderían exactitud
+    if max(abs(lo), abs(hi)) >= _FLOAT32_EXACT_INT and bool(np.all(np.mod(s.dropna(), 1) == 0)):
+        return 'float64'
+    return 'float32'
+
+
+def plan_dtypes(df, max_category_ratio=MAX_CATEGORY_RATIO):
+    """Plan {columna: dtype} compacto, serializable (se guarda con el modelo)."""
+    plan = {}
+    n = max(len(df), 1)
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or s.dtype.kind == 'M':
+            plan[col] = str(s.dtype) if s.dtype.kind == 'M' else 'category'
+        elif _is_flag(col, s):
+            plan[col] = 'bool'
+        elif s.dtype.kind in 'biuf':
+            plan[col] = _numeric_dtype(s)
+        elif s.nunique(dropna=True) / n <= max_category_ratio:
+            plan[col] = 'category'
+        else:
+            plan[col] = str(s.dtype)
+    return plan
+
+
+def _float_dtype(s):
+    lo, hi = s.min(), s.max()
+    if pd.notna(lo) and max(abs(lo), abs(hi)) >= _FLOAT32_EXACT_INT:
+        return 'float64'
+    return 'float32'
+
+
+def _checked_dtype(s, dtype):
+    """dtype del plan si los valores de s caben; si no, el tipo más angosto que sí."""
+    ints = [name for name, _ in _ALL_INTS]
+    if s.dtype.kind not in 'biuf' or (dtype != 'bool' and dtype not in ints):
+        return dtype
+    if s.isna().any():
+        return _float_dtype(s)
+    if dtype == 'bool':
+        values = set(np.asarray(pd.unique(s), dtype=object).tolist())
+        return dtype if values <= {0, 1, True, False} else _float_dtype(s)
+    if s.dtype.kind == 'f' and not bool(np.all(np.mod(s, 1) == 0)):
+        return _float_dtype(s)
+    lo, hi = s.min(), s.max()
+    for name, info in _ALL_INTS[ints.index(dtype):]:
+        if info.min <= lo and hi <= info.max:
+            return name
+    return 'float64'
+
+
+def apply_dtype_plan(df, plan):
+    """Aplica un plan de tipos (columnas ausentes en df se ignoran).
+
+    Los casts a entero/bool se revisan contra los datos (ver Propósito).
+    """
+    casts = {c: _checked_dtype(df[c], t) for c, t in plan.items() if c in df.columns}
+    casts = {c: t for c, t in casts.items() if str(df[c].dtype) != t}
+    return df.astype(casts) if casts else df
+
+
+def optimize_dtypes(df, plan=None, budget_gb=None, verbose=True):
+    """Compacta los tipos de df e imprime la tabla de memoria antes/después.
+
+    Si `budget_gb` se define y el frame compacto lo excede, lanza MemoryError
+    con las columnas más pesadas para decidir qué eliminar.
+    Regresa (df compacto, plan aplicado).
+    """
+    before = memory_table(df)
+    plan = plan or plan_dtypes(df)
+    out = apply_dtype_plan(df, plan)
+    after = memory_table(out)
+
+    if verbose:
+        table = before.join(after, lsuffix='_antes', rsuffix='_despues')
+        table['ahorro_%'] = (1 - table['MB_despues'] / table['MB_antes'].replace(0, np.nan)) * 100
+        changed = table[table['dtype_antes'] != table['dtype_despues']]
+        print(f"\n  Memoria por columna (solo columnas con cambio de tipo, {len(changed)}):")
+        print(changed.round(2).to_string())
+        total_b, total_a = before['MB'].sum(), after['MB'].sum()
+        print(f"\n  Total: {total_b:,.1f} MB → {total_a:,.1f} MB "
+              f"({(1 - total_a / max(total_b, 1e-9)) * 100:.1f}% menos)")
+
+    if budget_gb is not None:
+        used_gb = after['MB'].sum() / 1024
+        if used_gb > budget_gb:
+            top = ', '.join(f"{c} ({mb:.0f} MB)" for c, mb in after['MB'].head(5).items())
+            raise MemoryError(f"Frame de features usa {used_gb:.2f} GB > presupuesto "
+                              f"{budget_gb:.2f} GB. Columnas más pesadas: {top}")
+    return out, plan
+
+
+def pack_flags(df, cols):
+    """Empaqueta columnas 0/1 en bits (uint8, 8 flags por byte) para disco."""
+    bits = df[list(cols)].to_numpy(dtype=bool)
+    return np.packbits(bits, axis=1)
+
+
+def unpack_flags(packed, cols, index=None):
+    """Inversa de pack_flags: regresa un DataFrame de columnas bool."""
+    bits = np.unpackbits(packed, axis=1, count=len(cols)).astype(bool)
+    return pd.DataFrame(bits, columns=list(cols), index=index)
@@ -25,10 +25,26 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import seaborn as sns
 from scipy import stats
-from scipy.stats import chi2_contingency, kruskal
+from scipy.stats import chi2_contingency
 import warnings
 # warnings.filterwarnings('ignore')
 
+from stage_cache import StageCache
+from grouped_tests import kruskal_by_keys
+from incremental import schedule_minutes, window_features, tail_features
+from dtype_plan import optimize_dtypes
+from route_keys import route_id, route_table
+from airport_network import AirportNetwork
+from connections import connection_features
+from delay_cube import DelayCube
+from calendar_table import calendar_features
+from feature_registry import REGISTRY, HORIZONS
+from drift_monitor import DriftMonitor, retrain_gate
+from block_time import BlockTimeTable, rolling_block_features
+from airport_timezones import missing_timezones
+from codeshare_dedup import CodeshareIndex, KEY_COLS as CODESHARE_KEY
+from delay_simulator import DelaySimulator, summarize_runs
+
 plt.style.use('default')
 sns.set_palette("husl")
 pd.set_option('display.max_columns', None)
@@ -36,6 +52,20 @@ pd.set_option('display.float_format', '{:.4f}'.format)
 
 RANDOM_STATE = 42
 TARGET = 'ARR_DELAY'
+DEDUP_CODESHARES = True    # una fila por vuelo físico (colapsa códigos compartidos, DUP)
+MEMORY_BUDGET_GB = None     # p. ej. 4 → error si el frame de features no cabe
+CONNECT_WINDOW_MIN = (60, 90)   # llegadas de la misma aerolínea [90, 60] min antes de salir
+SIM_CAPACITY_CUT = (17, 20, 0.8)   # what-if: hub principal al 80% de capacidad de 17 a 20 h local
+SIM_RUNS = 200                 # corridas Monte Carlo del simulador de eventos
+BLOCK_TIME_PATH = 'state/block_time.parquet'   # bocetos de tiempo de bloque por ruta
+PREVIOUS_BLOCK_STATE = False   # True: partir de bocetos de meses anteriores ya guardados
+DRIFT_PATH = 'state/drift'     # histogramas mensuales por feature (drift_monitor.py)
+# Columnas de calendario: cambian entre periodos por construcción, no son drift
+DRIFT_SKIP = ('FL_DATE', 'YEAR', 'MONTH', 'QUARTER', 'SEASON', 'IS_PEAK_TRAVEL', 'IS_HOLIDAY',
+              'HOLIDAY_NAME', 'DAYS_TO_NEXT_HOLIDAY', 'DAYS_SINCE_HOLIDAY', 'DAYS_TO_NEAREST_HOLIDAY')
+
+# Caché de etapas costosas (llave: huella del CSV + código de la etapa + parámetros)
+CACHE = StageCache('cache', max_bytes=2 * 1024**3)
 
 # Separador de sección
 def section(title, level=1):
@@ -80,11 +110,25 @@ if 'FL_DATE' in df.columns:
     print(f"  Rango temporal: {df['FL_DATE'].min().date()} → {df['FL_DATE'].max().date()}")
     print(f"  Duración: {(df['FL_DATE'].max() - df['FL_DATE'].min()).days} días")
 
+# Códigos compartidos: el mismo vuelo físico aparece una vez por código comercial
+if DEDUP_CODESHARES and all(c in df.columns for c in CODESHARE_KEY):
+    CODESHARES = CodeshareIndex().fit(df)
+    df = CODESHARES.collapse(df).reset_index(drop=True)
+    cs = CODESHARES.summary()
+    print(f"  Códigos compartidos: {int(cs['filas']):,} filas → {int(cs['vuelos_fisicos']):,} vuelos físicos "
+          f"(−{cs['reduccion_pct']:.1f}%, {int(cs['con_codigo_compartido']):,} con más de un código)")
+
 # Diagnóstico rápido del target
 if TARGET in df.columns:
     print(f"\n  Target ({TARGET}): μ={df[TARGET].mean():.2f} min | "
           f"Nulos={df[TARGET].isnull().sum():,} ({df[TARGET].isnull().mean()*100:.1f}%)")
 
+# Llave entera de ruta (ORIGIN_AIRPORT_ID, DEST_AIRPORT_ID) + tabla de etiquetas
+if all(c in df.columns for c in ['ORIGIN', 'DEST']):
+    df['ROUTE_ID'] = route_id(df)
+    ROUTES = route_table(df)
+    print(f"  Rutas distintas: {len(ROUTES):,}")
+
 # Copiar antes de transformaciones
 df_raw = df.copy()
 
@@ -147,13 +191,16 @@ if 'CRS_DEP_TIME' in df.columns:
 subsection("2.2 Día de la semana (DOW, IS_WEEKEND)")
 
 if 'FL_DATE' in df.columns:
-    df['DOW']        = df['FL_DATE'].dt.dayofweek          # 0=Lunes
-    df['DOW_NAME']   = df['FL_DATE'].dt.day_name()
-    df['IS_WEEKEND'] = (df['DOW'] >= 5).astype(int)
+    # Tabla calendario (una fila por fecha) difundida con el código entero de
+    # fecha: DOW, DOW_NAME, IS_WEEKEND, MONTH, YEAR, QUARTER, SEASON,
+    # IS_PEAK_TRAVEL y feriados federales (Sección 2.3)
+    df = df.join(calendar_features(df['FL_DATE']))
+    print(f"\n     Tabla calendario: {df['FL_DATE'].nunique():,} fechas distintas "
+          f"difundidas a {len(df):,} filas")
 
     if TARGET in df.columns:
         dow_order = ['Monday','Tuesday','Wednesday','Thursday','Friday','Saturday','Sunday']
-        dow_delay = df.groupby('DOW_NAME')[TARGET].mean().reindex(dow_order)
+        dow_delay = df.groupby('DOW_NAME', observed=True)[TARGET].mean().reindex(dow_order)
 
         fig, ax = plt.subplots(figsize=(10, 5))
         colors = ['#ff9999' if d >= 5 else '#66b3ff' for d in range(7)]
@@ -170,22 +217,10 @@ if 'FL_DATE' in df.columns:
     finding("IS_WEEKEND es una feature booleana de bajo costo y alta señal operacional")
 
 # ── 2.3 TEMPORADA / MES ─────────────────────────────────────────────────────
-subsection("2.3 Mes y temporada")
-
-if 'FL_DATE' in df.columns:
-    df['MONTH']     = df['FL_DATE'].dt.month
-    df['YEAR']      = df['FL_DATE'].dt.year
-    df['QUARTER']   = df['FL_DATE'].dt.quarter
-
-    season_map = {12:'Invierno', 1:'Invierno', 2:'Invierno',
-                   3:'Primavera',  4:'Primavera', 5:'Primavera',
-                   6:'Verano',     7:'Verano',    8:'Verano',
-                   9:'Otoño',     10:'Otoño',    11:'Otoño'}
-    df['SEASON'] = df['MONTH'].map(season_map)
-
-    # Flag de temporada alta de viaje (EE.UU.)
-    df['IS_PEAK_TRAVEL'] = df['MONTH'].isin([6, 7, 8, 11, 12]).astype(int)
+subsection("2.3 Mes, temporada y feriados federales")
 
+if 'MONTH' in df.columns:
+    # MONTH, YEAR, QUARTER, SEASON e IS_PEAK_TRAVEL vienen de la tabla calendario
     if TARGET in df.columns:
         month_delay = df.groupby('MONTH')[TARGET].mean()
 
@@ -198,7 +233,7 @@ if 'FL_DATE' in df.columns:
                                   'Jul','Ago','Sep','Oct','Nov','Dic'])
         axes[0].grid(alpha=0.3)
 
-        season_delay = df.groupby('SEASON')[TARGET].mean().sort_values()
+        season_delay = df.groupby('SEASON', observed=True)[TARGET].mean().sort_values()
         axes[1].barh(season_delay.index, season_delay.values, color='mediumpurple')
         axes[1].set(xlabel='Retraso promedio (min)', title='Retraso por temporada')
         axes[1].grid(axis='x', alpha=0.3)
@@ -207,26 +242,52 @@ if 'FL_DATE' in df.columns:
     finding("Junio-Agosto (verano) y Diciembre muestran picos de retrasos por alta demanda")
     finding("IS_PEAK_TRAVEL captura ~5 meses críticos con mínimo overhead computacional")
 
+    if TARGET in df.columns:
+        # Efecto feriado: retraso promedio según la distancia al feriado más cercano
+        holiday_window = pd.cut(df['DAYS_TO_NEAREST_HOLIDAY'], bins=[-1, 0, 3, 7, 400],
+                                labels=['Feriado', '1-3 días', '4-7 días', '>7 días'])
+        print("\n     Retraso promedio por distancia al feriado federal más cercano:")
+        print(df.groupby(holiday_window, observed=True)[TARGET].agg(['mean', 'count']).round(2).to_string())
+    finding("DAYS_TO_NEAREST_HOLIDAY captura los picos de viaje alrededor de feriados federales")
+
 # ── 2.4 EFECTO CASCADA INTRADIARIO ──────────────────────────────────────────
 subsection("2.4 Variable derivada: SCHEDULED_BLOCK_RATIO (holgura del itinerario)")
 
 if all(c in df.columns for c in ['CRS_ELAPSED_TIME', 'DISTANCE']):
     # Velocidad programada implícita (mph)
     df['SCHED_SPEED_MPH'] = (df['DISTANCE'] / df['CRS_ELAPSED_TIME']) * 60
-    # Holgura: tiempo extra vs. mínimo histórico de la ruta
-    route_min = (df.groupby(['ORIGIN', 'DEST'])['CRS_ELAPSED_TIME']
-                   .transform('min')
-                   .replace(0, np.nan))
-    df['BLOCK_PADDING_MIN'] = df['CRS_ELAPSED_TIME'] - route_min
-    df['BLOCK_PADDING_PCT'] = (df['BLOCK_PADDING_MIN'] / route_min * 100).round(2)
-
-    ok("BLOCK_PADDING_MIN: minutos de holgura sobre el mínimo histórico de la ruta")
+    # Holgura contra el p5 programado de la ruta (bocetos por ruta de los meses ANTERIORES;
+    # el primer mes sin estado previo usa su propio boceto)
+    saved_blocks = BlockTimeTable.load(BLOCK_TIME_PATH)
+    prior_blocks = saved_blocks if PREVIOUS_BLOCK_STATE else None
+    if prior_blocks is not None and prior_blocks.covers(df):
+        # Re-corrida sobre meses ya guardados: sumarlos otra vez duplicaría conteos y filtraría
+        # cada mes a su propia referencia → se calcula sin estado previo
+        warn(f"{BLOCK_TIME_PATH} ya incluye {len(prior_blocks.covers(df))} días de este archivo; "
+             "se ignora el estado previo")
+        prior_blocks = None
+    block, BLOCK_TABLE = rolling_block_features(df, prior_blocks, warm_start=True)
+    df = df.join(block)
+    # Los bocetos no se pueden restar por día: solo se guarda una tabla que contenga
+    # todos los días ya guardados, nunca una parcial encima del acumulado
+    lost_days = saved_blocks.dates - BLOCK_TABLE.dates
+    if lost_days:
+        warn(f"{BLOCK_TIME_PATH} tiene {len(lost_days)} días que esta corrida no incluye "
+             f"({min(lost_days)} … {max(lost_days)}); no se sobrescribe")
+    else:
+        BLOCK_TABLE.save(BLOCK_TIME_PATH)
+    print(f"     Rutas con referencia: {len(BLOCK_TABLE.quantiles()):,} | "
+          f"vuelos con holgura calculada: {df['BLOCK_PADDING_MIN'].notna().mean() * 100:.1f}%")
+
+    ok("BLOCK_PADDING_MIN: minutos de holgura sobre el p5 programado de la ruta (robusto a atípicos)")
     ok("BLOCK_PADDING_PCT: % de holgura relativa — rutas con más padding llegan a tiempo")
+    ok("EXPECTED_AIR_TIME / MAKEUP_POTENTIAL_MIN / ROUTE_ELAPSED_SPREAD: p50 en aire, "
+       "holgura vs. p50 real y dispersión p5-p95")
 
 print("\n  RESUMEN DE FEATURES TEMPORALES CREADAS:")
 temp_features = ['DEP_HOUR','DEP_PERIOD','DEP_SHIFT','DOW','IS_WEEKEND',
-                 'MONTH','SEASON','IS_PEAK_TRAVEL',
-                 'BLOCK_PADDING_MIN','BLOCK_PADDING_PCT']
+                 'MONTH','SEASON','IS_PEAK_TRAVEL','IS_HOLIDAY','DAYS_TO_NEAREST_HOLIDAY',
+                 'BLOCK_PADDING_MIN','BLOCK_PADDING_PCT','EXPECTED_AIR_TIME','MAKEUP_POTENTIAL_MIN']
 temp_features = [f for f in temp_features if f in df.columns]
 for f in temp_features:
     dtype = df[f].dtype
@@ -248,24 +309,29 @@ if CARRIER_COL in df.columns and TARGET in df.columns:
     # ── 3.1 Métricas agregadas por aerolínea
     subsection("3.1 Scorecard de aerolíneas")
 
-    carrier_stats = df.groupby(CARRIER_COL).agg(
-        n_vuelos      = (TARGET, 'count'),
-        avg_arr_delay = (TARGET, 'mean'),
-        med_arr_delay = (TARGET, 'median'),
-        pct_on_time   = (TARGET, lambda x: (x <= 15).mean() * 100),
-        pct_delayed15 = (TARGET, lambda x: (x > 15).mean() * 100),
-        pct_severe    = (TARGET, lambda x: (x > 60).mean() * 100),
-    )
-
-    if 'DEP_DELAY' in df.columns:
-        dep_stats = df.groupby(CARRIER_COL)['DEP_DELAY'].mean().rename('avg_dep_delay')
-        carrier_stats = carrier_stats.join(dep_stats)
-
-    if 'CANCELLED' in df.columns:
-        cancel_stats = df.groupby(CARRIER_COL)['CANCELLED'].mean().rename('cancel_rate') * 100
-        carrier_stats = carrier_stats.join(cancel_stats)
-
-    carrier_stats = carrier_stats.sort_values('avg_arr_delay')
+    def carrier_scorecard():
+        stats_ = df.groupby(CARRIER_COL).agg(
+            n_vuelos      = (TARGET, 'count'),
+            avg_arr_delay = (TARGET, 'mean'),
+            med_arr_delay = (TARGET, 'median'),
+            pct_on_time   = (TARGET, lambda x: (x <= 15).mean() * 100),
+            pct_delayed15 = (TARGET, lambda x: (x > 15).mean() * 100),
+            pct_severe    = (TARGET, lambda x: (x > 60).mean() * 100),
+        )
+
+        if 'DEP_DELAY' in df.columns:
+            dep_stats = df.groupby(CARRIER_COL)['DEP_DELAY'].mean().rename('avg_dep_delay')
+            stats_ = stats_.join(dep_stats)
+
+        if 'CANCELLED' in df.columns:
+            cancel_stats = df.groupby(CARRIER_COL)['CANCELLED'].mean().rename('cancel_rate') * 100
+            stats_ = stats_.join(cancel_stats)
+
+        return stats_.sort_values('avg_arr_delay')
+
+    carrier_stats = CACHE.get_or_compute('carrier_scorecard', carrier_scorecard,
+                                         frames=[df[[c for c in [CARRIER_COL, TARGET, 'DEP_DELAY', 'CANCELLED']
+                                                     if c in df.columns]]])
     print("\n  Scorecard completo de aerolíneas (ordenado por retraso promedio):")
     print(carrier_stats.to_string())
 
@@ -289,16 +355,27 @@ if CARRIER_COL in df.columns and TARGET in df.columns:
     # ── 3.2 Kruskal-Wallis (diferencias estadísticamente significativas)
     subsection("3.2 Test de Kruskal-Wallis: ¿hay diferencia significativa entre aerolíneas?")
 
-    groups = [g[TARGET].dropna().values
-              for _, g in df.groupby(CARRIER_COL)
-              if len(g[TARGET].dropna()) > 30]
-    stat, p_kw = kruskal(*groups)
-    print(f"\n     H-stat={stat:.2f}, p-value={p_kw:.6f}")
+    # Un solo ranking del target; H por llave desde sumas de rangos (bincount)
+    kw_keys = {'Aerolínea': CARRIER_COL, 'Ruta': 'ROUTE_ID', 'Origen': 'ORIGIN',
+               'Día semana': 'DOW', 'Hora salida': 'DEP_HOUR'}
+    kw_keys = {k: v for k, v in kw_keys.items()
+               if all(c in df.columns for c in ([v] if isinstance(v, str) else v))}
+    kw_table = CACHE.get_or_compute(
+        'kruskal_by_keys', lambda: kruskal_by_keys(df, TARGET, kw_keys, min_count=30),
+        frames=[df[list(dict.fromkeys([TARGET] + [c for v in kw_keys.values()
+                                                  for c in ([v] if isinstance(v, str) else v)]))]],
+        params={'keys': kw_keys})
+    print()
+    print(kw_table.to_string())
+
+    stat, p_kw = kw_table.loc['Aerolínea', 'H'], kw_table.loc['Aerolínea', 'p_value']
+    print(f"\n     Aerolínea: H-stat={stat:.2f}, p-value={p_kw:.6f}")
     if p_kw < 0.001:
         ok("Las aerolíneas difieren SIGNIFICATIVAMENTE en distribución de retrasos (p<0.001)")
         finding("El carrier es una variable categórica con alto poder discriminativo")
     else:
         warn("No hay diferencia estadística significativa entre aerolíneas")
+    finding("epsilon2 = tamaño de efecto; compara qué llave separa mejor el retraso")
 
     # ── 3.3 Features de aerolínea para modelación
     subsection("3.3 Features derivadas de aerolínea")
@@ -321,25 +398,31 @@ print("\n  Hipótesis: rutas específicas tienen patrones de congestión, clima"
 print("  y demanda que generan retrasos sistemáticos independientemente")
 print("  de la aerolínea o el día.\n")
 
-if all(c in df.columns for c in ['ORIGIN', 'DEST', TARGET]):
-    df['ROUTE'] = df['ORIGIN'] + '-' + df['DEST']
+if all(c in df.columns for c in ['ROUTE_ID', TARGET]):
 
     # ── 4.1 Rutas con más operaciones
     subsection("4.1 Top rutas por volumen y retraso")
 
-    route_stats = df.groupby('ROUTE').agg(
-        n_vuelos      = (TARGET, 'count'),
-        avg_delay     = (TARGET, 'mean'),
-        pct_delayed   = (TARGET, lambda x: (x > 15).mean() * 100),
-        med_delay     = (TARGET, 'median'),
-        std_delay     = (TARGET, 'std'),
-    ).query('n_vuelos >= 100').sort_values('avg_delay', ascending=False)
+    def route_scorecard():
+        return df.groupby('ROUTE_ID').agg(
+            n_vuelos      = (TARGET, 'count'),
+            avg_delay     = (TARGET, 'mean'),
+            pct_delayed   = (TARGET, lambda x: (x > 15).mean() * 100),
+            med_delay     = (TARGET, 'median'),
+            std_delay     = (TARGET, 'std'),
+            avg_distance  = ('DISTANCE', 'mean'),
+        ).query('n_vuelos >= 100').sort_values('avg_delay', ascending=False)
+
+    route_stats = CACHE.get_or_compute('route_scorecard', route_scorecard,
+                                       frames=[df[['ROUTE_ID', TARGET, 'DISTANCE']]])
 
     print(f"\n  Rutas analizadas (≥100 vuelos): {len(route_stats):,}")
     print("\n  TOP 15 rutas con mayor retraso promedio:")
-    print(route_stats.head(15).to_string())
+    route_print = (route_stats.drop(columns='avg_distance')
+                   .rename(index=ROUTES['ROUTE']).rename_axis('ROUTE'))
+    print(route_print.head(15).to_string())
     print("\n  TOP 15 rutas más puntuales:")
-    print(route_stats.tail(15).to_string())
+    print(route_print.tail(15).to_string())
 
     # ── 4.2 Variabilidad de ruta (coeficiente de variación)
     subsection("4.2 Rutas con alta variabilidad (poco predecibles)")
@@ -348,14 +431,15 @@ if all(c in df.columns for c in ['ORIGIN', 'DEST', TARGET]):
                                route_stats['avg_delay'].abs().replace(0, np.nan)).abs()
     high_var = route_stats.nlargest(10, 'cv_delay')
     print("\n  Rutas más impredecibles (mayor CV de retraso):")
-    print(high_var[['n_vuelos','avg_delay','std_delay','cv_delay']].to_string())
+    print(high_var[['n_vuelos','avg_delay','std_delay','cv_delay']]
+          .rename(index=ROUTES['ROUTE']).rename_axis('ROUTE').to_string())
     finding("Alta variabilidad = ruta difícil de modelar; puede requerir features de clima")
 
     # ── 4.3 Scatter: distancia vs retraso
     fig, ax = plt.subplots(figsize=(10, 6))
     sample_routes = route_stats.sample(min(500, len(route_stats)), random_state=RANDOM_STATE)
     scatter = ax.scatter(
-        df.groupby('ROUTE')['DISTANCE'].mean().reindex(sample_routes.index),
+        sample_routes['avg_distance'],
         sample_routes['avg_delay'],
         c=sample_routes['pct_delayed'], cmap='RdYlGn_r',
         alpha=0.6, s=sample_routes['n_vuelos'] / sample_routes['n_vuelos'].max() * 200 + 10
@@ -372,7 +456,7 @@ if all(c in df.columns for c in ['ORIGIN', 'DEST', TARGET]):
 
     route_lookup = route_stats[['avg_delay','pct_delayed','std_delay']].copy()
     route_lookup.columns = ['ROUTE_AVG_DELAY_HIST','ROUTE_PCT_DELAYED_HIST','ROUTE_STD_DELAY_HIST']
-    df = df.join(route_lookup, on='ROUTE')
+    df = df.join(route_lookup, on='ROUTE_ID')
 
     ok("ROUTE_AVG_DELAY_HIST: retraso histórico promedio de la ruta")
     ok("ROUTE_PCT_DELAYED_HIST: % vuelos retrasados histórico de la ruta")
@@ -463,11 +547,14 @@ subsection("5.5 Proxy calculable con datos actuales")
 
 if all(c in df.columns for c in ['ORIGIN', 'FL_DATE', 'DEP_DELAY', 'TAXI_OUT']):
     # Retraso promedio por aeropuerto-día como proxy de congestión
-    airport_day = df.groupby(['ORIGIN', 'FL_DATE']).agg(
-        ORIGIN_DAY_AVG_DEP_DELAY=('DEP_DELAY', 'mean'),
-        ORIGIN_DAY_AVG_TAXI_OUT=('TAXI_OUT', 'mean'),
-        ORIGIN_DAY_N_FLIGHTS=('DEP_DELAY', 'count'),
-    ).reset_index()
+    airport_day = CACHE.get_or_compute(
+        'origin_day_congestion',
+        lambda: df.groupby(['ORIGIN', 'FL_DATE']).agg(
+            ORIGIN_DAY_AVG_DEP_DELAY=('DEP_DELAY', 'mean'),
+            ORIGIN_DAY_AVG_TAXI_OUT=('TAXI_OUT', 'mean'),
+            ORIGIN_DAY_N_FLIGHTS=('DEP_DELAY', 'count'),
+        ).reset_index(),
+        frames=[df[['ORIGIN', 'FL_DATE', 'DEP_DELAY', 'TAXI_OUT']]])
     df = df.merge(airport_day, on=['ORIGIN', 'FL_DATE'], how='left')
 
     if TARGET in df.columns:
@@ -476,6 +563,25 @@ if all(c in df.columns for c in ['ORIGIN', 'FL_DATE', 'DEP_DELAY', 'TAXI_OUT']):
         print(corr_cong[TARGET].drop(TARGET).to_string())
         ok("Retraso promedio del día en el aeropuerto es proxy efectivo de congestión")
 
+subsection("5.6 Ventanas rodantes por aeropuerto (1h / 2h previas)")
+
+if all(c in df.columns for c in ['ORIGIN', 'FL_DATE', 'CRS_DEP_TIME', 'CRS_ARR_TIME', 'DEP_DELAY']):
+    # Misma implementación que el modo incremental (incremental.py)
+    df['_DEP_MIN'], df['_ARR_MIN'] = schedule_minutes(df)
+    no_tz = missing_timezones(df)
+    if no_tz:
+        warn(f"Aeropuertos sin zona horaria ({', '.join(no_tz[:10])}): solo sus vuelos quedan en hora "
+             "local → agregarlos a data/airport_timezones.csv")
+    else:
+        ok("_DEP_MIN / _ARR_MIN en minutos UTC (zona IANA por aeropuerto, con DST)")
+    df = df.join(window_features(df))
+    window_cols = [c for c in df.columns if c.startswith('ORIGIN_') and c.endswith('_BEFORE')]
+    if TARGET in df.columns:
+        print("\n  Correlación de ventanas rodantes con ARR_DELAY:")
+        print(df[[TARGET] + window_cols].corr()[TARGET].drop(TARGET).to_string())
+    ok("ORIGIN_DEP_COUNT_1H_BEFORE / ORIGIN_AVG_DEP_DELAY_1H_BEFORE calculadas (closed='left')")
+    finding("Para datos nuevos usar `python incremental.py state/ nuevos.csv` (sin recálculo)")
+
 
 # ============================================================================
 # 6. RECOMENDACIÓN: VARIABLES DE VUELOS CONECTADOS
@@ -584,6 +690,82 @@ if 'LATE_AIRCRAFT_DELAY' in df.columns and TARGET in df.columns:
     ok(f"LATE_AIRCRAFT_DELAY es el predictor más directo del efecto cascada (r={corr_late:.3f})")
     finding("Una aerolínea que identifique inbounds retrasados puede anticipar y mitigar cascadas")
 
+if all(c in df.columns for c in ['MKT_UNIQUE_CARRIER', 'ORIGIN', 'FL_DATE', 'CRS_DEP_TIME', 'LATE_AIRCRAFT_DELAY']):
+    cube = DelayCube.from_dict(CACHE.get_or_compute(
+        'delay_cube', lambda: DelayCube.from_frame(df).to_dict(),
+        frames=[df[DelayCube.input_columns(df)]]))
+    late_share = cube.share(by='carrier')['LATE_AIRCRAFT'].dropna().sort_values(ascending=False)
+    print("\n     Participación de LATE_AIRCRAFT en minutos de retraso por aerolínea (%):")
+    print(late_share.round(1).to_string())
+
+subsection("6.5 Rotación de avión por TAIL_NUM (INBOUND_ARR_DELAY, TURNAROUND_TIME_MIN)")
+
+if all(c in df.columns for c in ['TAIL_NUM', '_DEP_MIN', '_ARR_MIN', TARGET]):
+    tail_feats, _ = tail_features(df)
+    df = df.join(tail_feats)
+    print(f"\n     Vuelos con inbound identificado: {df['INBOUND_ARR_DELAY'].notna().mean()*100:.1f}%")
+    print(f"     Vuelos con turnaround ajustado (<45 min): {df['FLAG_TIGHT_TURNAROUND'].mean()*100:.1f}%")
+    corr_inb = df[['INBOUND_ARR_DELAY', TARGET]].corr().iloc[0, 1]
+    print(f"     Correlación INBOUND_ARR_DELAY ↔ {TARGET}: r={corr_inb:.4f}")
+    ok("INBOUND_ARR_DELAY y FLAG_TIGHT_TURNAROUND calculadas (inbound al mismo aeropuerto, <24h)")
+
+subsection("6.6 Red de aeropuertos: flujo inbound y retraso río arriba (k saltos)")
+
+if all(c in df.columns for c in ['_DEP_MIN', '_ARR_MIN', 'DEP_DELAY', 'ARR_DELAY']):
+    net = AirportNetwork(df, k_hops=3)
+    df = df.join(net.features(df))
+    network_cols = [c for c in df.columns if c.startswith(('ORIGIN_INBOUND_', 'ORIGIN_UPSTREAM_'))]
+    print(f"\n     Grafo: {net.n} aeropuertos × {net.n_hours:,} franjas horarias "
+          f"({net.flow.nnz:,} aristas con flujo)")
+    print("\n     Hubs por PageRank (top 10):")
+    print(net.centrality().head(10).to_string())
+    if TARGET in df.columns:
+        print("\n     Correlación de features de red con ARR_DELAY:")
+        print(df[[TARGET] + network_cols].corr()[TARGET].drop(TARGET).to_string())
+    ok("ORIGIN_INBOUND_AVG_DELAY_1H / ORIGIN_INBOUND_PCT_LATE_1H calculadas (hora previa)")
+    ok("ORIGIN_UPSTREAM_DELAY_kHOP: retraso de los aeropuertos que alimentan al origen")
+
+subsection("6.7 Pasajeros en conexión: llegadas de la misma aerolínea 60-90 min antes")
+
+if all(c in df.columns for c in ['_DEP_MIN', '_ARR_MIN', 'MKT_UNIQUE_CARRIER', 'ARR_DELAY']):
+    df = df.join(connection_features(df, window=CONNECT_WINDOW_MIN))
+    print(f"\n     Llegadas en conexión por salida (media): {df['N_CONNECTING_ARRIVALS'].mean():.2f}")
+    print(f"     Vuelos con FLAG_HELD_FOR_CONNECTIONS: {df['FLAG_HELD_FOR_CONNECTIONS'].mean()*100:.1f}%")
+    if TARGET in df.columns:
+        conn_delay = df.groupby('FLAG_HELD_FOR_CONNECTIONS')[TARGET].mean()
+        print("     Retraso promedio por FLAG_HELD_FOR_CONNECTIONS:")
+        print(conn_delay.round(1).to_string())
+    ok("N_CONNECTING_PAX_ESTIMATED / FLAG_HELD_FOR_CONNECTIONS calculadas (interval join)")
+
+subsection("6.8 Simulación what-if: rotaciones + colas de pista (eventos discretos)")
+
+if all(c in df.columns for c in ['FL_DATE', 'TAIL_NUM', 'ORIGIN', 'DEST', 'CRS_DEP_TIME', 'CRS_ARR_TIME']):
+    busiest_day = df['FL_DATE'].value_counts().idxmax()
+    day_df = df[df['FL_DATE'] == busiest_day]
+    hub = day_df['ORIGIN'].value_counts().idxmax()
+    start_h, end_h, factor = SIM_CAPACITY_CUT
+    scenario = [(hub, start_h, end_h, factor)]
+    sim = DelaySimulator(day_df)
+    base_run = sim.replay()
+    print(f"\n     Día simulado: {pd.Timestamp(busiest_day).date()} — {len(base_run):,} vuelos, "
+          f"{sim.n_rotations:,} rotaciones, {len(sim.airports)} aeropuertos")
+    print(f"     Réplica base: {(base_run['SIM_ARR_DELAY'] > 15).mean()*100:.1f}% llegadas >15 min "
+          f"(observado: {(day_df['ARR_DELAY'] > 15).mean()*100:.1f}%)")
+    print(f"\n     Escenario: {hub} al {factor:.0%} de capacidad {start_h}-{end_h} h local")
+    print(sim.compare(base_run, sim.replay(scenario), airports=[hub]).to_string())
+    runs = sim.monte_carlo({f'{hub} {factor:.0%} {start_h}-{end_h}h': scenario}, n_runs=SIM_RUNS, n_jobs=-1)
+    print(f"\n     Monte Carlo ({SIM_RUNS} corridas, retrasos exógenos remuestreados por aerolínea):")
+    print(summarize_runs(runs)[['n_late_mean', 'n_late_p5', 'n_late_p95',
+                                'nuevos_tarde_mean', 'nuevos_tarde_aguas_abajo_mean']].to_string())
+    ok("Simulador de eventos listo para preguntas what-if de capacidad (delay_simulator.py)")
+
+subsection("6.9 Plan de tipos compacto del frame de features")
+
+# Flags → bool, strings → category, numéricos → int8/int16/float32
+df, DTYPE_PLAN = optimize_dtypes(df, budget_gb=MEMORY_BUDGET_GB)
+del df_raw
+ok("Plan de tipos aplicado; reutilizar DTYPE_PLAN al construir datos de scoring")
+
 
 # ============================================================================
 # 7. VALIDACIÓN TEMPORAL (FORWARD SPLIT)
@@ -629,6 +811,28 @@ if 'FL_DATE' in df.columns:
         else:
             ok("Distribución estable entre periodos — split temporal es representativo")
 
+    # Drift por feature: histogramas con bordes fijados en TRAIN, PSI/KS/JS sin datos crudos
+    drift_features = [c for c in df.columns
+                      if c not in DRIFT_SKIP + (TARGET,) and not c.startswith('_')
+                      and df_train_simple[c].nunique() > 1]
+    DRIFT = DriftMonitor().fit_edges(df_train_simple, drift_features, target=TARGET)
+    DRIFT.update(df_train_simple, period='TRAIN').update(df_test_simple, period='TEST')
+    DRIFT.update(df, date_col='FL_DATE')
+    drift_table = DRIFT.compare('TRAIN', 'TEST')
+    print(f"\n     Drift TRAIN → TEST ({len(drift_table)} columnas, top 10 por PSI):")
+    print(drift_table.head(10)[['feature', 'psi', 'ks', 'js', 'nulos_ref', 'nulos_act', 'estado']]
+          .round(4).to_string(index=False))
+    print("\n     Columnas por estado: " +
+          ", ".join(f"{k}={v}" for k, v in drift_table['estado'].value_counts().items()))
+    RETRAIN = retrain_gate(drift_table)
+    if RETRAIN['reentrenar']:
+        warn("Compuerta de reentrenamiento: " + "; ".join(RETRAIN['motivos']))
+    else:
+        ok(f"Compuerta de reentrenamiento: sin drift relevante (PSI objetivo {RETRAIN['psi_objetivo']:.3f})")
+    DRIFT.save(DRIFT_PATH)
+    ok(f"Histogramas de {len(DRIFT.periods)} periodos guardados en {DRIFT_PATH}/ "
+       f"(comparar meses con DriftMonitor.load(...).compare)")
+
     # ── 7.2 Walk-forward validation (rolling window)
     subsection("7.2 Walk-Forward Validation (ventana rodante)")
 
@@ -693,6 +897,20 @@ if 'FL_DATE' in df.columns:
     warn("DEP_DELAY no debe usarse como predictor en modelos de predicción anticipada")
     ok("En modelos de tiempo real (post-boarding), DEP_DELAY es el predictor más potente")
 
+    # ── 7.4 Registro de features por horizonte (aplica el protocolo anterior)
+    subsection("7.4 Planes de features por horizonte (schedule / day_of / post_boarding)")
+
+    print("\n     Catálogo del registro:")
+    print(REGISTRY.table()[['horizon', 'sources', 'depends']].to_string())
+    for horizon in HORIZONS:
+        X_h = REGISTRY.build(df, horizon, history=df_train_simple)
+        print(f"\n     {horizon:<14} {X_h.shape[1]:>3} columnas | "
+              f"{sum(REGISTRY.timings.values()):.2f} s | grupos: {', '.join(REGISTRY.timings)}")
+        if REGISTRY.skipped:
+            warn(f"Omitidas por fuentes faltantes: {REGISTRY.skipped}")
+    ok("Cada horizonte calcula solo sus features; DEP_DELAY no existe fuera de post_boarding")
+    ok("Históricos (CARRIER_/ROUTE_*_HIST, TE_*) calculados solo con el TRAIN del split 7.1")
+
 
 # ============================================================================
 # 8. RESUMEN FINAL
@@ -710,6 +928,7 @@ print("""
   │            │ DOW / IS_WEEKEND             │ ✅ Calculada  │ Alta         │
   │            │ MONTH / SEASON               │ ✅ Calculada  │ Alta         │
   │            │ IS_PEAK_TRAVEL               │ ✅ Calculada  │ Media        │
+  │            │ DAYS_TO_NEAREST_HOLIDAY      │ ✅ Calculada  │ Media        │
   │            │ BLOCK_PADDING_PCT            │ ✅ Calculada  │ Alta         │
   ├────────────┼──────────────────────────────┼───────────────┼──────────────┤
   │ Aerolínea  │ CARRIER_AVG_DELAY_HIST       │ ✅ Calculada  │ Alta         │
@@ -721,13 +940,20 @@ print("""
   ├────────────┼──────────────────────────────┼───────────────┼──────────────┤
   │ Pista      │ ORIGIN_DAY_AVG_DEP_DELAY     │ ✅ Calculada  │ Alta (proxy) │
   │            │ ORIGIN_DAY_AVG_TAXI_OUT      │ ✅ Calculada  │ Alta (proxy) │
-  │            │ ORIGIN_DEP_COUNT_1H_BEFORE   │ 🔧 Requiere   │ Muy Alta     │
-  │            │ ORIGIN_AVG_TAXI_OUT_1H_BEFORE│    rolling    │ Muy Alta     │
+  │            │ ORIGIN_DEP_COUNT_1H_BEFORE   │ ✅ Calculada  │ Muy Alta     │
+  │            │ ORIGIN_AVG_TAXI_OUT_1H_BEFORE│ ✅ Calculada  │ Muy Alta     │
   ├────────────┼──────────────────────────────┼───────────────┼──────────────┤
   │ Cascada    │ FLAG_LATE_AIRCRAFT           │ ✅ Calculada  │ Muy Alta     │
-  │            │ INBOUND_ARR_DELAY            │ 🔧 TAIL_NUM   │ Muy Alta     │
-  │            │ TURNAROUND_TIME_MIN          │ 🔧 TAIL_NUM   │ Alta         │
-  │            │ FLAG_TIGHT_TURNAROUND        │ 🔧 TAIL_NUM   │ Alta         │
+  │            │ INBOUND_ARR_DELAY            │ ✅ TAIL_NUM   │ Muy Alta     │
+  │            │ TURNAROUND_TIME_MIN          │ ✅ TAIL_NUM   │ Alta         │
+  │            │ FLAG_TIGHT_TURNAROUND        │ ✅ TAIL_NUM   │ Alta         │
+  ├────────────┼──────────────────────────────┼───────────────┼──────────────┤
+  │ Red        │ ORIGIN_INBOUND_AVG_DELAY_1H  │ ✅ Calculada  │ Muy Alta     │
+  │            │ ORIGIN_INBOUND_PCT_LATE_1H   │ ✅ Calculada  │ Alta         │
+  │            │ ORIGIN_UPSTREAM_DELAY_kHOP   │ ✅ Calculada  │ Media        │
+  │            │ ORIGIN_HUB_PAGERANK          │ ✅ Calculada  │ Media        │
+  │            │ N_CONNECTING_PAX_ESTIMATED   │ ✅ Estimada   │ Media        │
+  │            │ FLAG_HELD_FOR_CONNECTIONS    │ ✅ Calculada  │ Media        │
   └────────────┴──────────────────────────────┴───────────────┴──────────────┘
 
   CONCLUSIONES DE NEGOCIO:
@@ -742,8 +968,10 @@ print("""
 
   PRÓXIMOS PASOS:
   ─────────────────────────────────────────────────────────────────────────
-  1. Implementar rolling windows por aeropuerto-hora (Sección 5)
-  2. Join con datos de TAIL_NUMBER para cascada de avión (Sección 6)
+  1. Ingesta incremental de días/meses nuevos: incremental.py (scorecards,
+     ventanas rodantes y rotación de avión sin recálculo completo)
+  2. Sustituir los supuestos de pasajeros en conexión (Sección 6.7) por
+     datos reales de PNR/itinerario
   3. Entrenar baseline con features actuales (Logistic Reg + Random Forest)
   4. Evaluar con walk-forward (Sección 7.2) para evitar data leakage
   5. Incorporar datos externos de clima (NOAA) como feature adicional
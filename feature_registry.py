@@ -0,0 +1,292 @@
+"""
+================================================================================
+REGISTRO DECLARATIVO DE FEATURES POR HORIZONTE DE PREDICCIÓN
+================================================================================
+Propósito:
+    La Sección 7.3 advierte que DEP_DELAY solo es legal en modelos de tiempo
+    real y que algunas features filtran información en horizontes largos,
+    pero nada lo hacía cumplir. Aquí cada feature declara:
+        • horizon   cuándo está disponible:
+                      schedule       < al publicar el itinerario / booking
+                      day_of         < el día del vuelo, antes de la salida
+                      post_boarding  < después del pushback (tiempo real)
+        • sources   columnas crudas que lee (la función SOLO recibe esas
+                    columnas más las salidas de sus dependencias)
+        • depends   otras features del registro que necesita
+
+    build(df, horizon) resuelve el orden de dependencias y calcula solo lo
+    que el horizonte permite: menos trabajo y sin leakage por construcción
+    (una feature no puede depender de otra con horizonte posterior).
+
+Uso:
+    X = REGISTRY.build(df, 'schedule', history=df_train)
+    REGISTRY.table()                          # catálogo por horizonte
+================================================================================
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from route_keys import route_id
+from calendar_table import calendar_features
+from incremental import schedule_minutes, window_features, tail_features
+from airport_network import AirportNetwork
+from connections import connection_features
+from block_time import BlockTimeTable
+from target_encoding import HierarchicalTargetEncoder, default_encodings
+from multi_target import shared_splits
+
+HORIZONS = ('schedule', 'day_of', 'post_boarding')
+CARRIER_COL = 'MKT_UNIQUE_CARRIER'
+TARGET = 'ARR_DELAY'
+
+
+class Feature:
+    """Grupo de columnas calculadas por una función con fuentes declaradas."""
+
+    def __init__(self, name, horizon, sources, compute, depends=(), optional=(), doc=''):
+        self.name = name
+        self.horizon = horizon
+        self.sources = list(sources)
+        self.optional = list(optional)
+        self.compute = compute
+        self.depends = list(depends)
+        self.doc = doc
+
+
+class FeatureRegistry:
+    """Catálogo de features con horizonte de disponibilidad y dependencias."""
+
+    def __init__(self):
+        self.features = {}
+        self.timings = {}
+        self.skipped = {}
+
+    def register(self, name, horizon, sources, depends=(), optional=()):
+        """Decorador: registra `compute(frame, ctx) -> DataFrame` como feature."""
+        if horizon not in HORIZONS:
+            raise ValueError(f"Horizonte desconocido '{horizon}'; usar uno de {HORIZONS}")
+        for dep in depends:
+            if dep not in self.features:
+                raise ValueError(f"{name}: dependencia '{dep}' no registrada")
+            if HORIZONS.index(self.features[dep].horizon) > HORIZONS.index(horizon):
+                raise ValueError(f"{name} ({horizon}) no puede depender de {dep} "
+                                 f"({self.features[dep].horizon})")
+
+        def decorator(fn):
+            self.features[name] = Feature(name, horizon, sources, fn, depends, optional,
+                                          (fn.__doc__ or '').strip())
+            return fn
+        return decorator
+
+    # ── Plan ────────────────────────────────────────────────────────────────
+    def available(self, horizon):
+        """Nombres de features disponibles en el horizonte (orden de registro)."""
+        level = HORIZONS.index(horizon)
+        return [n for n, f in self.features.items() if HORIZONS.index(f.horizon) <= level]
+
+    def plan(self, horizon, features=None):
+        """Features a calcular (con dependencias) en orden topológico.
+
+        Lanza ValueError si se pide una feature posterior al horizonte.
+        """
+        if horizon not in HORIZONS:
+            raise ValueError(f"Horizonte desconocido '{horizon}'; usar uno de {HORIZONS}")
+        allowed = set(self.available(horizon))
+        requested = list(features) if features is not None else self.available(horizon)
+        leaky = [n for n in requested if n not in allowed]
+        if leaky:
+            raise ValueError(f"Features no disponibles en horizonte '{horizon}': {leaky}")
+
+        order, seen = [], set()
+
+        def visit(name):
+            if name in seen:
+                return
+            seen.add(name)
+            for dep in self.features[name].depends:
+                visit(dep)
+            order.append(name)
+
+        for name in requested:
+            visit(name)
+        return order
+
+    # ── Construcción ────────────────────────────────────────────────────────
+    def build(self, df, horizon, features=None, history=None, keep_internal=False, **ctx):
+        """Calcula las features del horizonte y regresa un frame alineado con df.
+
+        `history` es el frame con el que se calculan los agregados históricos
+        (p. ej. solo TRAIN del fold); por defecto df. Features cuyas fuentes
+        faltan en df se omiten (ver `self.skipped`) junto con sus dependientes.
+        Columnas internas (prefijo `_`) se descartan salvo keep_internal=True.
+        """
+        ctx = dict(ctx, history=df if history is None else history)
+        out = pd.DataFrame(index=df.index)
+        produced = {}
+        self.timings, self.skipped = {}, {}
+        for name in self.plan(horizon, features):
+            f = self.features[name]
+            missing = [c for c in f.sources if c not in df.columns]
+            missing += [d for d in f.depends if d not in produced]
+            if missing:
+                self.skipped[name] = missing
+                continue
+            cols = f.sources + [c for c in f.optional if c in df.columns]
+            frame = df[cols]
+            dep_cols = [c for d in f.depends for c in produced[d]]
+            if dep_cols:
+                frame = frame.join(out[dep_cols])
+            start = time.perf_counter()
+            res = f.compute(frame, ctx)
+            self.timings[name] = time.perf_counter() - start
+            produced[name] = list(res.columns)
+            out = out.join(res)
+        if not keep_internal:
+            out = out[[c for c in out.columns if not c.startswith('_')]]
+        return out
+
+    def table(self):
+        """Catálogo: una fila por feature con horizonte, fuentes y dependencias."""
+        return pd.DataFrame([{
+            'feature': f.name, 'horizon': f.horizon,
+            'sources': ', '.join(f.sources), 'depends': ', '.join(f.depends), 'doc': f.doc,
+        } for f in self.features.values()]).set_index('feature')
+
+
+# ============================================================================
+# FEATURES DEL PROYECTO
+# ============================================================================
+REGISTRY = FeatureRegistry()
+
+
+@REGISTRY.register('route_id', 'schedule', ['ORIGIN', 'DEST'],
+                   optional=['ORIGIN_AIRPORT_ID', 'DEST_AIRPORT_ID'])
+def _route_id(frame, ctx):
+    """ROUTE_ID entero (Sección 1)."""
+    return route_id(frame).to_frame()
+
+
+@REGISTRY.register('dep_hour', 'schedule', ['CRS_DEP_TIME'])
+def _dep_hour(frame, ctx):
+    """DEP_HOUR y DEP_PERIOD desde la hora programada (Sección 2.1)."""
+    hour = (pd.to_numeric(frame['CRS_DEP_TIME'], errors='coerce') // 100) % 24
+    period = pd.cut(hour, bins=[0, 6, 12, 17, 20, 24], right=False,
+                    labels=['Madrugada (0-6)', 'Mañana (6-12)', 'Tarde (12-17)',
+                            'Tarde-noche (17-20)', 'Noche (20-24)'])
+    return pd.DataFrame({'DEP_HOUR': hour, 'DEP_PERIOD': period})
+
+
+@REGISTRY.register('calendar', 'schedule', ['FL_DATE'])
+def _calendar(frame, ctx):
+    """Tabla calendario y feriados federales (Secciones 2.2-2.3)."""
+    return calendar_features(frame['FL_DATE'])
+
+
+@REGISTRY.register('schedule_minutes', 'schedule', ['FL_DATE', 'CRS_DEP_TIME', 'CRS_ARR_TIME', 'ORIGIN', 'DEST'],
+                   optional=['ORIGIN_AIRPORT_ID', 'DEST_AIRPORT_ID', 'ORIGIN_CITY_NAME', 'DEST_CITY_NAME'])
+def _schedule_minutes(frame, ctx):
+    """Minutos UTC absolutos de salida/llegada programadas (internas)."""
+    dep, arr = schedule_minutes(frame)
+    return pd.DataFrame({'_DEP_MIN': dep, '_ARR_MIN': arr}, index=frame.index)
+
+
+@REGISTRY.register('block_padding', 'schedule', ['CRS_ELAPSED_TIME', 'DISTANCE'], depends=['route_id'])
+def _block_padding(frame, ctx):
+    """Holgura y tiempos esperados contra los bocetos por ruta de `history` (Sección 2.4)."""
+    table = BlockTimeTable().update(ctx['history'])
+    out = pd.DataFrame(index=frame.index)
+    out['SCHED_SPEED_MPH'] = frame['DISTANCE'] / frame['CRS_ELAPSED_TIME'] * 60
+    return out.join(table.features(frame))
+
+
+@REGISTRY.register('carrier_hist', 'schedule', [CARRIER_COL])
+def _carrier_hist(frame, ctx):
+    """Retraso y puntualidad históricos de la aerolínea (calculados con `history`)."""
+    hist = ctx['history']
+    stats = hist.groupby(CARRIER_COL)[TARGET].agg(
+        CARRIER_AVG_DELAY_HIST='mean',
+        CARRIER_PCT_ONTIME_HIST=lambda x: (x <= 15).mean() * 100)
+    return frame[[CARRIER_COL]].join(stats, on=CARRIER_COL).drop(columns=CARRIER_COL)
+
+
+@REGISTRY.register('route_hist', 'schedule', [], depends=['route_id'])
+def _route_hist(frame, ctx):
+    """Retraso, % retrasados y variabilidad históricos de la ruta (con `history`)."""
+    hist = ctx['history']
+    key = hist['ROUTE_ID'] if 'ROUTE_ID' in hist.columns else route_id(hist)
+    stats = hist[TARGET].groupby(key.to_numpy()).agg(
+        ROUTE_AVG_DELAY_HIST='mean',
+        ROUTE_PCT_DELAYED_HIST=lambda x: (x > 15).mean() * 100,
+        ROUTE_STD_DELAY_HIST='std')
+    return frame[['ROUTE_ID']].join(stats, on='ROUTE_ID').drop(columns='ROUTE_ID')
+
+
+@REGISTRY.register('target_encoding', 'schedule', ['FL_DATE', 'ORIGIN', 'DEST', CARRIER_COL],
+                   depends=['route_id', 'dep_hour', 'calendar'])
+def _target_encoding(frame, ctx):
+    """Tasa suavizada de retraso >15 min con respaldo ruta → origen → aerolínea (con `history`).
+
+    Las filas que son parte de `history` reciben el encoding fuera de fold
+    (folds hacia adelante por día; el primer bloque queda NaN), nunca su
+    propio objetivo; las posteriores al corte, el encoder con toda la historia.
+    """
+    hist = ctx['history']
+    y = (hist[TARGET] > 15).astype(np.float64).where(hist[TARGET].notna())
+    encoder = HierarchicalTargetEncoder(default_encodings(CARRIER_COL))
+    oof = encoder.fit_transform_oof(hist, y, shared_splits(len(hist), hist['FL_DATE']))
+    out = encoder.transform(frame)
+    cutoff = pd.to_datetime(hist['FL_DATE']).max()
+    in_hist = (pd.to_datetime(frame['FL_DATE']) <= cutoff).to_numpy() & frame.index.isin(oof.index)
+    out.loc[in_hist] = oof.loc[frame.index[in_hist]].to_numpy()
+    return out
+
+
+@REGISTRY.register('origin_windows', 'day_of', ['ORIGIN', 'DEP_DELAY'],
+                   depends=['schedule_minutes'], optional=['TAXI_OUT'])
+def _origin_windows(frame, ctx):
+    """Salidas y retrasos en ORIGIN en las ventanas previas (Sección 5.6)."""
+    return window_features(frame)
+
+
+@REGISTRY.register('tail_rotation', 'day_of', ['TAIL_NUM', 'ORIGIN', 'DEST', TARGET],
+                   depends=['schedule_minutes'])
+def _tail_rotation(frame, ctx):
+    """Retraso del inbound del mismo avión y turnaround (Sección 6.5)."""
+    feats, _ = tail_features(frame)
+    return feats
+
+
+@REGISTRY.register('airport_network', 'day_of', ['ORIGIN', 'DEST', 'DEP_DELAY', 'ARR_DELAY'],
+                   depends=['schedule_minutes'])
+def _airport_network(frame, ctx):
+    """Flujo inbound y retraso río arriba a k saltos (Sección 6.6)."""
+    return AirportNetwork(frame, k_hops=ctx.get('k_hops', 3)).features(frame)
+
+
+@REGISTRY.register('connections', 'day_of', ['ORIGIN', 'DEST', CARRIER_COL, 'ARR_DELAY'],
+                   depends=['schedule_minutes'], optional=['CANCELLED'])
+def _connections(frame, ctx):
+    """Llegadas de la misma aerolínea antes de la salida (Sección 6.7)."""
+    return connection_features(frame, carrier_col=CARRIER_COL)
+
+
+@REGISTRY.register('departure_actuals', 'post_boarding', ['DEP_DELAY'], optional=['TAXI_OUT'])
+def _departure_actuals(frame, ctx):
+    """DEP_DELAY y TAXI_OUT del propio vuelo: solo en tiempo real (Sección 7.3)."""
+    out = frame.copy()
+    out['FLAG_DELAYED_DEP'] = (frame['DEP_DELAY'] > 15).astype(int)
+    return out
+
+
+@REGISTRY.register('origin_day_congestion', 'post_boarding', ['ORIGIN', 'FL_DATE', 'DEP_DELAY'],
+                   optional=['TAXI_OUT'])
+def _origin_day_congestion(frame, ctx):
+    """Promedios del aeropuerto-día completo (incluye vuelos posteriores, Sección 5.5)."""
+    group = frame.groupby(['ORIGIN', 'FL_DATE'])
+    out = pd.DataFrame({'ORIGIN_DAY_AVG_DEP_DELAY': group['DEP_DELAY'].transform('mean')})
+    if 'TAXI_OUT' in frame.columns:
+        out['ORIGIN_DAY_AVG_TAXI_OUT'] = group['TAXI_OUT'].transform('mean')
+    return out
@@ -0,0 +1,279 @@
+"""
+================================================================================
+SELECCIÓN DE FEATURES - IMPORTANCIA POR PERMUTACIÓN AGRUPADA POR PIVOTE
+================================================================================
+Propósito:
+    X_2025-MM.csv trae cientos de columnas pivote
+    ({dimension}_{feature}_{time_dimension}_{valor}) y todas entran a cada
+    modelo. Aquí se mide cuánto aporta cada GRUPO de columnas (la tabla
+    pivote de la que salen) sobre un holdout temporal y se escribe un plan
+    de features podado que usan tanto la construcción (qué pivotes calcular)
+    como el entrenamiento (qué columnas leer).
+
+Modelo:
+    • Grupos: una tabla pivote (dimensión × temporalidad) por grupo; con
+      level='feature' cada variable de la tabla es su propio grupo. Las
+      dummies ({col}_{valor}) se agrupan por columna de origen y el resto
+      de las columnas queda como grupo individual.
+    • Importancia de un grupo = score(holdout) − score(holdout con las
+      columnas del grupo permutadas JUNTAS, misma permutación de filas).
+      Se repite n_repeats veces; cada (grupo, repetición) es una tarea en
+      joblib (la matriz del holdout se comparte por memmap).
+    • Redundancia: dos grupos se unen en un clúster si las columnas de uno
+      tienen, en promedio, |corr| ≥ max_corr con su mejor pareja en el
+      otro. La correlación sale de un solo producto Zᵀ·Z / n sobre la
+      matriz estandarizada (muestra de filas si el holdout es grande).
+      Cada clúster se permuta también completo: si A y B se sustituyen,
+      permutar solo uno no baja el score y ambos parecerían ruido.
+    • Se descartan:
+        - clústeres con importancia media < min_importance (ruido),
+        - del resto, todos los grupos del clúster menos el más importante
+          (redundantes).
+
+Uso:
+    selector = GroupedPermutationSelector(n_repeats=5, n_jobs=-1)
+    selector.fit(X_train, y_train, dates=df.loc[X_train.index, 'FL_DATE'])   # nunca con X_test
+    selector.importances_                   # tabla por grupo
+    selector.save_plan('feature_plan.json')
+    plan = load_plan('feature_plan.json');  X = df[plan['features']]
+================================================================================
+"""
+
+import json
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.metrics import roc_auc_score
+
+from calibration import temporal_split
+
+RANDOM_STATE = 42
+DIMENSIONS = ('OP_UNIQUE_CARRIER', 'MKT_UNIQUE_CARRIER', 'ORIGIN', 'DEST', 'ROUTE_ID', 'TAIL_NUM')
+TIME_DIMENSIONS = ('DOW', 'IS_WEEKEND', 'MONTH', 'QUARTER', 'DEP_HOUR')
+MIN_IMPORTANCE = 1e-4
+MAX_CORR = 0.95
+_CORR_SAMPLE = 100_000
+
+
+# ============================================================================
+# GRUPOS
+# ============================================================================
+def _alternation(names):
+    return '|'.join(re.escape(n) for n in sorted(names, key=len, reverse=True))
+
+
+def feature_groups(columns, dimensions=DIMENSIONS, time_dimensions=TIME_DIMENSIONS,
+                   dummies=(), level='pivot'):
+    """{grupo: [columnas]} a partir de los nombres de columna.
+
+    level='pivot': 'ORIGIN×DOW' reúne todas las columnas de esa tabla pivote.
+    level='feature': 'ORIGIN×DOW:FLAG_DELAYED_ARR_mean' (una variable × sus valores).
+    """
+    if level not in ('pivot', 'feature'):
+        raise ValueError("level debe ser 'pivot' o 'feature'")
+    pivot_re = re.compile(rf'^({_alternation(dimensions)})_(.+)_({_alternation(time_dimensions)})_([^_]+)$')
+    dummy_re = re.compile(rf'^({_alternation(dummies)})_(.+)$') if dummies else None
+    groups = {}
+    for col in columns:
+        m = pivot_re.match(col)
+        if m:
+            name = f'{m.group(1)}×{m.group(3)}'
+            if level == 'feature':
+                name += f':{m.group(2)}'
+        elif dummy_re is not None and dummy_re.match(col):
+            name = dummy_re.match(col).group(1)
+        else:
+            name = col
+        groups.setdefault(name, []).append(col)
+    return groups
+
+
+def pivot_of(group):
+    """'ORIGIN×DOW[:feature]' → ('ORIGIN', 'DOW'); None si el grupo no es pivote."""
+    head = group.split(':', 1)[0]
+    return tuple(head.split('×')) if '×' in head else None
+
+
+# ============================================================================
+# KERNELS
+# ============================================================================
+def correlation_matrix(X, max_rows=_CORR_SAMPLE, random_state=RANDOM_STATE):
+    """|corr| de Pearson entre columnas con un producto matricial (nulos → media)."""
+    X = np.asarray(X, dtype=np.float64)
+    if len(X) > max_rows:
+        X = X[np.sort(np.random.default_rng(random_state).choice(len(X), max_rows, replace=False))]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        Z = X - np.nanmean(X, axis=0)
+        Z = np.nan_to_num(Z / np.nanstd(X, axis=0))            # columnas constantes → 0
+    return np.abs(Z.T @ Z) / max(len(Z), 1)
+
+
+def redundant_clusters(corr, group_cols, max_corr=MAX_CORR):
+    """Componentes conexas de grupos redundantes: [[índices de grupo], ...].
+
+    A y B se conectan si las columnas de uno tienen, en promedio, |corr| ≥
+    max_corr con su mejor pareja en el otro (en cualquiera de los dos sentidos).
+    """
+    parent = list(range(len(group_cols)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a in range(len(group_cols)):
+        for b in range(a + 1, len(group_cols)):
+            block = corr[np.ix_(group_cols[a], group_cols[b])]
+            if max(block.max(axis=1).mean(), block.max(axis=0).mean()) >= max_corr:
+                parent[root(b)] = root(a)
+    clusters = {}
+    for i in range(len(group_cols)):
+        clusters.setdefault(root(i), []).append(i)
+    return list(clusters.values())
+
+
+def _auc(y, p):
+    return roc_auc_score(y, p)
+
+
+def _score(model, X, y, scoring):
+    p = model.predict_proba(X)[:, 1] if hasattr(model, 'predict_proba') else model.predict(X)
+    return scoring(y, p)
+
+
+def _permuted_score(model, X, y, cols, seed, scoring):
+    X = X.copy()                                   # el holdout llega como memmap de solo lectura
+    perm = np.random.default_rng(seed).permutation(len(X))
+    X[:, cols] = X[perm][:, cols]
+    return _score(model, X, y, scoring)
+
+
+# ============================================================================
+# SELECTOR
+# ============================================================================
+class GroupedPermutationSelector:
+    """Importancia por permutación de grupos de columnas en un holdout temporal."""
+
+    def __init__(self, estimator=None, n_repeats=5, holdout_frac=0.2, scoring=_auc,
+                 min_importance=MIN_IMPORTANCE, max_corr=MAX_CORR, level='pivot',
+                 dimensions=DIMENSIONS, time_dimensions=TIME_DIMENSIONS, dummies=(),
+                 validate=True, n_jobs=-1, random_state=RANDOM_STATE):
+        self.estimator = estimator
+        self.n_repeats = n_repeats
+        self.holdout_frac = holdout_frac
+        self.scoring = scoring
+        self.min_importance = min_importance
+        self.max_corr = max_corr
+        self.level = level
+        self.dimensions = dimensions
+        self.time_dimensions = time_dimensions
+        self.dummies = dummies
+        self.validate = validate
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+
+    def _estimator(self):
+        if self.estimator is not None:
+            return clone(self.estimator)
+        return HistGradientBoostingClassifier(max_iter=200, random_state=self.random_state)
+
+    def fit(self, X, y, dates):
+        """X: DataFrame numérico; y: objetivo; dates: FL_DATE (las más recientes → holdout)."""
+        columns = list(X.columns)
+        self.groups_ = feature_groups(columns, self.dimensions, self.time_dimensions,
+                                      self.dummies, self.level)
+        train, holdout = temporal_split(dates, calib_frac=1 - self.holdout_frac)
+        values = X.to_numpy(dtype=np.float32, na_value=np.nan)
+        y = np.asarray(y)
+        X_tr, y_tr, X_ho, y_ho = values[train], y[train], values[holdout], y[holdout]
+
+        start = time.perf_counter()
+        model = self._estimator().fit(X_tr, y_tr)
+        fit_s = time.perf_counter() - start
+        self.baseline_ = _score(model, X_ho, y_ho, self.scoring)
+
+        # Grupos redundantes entre sí: uno sustituye al otro y cada uno por separado
+        # parece no aportar, así que cada clúster se permuta además completo
+        position = {c: i for i, c in enumerate(columns)}
+        names = list(self.groups_)
+        cols = {g: np.array([position[c] for c in self.groups_[g]]) for g in names}
+        self.clusters_ = redundant_clusters(correlation_matrix(X_ho, random_state=self.random_state),
+                                            [cols[g] for g in names], self.max_corr)
+        units = names + [tuple(names[k] for k in c) for c in self.clusters_ if len(c) > 1]
+        unit_cols = {u: cols[u] if u in cols else np.concatenate([cols[g] for g in u]) for u in units}
+
+        # (grupo o clúster, repetición) en paralelo
+        seeds = np.random.SeedSequence(self.random_state).generate_state(len(units) * self.n_repeats)
+        jobs = [(u, r) for u in units for r in range(self.n_repeats)]
+        scores = Parallel(n_jobs=self.n_jobs)(
+            delayed(_permuted_score)(model, X_ho, y_ho, unit_cols[u], seeds[k], self.scoring)
+            for k, (u, r) in enumerate(jobs))
+        drops = self.baseline_ - np.asarray(scores).reshape(len(units), self.n_repeats)
+        importance = dict(zip(units, drops.mean(axis=1)))
+        spread = dict(zip(units, drops.std(axis=1)))
+
+        table = pd.DataFrame({
+            'grupo': names,
+            'n_columnas': [len(self.groups_[g]) for g in names],
+            'importancia': [importance[g] for g in names],
+            'importancia_std': [spread[g] for g in names],
+        })
+        status, partner, cluster_importance = {}, {}, {}
+        for c in self.clusters_:
+            members = [names[k] for k in c]
+            unit = members[0] if len(members) == 1 else tuple(members)
+            # Del clúster sobrevive el grupo más importante (a igualdad, el de menos columnas)
+            best = max(members, key=lambda g: (importance[g], -len(cols[g])))
+            for g in members:
+                cluster_importance[g] = importance[unit]
+                if importance[unit] < self.min_importance:
+                    status[g], partner[g] = 'ruido', None
+                else:
+                    status[g], partner[g] = ('conservar', None) if g == best else ('redundante', best)
+        table['importancia_cluster'] = [cluster_importance[g] for g in names]
+        table['estado'] = [status[g] for g in names]
+        table['redundante_con'] = pd.Series([partner[g] for g in names], dtype=object)
+        table = table.sort_values(['importancia_cluster', 'importancia'], ascending=False, ignore_index=True)
+        self.importances_ = table
+
+        kept = set(table.loc[table['estado'] == 'conservar', 'grupo'])
+        features = [c for c in columns if c in {f for g in kept for f in self.groups_[g]}]
+        self.plan_ = {
+            'baseline_score': float(self.baseline_),
+            'n_train': int(train.sum()), 'n_holdout': int(holdout.sum()),
+            'fit_s': fit_s,
+            'features': features,
+            'dropped': [c for c in columns if c not in set(features)],
+            'pivots': sorted({pivot_of(g) for g in kept} - {None}),
+            'groups': {row.grupo: {'columns': self.groups_[row.grupo], 'importance': float(row.importancia),
+                                   'importance_std': float(row.importancia_std),
+                                   'cluster_importance': float(row.importancia_cluster),
+                                   'status': row.estado, 'redundant_with': row.redundante_con}
+                       for row in table.itertuples()},
+        }
+        if self.validate and features:
+            keep = np.array([position[c] for c in features])
+            start = time.perf_counter()
+            pruned = self._estimator().fit(X_tr[:, keep], y_tr)
+            self.plan_['fit_s_pruned'] = time.perf_counter() - start
+            self.plan_['pruned_score'] = float(_score(pruned, X_ho[:, keep], y_ho, self.scoring))
+        return self
+
+    def save_plan(self, path):
+        with open(path, 'w') as fh:
+            json.dump(self.plan_, fh, indent=2, ensure_ascii=False, default=list)
+        return path
+
+
+def load_plan(path):
+    """Plan de features; 'pivots' vuelve como lista de tuplas (dimensión, temporalidad)."""
+    with open(path) as fh:
+        plan = json.load(fh)
+    plan['pivots'] = [tuple(p) for p in plan['pivots']]
+    return plan
@@ -0,0 +1,456 @@
+"""
+================================================================================
+CONSULTAS PEREZOSAS SOBRE UN ALMACÉN PARQUET PARTICIONADO
+================================================================================
+Propósito:
+    Cada pregunta nueva ("retraso por hora en DFW para AA en fin de semana")
+    obligaba a editar EDA.py o el notebook y volver a cargar el CSV completo
+    para un groupby global. Aquí:
+        • write_store() convierte el CSV de BTS (o el frame ya deduplicado)
+          en un almacén Parquet particionado al estilo hive:
+          YEAR=2025/MONTH=2/MKT_UNIQUE_CARRIER=AA/. Agrega columnas
+          derivadas baratas (DEP_HOUR, DOW, IS_WEEKEND, DEP_DELAY_15,
+          ARR_DELAY_15). El esquema se declara por nombre de columna
+          (STRING_COLS), no se infiere del primer bloque.
+        • refresh_store() reconstruye el almacén solo si cambia la huella
+          de la fuente.
+        • FlightQuery arma un plan perezoso filter → groupby → agg. Nada se
+          lee hasta collect().
+
+Funcionamiento:
+    • Proyección: solo se leen las columnas usadas por filtros, llaves y
+      agregados.
+    • Predicados: los filtros se traducen a expresiones de pyarrow.dataset.
+      Los de YEAR/MONTH/aerolínea descartan directorios completos; los demás
+      usan las estadísticas de cada row group antes de leer.
+    • Agregación: por lote se codifican las llaves a un entero y se acumulan
+      conteo, suma, suma² y mín/máx con np.bincount / reduceat. La memoria
+      depende del tamaño del lote y del número de grupos, no del archivo.
+
+Uso:
+    write_store('T_ONTIME_MARKETING.csv', 'store')
+    (FlightQuery('store')
+        .filter(ORIGIN='DFW', MKT_UNIQUE_CARRIER='AA', IS_WEEKEND=1)
+        .groupby('DEP_HOUR')
+        .agg(vuelos=('DEP_DELAY', 'count'), retraso_medio=('DEP_DELAY', 'mean'),
+             pct_15=('DEP_DELAY_15', 'mean'))
+        .collect())
+
+    python flight_query.py build T_ONTIME_MARKETING.csv store
+    python flight_query.py query store --where ORIGIN=DFW --where MKT_UNIQUE_CARRIER=AA \\
+        --where IS_WEEKEND=1 --by DEP_HOUR --agg DEP_DELAY:mean --agg DEP_DELAY_15:mean
+================================================================================
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from calendar_table import calendar_features
+
+CARRIER_COL = 'MKT_UNIQUE_CARRIER'
+PARTITION_COLS = ('YEAR', 'MONTH')
+CHUNK_ROWS = 500_000
+# Columnas de texto del archivo de BTS (+ MKT_CODES de codeshare_dedup); el resto es numérico
+STRING_COLS = frozenset(
+    ['MKT_UNIQUE_CARRIER', 'BRANDED_CODE_SHARE', 'MKT_CARRIER', 'OP_UNIQUE_CARRIER', 'OP_CARRIER',
+     'TAIL_NUM', 'DUP', 'CANCELLATION_CODE', 'DEP_TIME_BLK', 'ARR_TIME_BLK', 'MKT_CODES']
+    + [f'{side}{suffix}' for side in ('ORIGIN', 'DEST')
+       for suffix in ('', '_CITY_NAME', '_STATE_ABR', '_STATE_NM')]
+    + [f'DIV{i}_{col}' for i in range(1, 6) for col in ('AIRPORT', 'TAIL_NUM')])
+_STAMP = '_SOURCE.json'
+STORE_VERSION = 2                    # subir al cambiar columnas derivadas (2: *_15 con > 15)
+BATCH_ROWS = 1_000_000
+AGG_FUNCS = ('size', 'count', 'sum', 'mean', 'std', 'min', 'max')
+_OPS = {'==': pc.equal, '!=': pc.not_equal, '>': pc.greater, '>=': pc.greater_equal,
+        '<': pc.less, '<=': pc.less_equal}
+
+
+# ============================================================================
+# ESCRITURA DEL ALMACÉN
+# ============================================================================
+def _string_schema_cols(columns, carrier_col, string_cols):
+    return {c for c in columns if c in string_cols or c == carrier_col}
+
+
+def _schema(columns, carrier_col, string_cols):
+    """Esquema fijo a partir de los NOMBRES de columna (no de los valores de un lote).
+
+    Un lote donde CANCELLATION_CODE o DIV*_AIRPORT vienen todos nulos se
+    infiere como float; con el esquema declarado todos los lotes coinciden.
+    """
+    derived = {'FL_DATE': pa.date32(), 'YEAR': pa.int16(), 'MONTH': pa.int8(), 'DOW': pa.int8(),
+               'IS_WEEKEND': pa.int8(), 'DEP_HOUR': pa.int8(),
+               'DEP_DELAY_15': pa.float32(), 'ARR_DELAY_15': pa.float32()}
+    strings = _string_schema_cols(columns, carrier_col, string_cols)
+    return pa.schema([(c, derived.get(c, pa.string() if c in strings else pa.float64()))
+                      for c in columns])
+
+
+def _prepare_chunk(chunk, carrier_col, string_cols):
+    """Tipos declarados + columnas derivadas para consultas comunes."""
+    dates = pd.to_datetime(chunk['FL_DATE'], format='mixed')
+    out = chunk.drop(columns='FL_DATE')
+    strings = _string_schema_cols(out.columns, carrier_col, string_cols)
+    for col in out.columns:
+        if col in strings:
+            out[col] = out[col].astype(object).where(out[col].notna(), None)
+            continue
+        values = pd.to_numeric(out[col], errors='coerce')
+        if (values.isna() & out[col].notna()).any():
+            raise ValueError(f"La columna {col} trae texto pero no está declarada en string_cols")
+        out[col] = values.astype(np.float64)
+    out.insert(0, 'FL_DATE', dates.dt.date)
+    out['YEAR'] = dates.dt.year.astype(np.int16)
+    out['MONTH'] = dates.dt.month.astype(np.int8)
+    cal = calendar_features(dates, columns=['DOW', 'IS_WEEKEND'])
+    out['DOW'] = cal['DOW'].to_numpy().astype(np.int8)
+    out['IS_WEEKEND'] = cal['IS_WEEKEND'].to_numpy().astype(np.int8)
+    if 'CRS_DEP_TIME' in out.columns:
+        out['DEP_HOUR'] = ((out['CRS_DEP_TIME'] // 100) % 24).fillna(-1).astype(np.int8)
+    for col in ('DEP_DELAY', 'ARR_DELAY'):
+        if col in out.columns:
+            # > 15 como el objetivo del modelo (DEP_DELAY_15 del notebook, multi_target.TARGETS)
+            out[f'{col}_15'] = (out[col] > 15).astype(np.float32).where(out[col].notna())
+    out[carrier_col] = out[carrier_col].fillna('NA').astype(str)
+    return out
+
+
+def write_store(source, root, carrier_col=CARRIER_COL, chunk_rows=CHUNK_ROWS, string_cols=STRING_COLS):
+    """CSV de BTS (ruta) o DataFrame → Parquet particionado YEAR/MONTH/aerolínea (hive).
+
+    El CSV se lee por bloques con las columnas de texto declaradas
+    (`string_cols`); volver a escribir el mismo CSV reemplaza sus archivos
+    (mismo nombre base), otros CSV se agregan al almacén.
+    """
+    partitioning = ds.partitioning(
+        pa.schema([('YEAR', pa.int16()), ('MONTH', pa.int8()), (carrier_col, pa.string())]),
+        flavor='hive')
+    if isinstance(source, pd.DataFrame):
+        stem = 'frame'
+        chunks = (source.iloc[i:i + chunk_rows] for i in range(0, len(source), chunk_rows))
+    else:
+        stem = os.path.splitext(os.path.basename(source))[0]
+        chunks = pd.read_csv(source, chunksize=chunk_rows, low_memory=False,
+                             dtype={c: str for c in string_cols})
+    schema, n_rows = None, 0
+    for i, chunk in enumerate(chunks):
+        frame = _prepare_chunk(chunk, carrier_col, string_cols)
+        schema = schema or _schema(frame.columns, carrier_col, string_cols)
+        table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        ds.write_dataset(table, root, format='parquet', partitioning=partitioning,
+                         basename_template=f'{stem}-{i:04d}-{{i}}.parquet',
+                         existing_data_behavior='overwrite_or_ignore')
+        n_rows += len(frame)
+    return n_rows
+
+
+def refresh_store(source, root, fingerprint, **kwargs):
+    """Reconstruye `root` desde cero solo si cambió la huella de la fuente.
+
+    La huella (p. ej. stage_cache.frame_fingerprint del frame deduplicado)
+    y STORE_VERSION se guardan en root/_SOURCE.json; pyarrow ignora los
+    archivos con '_'. Regresa True si reconstruyó.
+    """
+    stamp = os.path.join(root, _STAMP)
+    if os.path.exists(stamp):
+        with open(stamp) as fh:
+            saved = json.load(fh)
+        if saved.get('fingerprint') == fingerprint and saved.get('version') == STORE_VERSION:
+            return False
+    if os.path.isdir(root):
+        shutil.rmtree(root)
+    n_rows = write_store(source, root, **kwargs)
+    with open(stamp, 'w') as fh:
+        json.dump({'fingerprint': fingerprint, 'version': STORE_VERSION, 'rows': n_rows}, fh)
+    return True
+
+
+def open_store(root, carrier_col=CARRIER_COL):
+    return ds.dataset(root, format='parquet', partitioning=ds.partitioning(
+        pa.schema([('YEAR', pa.int16()), ('MONTH', pa.int8()), (carrier_col, pa.string())]),
+        flavor='hive'))
+
+
+# ============================================================================
+# AGREGACIÓN POR LOTES
+# ============================================================================
+class _Accumulator:
+    """Estadísticos suficientes por grupo, crecen al aparecer grupos nuevos."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.keys = {}                  # tupla de llave → id de grupo
+        self.size = np.zeros(0)
+        self.stats = {c: {s: np.zeros(0) for s in ('n', 'sum', 'sumsq', 'min', 'max')}
+                      for c in columns}
+
+    def _grow(self, n_groups):
+        extra = n_groups - len(self.size)
+        if extra <= 0:
+            return
+        self.size = np.r_[self.size, np.zeros(extra)]
+        for st in self.stats.values():
+            for name, fill in (('n', 0), ('sum', 0), ('sumsq', 0), ('min', np.inf), ('max', -np.inf)):
+                st[name] = np.r_[st[name], np.full(extra, fill, dtype=np.float64)]
+
+    def _group_ids(self, key_arrays, n_rows):
+        if not key_arrays:
+            self.keys.setdefault((), 0)
+            return np.zeros(n_rows, dtype=np.int64)
+        codes, uniques = zip(*(pd.factorize(a, use_na_sentinel=False) for a in key_arrays))
+        combined = np.zeros(n_rows, dtype=np.int64)
+        for c, u in zip(codes, uniques):
+            combined = combined * len(u) + c
+        local, inverse = np.unique(combined, return_inverse=True)
+        # decodificar cada combinación local a su tupla de valores
+        parts, rest = [], local
+        for u in reversed(uniques):
+            # NaN != NaN: sin normalizar, cada lote abriría otro grupo de nulos
+            u = np.asarray(pd.Series(u, dtype=object).where(pd.notna(u), None), dtype=object)
+            parts.append(u[rest % len(u)])
+            rest = rest // len(u)
+        tuples = list(zip(*reversed(parts)))
+        to_global = np.array([self.keys.setdefault(t, len(self.keys)) for t in tuples], dtype=np.int64)
+        return to_global[inverse]
+
+    def update(self, key_arrays, value_arrays, n_rows):
+        gid = self._group_ids(key_arrays, n_rows)
+        n_groups = len(self.keys)
+        self._grow(n_groups)
+        self.size += np.bincount(gid, minlength=n_groups)
+        if not n_rows:
+            return
+        order = np.argsort(gid, kind='stable')
+        g_sorted = gid[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(g_sorted)) + 1]
+        present = g_sorted[starts]
+        for col in self.columns:
+            v = value_arrays[col]
+            ok = ~np.isnan(v)
+            w = np.where(ok, v, 0.0)
+            st = self.stats[col]
+            st['n'] += np.bincount(gid, weights=ok, minlength=n_groups)
+            st['sum'] += np.bincount(gid, weights=w, minlength=n_groups)
+            st['sumsq'] += np.bincount(gid, weights=w * w, minlength=n_groups)
+            vs = v[order]
+            st['min'][present] = np.fmin(st['min'][present], np.fmin.reduceat(vs, starts))
+            st['max'][present] = np.fmax(st['max'][present], np.fmax.reduceat(vs, starts))
+
+    def result(self, by, aggs):
+        index = list(self.keys)
+        out = {}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for name, (col, func) in aggs.items():
+                if func == 'size':
+                    out[name] = self.size.astype(np.int64)
+                    continue
+                st = self.stats[col]
+                n = st['n']
+                if func == 'count':
+                    out[name] = n.astype(np.int64)
+                elif func == 'sum':
+                    out[name] = st['sum']
+                elif func == 'mean':
+                    out[name] = st['sum'] / n
+                elif func == 'std':
+                    var = (st['sumsq'] - st['sum'] ** 2 / n) / (n - 1)
+                    out[name] = np.sqrt(np.maximum(var, 0))
+                else:
+                    out[name] = np.where(np.isinf(st[func]), np.nan, st[func])
+        frame = pd.DataFrame(out)
+        if by:
+            frame.index = pd.MultiIndex.from_tuples(index, names=by) if len(by) > 1 \
+                else pd.Index([k[0] for k in index], name=by[0])
+            return frame.sort_index()
+        return frame
+
+
+# ============================================================================
+# PLAN PEREZOSO
+# ============================================================================
+class FlightQuery:
+    """filter → groupby → agg sobre el almacén; collect() ejecuta el plan."""
+
+    def __init__(self, source, carrier_col=CARRIER_COL, batch_rows=BATCH_ROWS):
+        self.dataset = source if isinstance(source, ds.Dataset) else open_store(source, carrier_col)
+        self.batch_rows = batch_rows
+        self._filters = []              # (columna, op, valor)
+        self._by = []
+        self._aggs = {}
+        self._select = None
+
+    def _copy(self):
+        q = FlightQuery(self.dataset, batch_rows=self.batch_rows)
+        q._filters, q._by, q._aggs = list(self._filters), list(self._by), dict(self._aggs)
+        q._select = self._select
+        return q
+
+    def _check(self, col):
+        if col not in self.dataset.schema.names:
+            raise KeyError(f"Columna inexistente en el almacén: {col}")
+
+    def filter(self, **equals):
+        """Igualdad (escalar) o pertenencia (lista/tupla/set) por columna."""
+        q = self._copy()
+        for col, value in equals.items():
+            q = q.where(col, 'in' if isinstance(value, (list, tuple, set, range)) else '==', value)
+        return q
+
+    def where(self, col, op, value):
+        """Predicado general: op en ==, !=, >, >=, <, <=, in, between."""
+        self._check(col)
+        if op not in _OPS and op not in ('in', 'between'):
+            raise ValueError(f"Operador no soportado: {op}")
+        q = self._copy()
+        q._filters.append((col, op, value))
+        return q
+
+    def groupby(self, *cols):
+        for c in cols:
+            self._check(c)
+        q = self._copy()
+        q._by = list(cols)
+        return q
+
+    def agg(self, **aggs):
+        """nombre=(columna, función) con función en size/count/sum/mean/std/min/max."""
+        for name, (col, func) in aggs.items():
+            if func not in AGG_FUNCS:
+                raise ValueError(f"Función de agregación no soportada: {func}")
+            if func != 'size':
+                self._check(col)
+        q = self._copy()
+        q._aggs.update(aggs)
+        return q
+
+    def select(self, *cols):
+        for c in cols:
+            self._check(c)
+        q = self._copy()
+        q._select = list(cols)
+        return q
+
+    # ── Traducción a pyarrow ────────────────────────────────────────────────
+    def _scalar(self, col, value):
+        if pa.types.is_date(self.dataset.schema.field(col).type):
+            return pd.Timestamp(value).date()
+        return value
+
+    def expression(self):
+        expr = None
+        for col, op, value in self._filters:
+            f = ds.field(col)
+            if op == 'in':
+                e = f.isin([self._scalar(col, v) for v in value])
+            elif op == 'between':
+                lo, hi = value
+                e = (f >= self._scalar(col, lo)) & (f <= self._scalar(col, hi))
+            else:
+                e = _OPS[op](f, self._scalar(col, value))
+            expr = e if expr is None else expr & e
+        return expr
+
+    def columns(self):
+        if not self._aggs:
+            return self._select or self.dataset.schema.names
+        cols = list(self._by) + [c for c, f in self._aggs.values() if f != 'size']
+        return list(dict.fromkeys(cols)) or [self.dataset.schema.names[0]]
+
+    def explain(self):
+        """Columnas leídas, predicado y archivos que sobreviven a la poda."""
+        expr = self.expression()
+        files = list(self.dataset.get_fragments(filter=expr))
+        total = len(list(self.dataset.get_fragments()))
+        return (f"columnas: {self.columns()}\n"
+                f"filtro:   {expr}\n"
+                f"archivos: {len(files)} de {total} tras podar particiones")
+
+    # ── Ejecución ───────────────────────────────────────────────────────────
+    def collect(self):
+        scanner = self.dataset.scanner(columns=self.columns(), filter=self.expression(),
+                                       batch_size=self.batch_rows)
+        if not self._aggs:
+            return scanner.to_table().to_pandas()
+
+        value_cols = list(dict.fromkeys(c for c, f in self._aggs.values() if f != 'size'))
+        acc = _Accumulator(value_cols)
+        for batch in scanner.to_batches():
+            if not batch.num_rows:
+                continue
+            keys = [batch.column(c).to_numpy(zero_copy_only=False) for c in self._by]
+            values = {c: batch.column(c).to_numpy(zero_copy_only=False).astype(np.float64)
+                      for c in value_cols}
+            acc.update(keys, values, batch.num_rows)
+        return acc.result(self._by, self._aggs)
+
+
+# ============================================================================
+# LÍNEA DE COMANDOS
+# ============================================================================
+def _parse_where(text):
+    for op in ('>=', '<=', '!=', '>', '<', '='):
+        if op in text:
+            col, value = text.split(op, 1)
+            op = '==' if op == '=' else op
+            if ',' in value:
+                return col, 'in', [_number(v) for v in value.split(',')]
+            return col, op, _number(value)
+    raise ValueError(f"Filtro inválido: {text} (usar COL=valor, COL>=valor, COL=a,b,c)")
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        try:
+            return float(text)
+        except ValueError:
+            return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Almacén Parquet particionado y consultas perezosas')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='CSV de BTS → almacén particionado')
+    build.add_argument('csv')
+    build.add_argument('root')
+    build.add_argument('--carrier', default=CARRIER_COL)
+    query = sub.add_parser('query', help='filter/groupby/agg sobre el almacén')
+    query.add_argument('root')
+    query.add_argument('--where', action='append', default=[], help='COL=valor, COL>=valor, COL=a,b')
+    query.add_argument('--by', action='append', default=[])
+    query.add_argument('--agg', action='append', default=[], help='COL:func (size/count/sum/mean/std/min/max)')
+    query.add_argument('--carrier', default=CARRIER_COL)
+    query.add_argument('--explain', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        n = write_store(args.csv, args.root, carrier_col=args.carrier)
+        print(f"{n:,} filas escritas en {args.root}")
+        return
+
+    q = FlightQuery(args.root, carrier_col=args.carrier)
+    for text in args.where:
+        q = q.where(*_parse_where(text))
+    if args.by:
+        q = q.groupby(*args.by)
+    aggs = {}
+    for text in args.agg or ['DEP_DELAY:mean']:
+        col, func = text.split(':')
+        aggs[f'{col}_{func}'] = (col, func)
+    q = q.agg(vuelos=(None, 'size'), **aggs)
+    if args.explain:
+        print(q.explain())
+    print(q.collect().to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+================================================================================
+PRUEBAS NO PARAMÉTRICAS AGRUPADAS - KRUSKAL-WALLIS CON UN SOLO RANKING
+================================================================================
+Propósito:
+    Probar si la distribución del target difiere entre los grupos de varias
+    llaves (aerolínea, ruta, origen, día de la semana, hora) sin construir una
+    lista de arreglos por grupo ni volver a rankear dentro de scipy en cada
+    prueba.
+
+Funcionamiento:
+    1. El target se ordena UNA sola vez (rangos promedio, bloques de empates).
+    2. Para cada llave, los grupos se codifican como enteros y la suma de
+       rangos por grupo sale de un np.bincount.
+    3. Si se excluyen grupos pequeños (min_count), los rangos del subconjunto
+       se reconstruyen a partir del orden global con sumas acumuladas, sin
+       volver a ordenar.
+    4. H incluye la corrección por empates; el p-valor asintótico es χ²(k-1)
+       y, opcionalmente, se calcula un p-valor por permutaciones en paralelo.
+================================================================================
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2
+
+
+def group_codes(df, key):
+    """Codifica una llave (columna, lista de columnas o arreglo) en enteros.
+
+    Los nulos quedan con código -1.
+    """
+    if isinstance(key, str):
+        codes, _ = pd.factorize(df[key])
+        return codes.astype(np.int64)
+    if isinstance(key, (list, tuple)):
+        codes = df.groupby(list(key), sort=False).ngroup().to_numpy(dtype=np.float64)
+        return np.nan_to_num(codes, nan=-1).astype(np.int64)
+    codes, _ = pd.factorize(np.asarray(key))
+    return codes.astype(np.int64)
+
+
+class _RankIndex:
+    """Orden global del target: permutación de orden y bloques de empates."""
+
+    def __init__(self, y):
+        self.order = np.argsort(y, kind='mergesort')
+        y_sorted = y[self.order]
+        new_block = np.empty(len(y_sorted), dtype=bool)
+        new_block[:1] = True
+        new_block[1:] = y_sorted[1:] != y_sorted[:-1]
+        self.block = np.cumsum(new_block) - 1          # id de bloque de empate (orden)
+        self.n_blocks = int(self.block[-1]) + 1 if len(y) else 0
+
+    def ranks(self, keep):
+        """Rangos promedio (1..n) de los elementos con keep=True, y tamaños de empates."""
+        keep_sorted = keep[self.order]
+        pos = np.cumsum(keep_sorted)                    # posición entre los conservados
+        blk = self.block[keep_sorted]
+        p = pos[keep_sorted].astype(np.float64)
+        tie_n = np.bincount(blk, minlength=self.n_blocks)
+        tie_sum = np.bincount(blk, weights=p, minlength=self.n_blocks)
+        avg = np.divide(tie_sum, tie_n, out=np.zeros_like(tie_sum), where=tie_n > 0)
+
+        ranks = np.empty(len(keep), dtype=np.float64)
+        ranks[self.order[keep_sorted]] = avg[blk]
+        return ranks[keep], tie_n[tie_n > 0]
+
+
+def _h_statistic(ranks, codes, n_groups, n_obs):
+    rank_sum = np.bincount(codes, weights=ranks, minlength=n_groups)
+    sizes = np.bincount(codes, minlength=n_groups)
+    return 12.0 / (n_obs * (n_obs + 1)) * np.sum(rank_sum ** 2 / sizes) - 3.0 * (n_obs + 1)
+
+
+def _permutation_worker(args):
+    ranks, codes, n_groups, h_obs, tie_corr, n_perm, seed = args
+    rng = np.random.default_rng(seed)
+    n_obs = len(ranks)
+    hits = 0
+    for _ in range(n_perm):
+        h = _h_statistic(ranks, rng.permutation(codes), n_groups, n_obs) / tie_corr
+        hits += h >= h_obs
+    return hits
+
+
+def _permutation_pvalue(ranks, codes, n_groups, h_obs, tie_corr, n_permutations,
+                        n_jobs, random_state):
+    n_jobs = os.cpu_count() if n_jobs in (None, -1) else max(1, n_jobs)
+    n_jobs = min(n_jobs, n_permutations)
+    chunks = np.array_split(np.arange(n_permutations), n_jobs)
+    seeds = np.random.SeedSequence(random_state).spawn(n_jobs)
+    tasks = [(ranks, codes, n_groups, h_obs, tie_corr, len(c), s) for c, s in zip(chunks, seeds)]
+
+    if n_jobs == 1:
+        hits = sum(_permutation_worker(t) for t in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            hits = sum(pool.map(_permutation_worker, tasks))
+    return (hits + 1) / (n_permutations + 1)
+
+
+def kruskal_by_keys(df, target, keys, min_count=30, n_permutations=0,
+                    n_jobs=-1, random_state=42):
+    """Kruskal-Wallis del target contra varias llaves de agrupación.
+
+    Parámetros
+    ----------
+    df : DataFrame con el target y las columnas de las llaves.
+    target : columna numérica (los nulos se ignoran).
+    keys : dict {nombre: llave} o lista de columnas. Una llave puede ser una
+        columna, una lista de columnas (p. ej. ['ORIGIN', 'DEST'] para ruta)
+        o un arreglo alineado con df.
+    min_count : grupos con menos observaciones se excluyen de la prueba
+        (mismo criterio que `len(g) > 30` del script original).
+    n_permutations : si > 0, agrega un p-valor por permutación de etiquetas.
+
+    Regresa un DataFrame con una fila por llave: H, gl, p_value, n_grupos,
+    n_obs, epsilon² (tamaño de efecto) y p_perm si aplica.
+    """
+    if not isinstance(keys, dict):
+        keys = {k if isinstance(k, str) else '-'.join(k): k for k in keys}
+
+    y = df[target].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(y)
+    index = _RankIndex(np.where(valid, y, np.inf))
+
+    rows = []
+    for name, key in keys.items():
+        codes = group_codes(df, key)
+        ok_rows = valid & (codes >= 0)
+        counts = np.bincount(codes[ok_rows], minlength=max(codes.max() + 1, 1))
+        big = counts > min_count
+        keep = ok_rows & big[np.where(codes >= 0, codes, 0)]
+
+        # Reindexar grupos conservados a 0..k-1
+        remap = np.cumsum(big) - 1
+        kept_codes = remap[codes[keep]]
+        n_groups = int(big.sum())
+        n_obs = int(keep.sum())
+
+        row = {'llave': name, 'n_grupos': n_groups, 'n_obs': n_obs}
+        if n_groups < 2:
+            row.update(H=np.nan, gl=np.nan, p_value=np.nan, epsilon2=np.nan)
+            rows.append(row)
+            continue
+
+        ranks, ties = index.ranks(keep)
+        tie_corr = 1.0 - np.sum(ties.astype(np.float64) ** 3 - ties) / (float(n_obs) ** 3 - n_obs)
+        h = _h_statistic(ranks, kept_codes, n_groups, n_obs) / tie_corr
+
+        row.update(H=h, gl=n_groups - 1, p_value=chi2.sf(h, n_groups - 1),
+                   epsilon2=h / (n_obs - 1))
+        if n_permutations > 0:
+            row['p_perm'] = _permutation_pvalue(ranks, kept_codes, n_groups, h, tie_corr,
+                                                n_permutations, n_jobs, random_state)
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index('llave')
@@ -0,0 +1,194 @@
+"""
+================================================================================
+PAQUETE VERSIONADO DEL MODELO - ESTIMADOR + PREPROCESAMIENTO
+================================================================================
+Propósito:
+    El único artefacto era `pd.to_pickle(final_model, 'final_model.pkl')`:
+    sin las tablas de agregados (pivotes por aerolínea/aeropuerto), ni las
+    columnas dummy, ni los límites de recorte, ni el orden de columnas. Un
+    proceso de scoring tenía que reconstruirlos a mano y podía desalinearse
+    del entrenamiento. Además un RandomForest grande en pickle carga lento.
+
+Estructura (un directorio por versión):
+    models/
+      v0003/
+        manifest.json        versión, columnas en orden, plan de tipos,
+                             límites de recorte, dummies, lookups, sha256
+        estimator.joblib     joblib sin compresión → los arreglos grandes
+                             (árboles, coeficientes) se abren con mmap_mode='r'
+        lookups/*.parquet    tablas de agregados para unir por llave
+
+    prepare(df) aplica exactamente el preprocesamiento guardado (lookups →
+    dummies → recorte → orden de columnas → tipos). El estimador se entrena
+    con prepare_frame y los mismos parámetros, así que entrenamiento y
+    scoring ven la misma matriz.
+
+Uso:
+    prep = {'features': features, 'clip_bounds': fit_clip_bounds(X), 'dtype_plan': plan_dtypes(X)}
+    final_model.fit(prepare_frame(df, **prep), y)        # misma matriz que al puntuar
+    save_bundle('models', final_model, lookups={'flag_ORIGIN_DOW': (tabla, 'ORIGIN')}, **prep)
+    bundle = load_bundle('models')                 # última versión
+    p = bundle.predict_proba(df_mes_nuevo)
+================================================================================
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import re
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from dtype_plan import apply_dtype_plan
+
+_MANIFEST = 'manifest.json'
+_ESTIMATOR = 'estimator.joblib'
+_VERSION_RE = re.compile(r'^v(\d{4,})$')
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(8 * 1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _versions(root):
+    if not os.path.isdir(root):
+        return []
+    return sorted(int(m.group(1)) for m in map(_VERSION_RE.match, os.listdir(root)) if m)
+
+
+def fit_clip_bounds(X, quantiles=(0.001, 0.999)):
+    """Límites de recorte por columna numérica (cuantiles del entrenamiento)."""
+    num = X.select_dtypes('number')
+    q = num.quantile(list(quantiles))
+    return {c: [float(q.iloc[0][c]), float(q.iloc[1][c])] for c in num.columns
+            if q[c].notna().all()}
+
+
+def prepare_frame(df, features, lookups=(), dummies=None, clip_bounds=None, dtype_plan=None):
+    """Preprocesamiento del paquete: lookups → dummies → recorte → orden de columnas → tipos.
+
+    El estimador debe entrenarse con esta misma salida (ver Uso); si no, el
+    recorte y los tipos aplicados al puntuar no coinciden con el ajuste.
+    Solo se unen las columnas de un lookup que df no trae ya (X_YYYY-MM.csv
+    llega con los pivotes unidos).
+    """
+    out = df
+    for table, key in lookups or ():
+        missing = [c for c in table.columns if c != key and c not in out.columns]
+        if missing:
+            out = out.merge(table[[key] + missing], on=key, how='left')
+    dummies_ = {}
+    for col, categories in (dummies or {}).items():
+        values = out[col].astype(str)
+        for cat in categories:
+            dummies_[f'{col}_{cat}'] = (values == str(cat)).astype(np.int8)
+    if dummies_:
+        out = pd.concat([out, pd.DataFrame(dummies_, index=out.index)], axis=1)
+    X = out.reindex(columns=list(features))
+    for col, (lo, hi) in (clip_bounds or {}).items():
+        if col in X.columns:
+            X[col] = X[col].clip(lo, hi)
+    return apply_dtype_plan(X, dtype_plan or {})
+
+
+def save_bundle(root, estimator, features, lookups=None, dummies=None, clip_bounds=None,
+                dtype_plan=None, target=None, metadata=None):
+    """Guarda una nueva versión del paquete y regresa su directorio.
+
+    lookups: {nombre: (DataFrame, llave)} — se unen con left join por llave.
+    dummies: {columna: [categorías]} — one-hot con columnas fijas.
+    """
+    version = (_versions(root) or [0])[-1] + 1
+    path = os.path.join(root, f'v{version:04d}')
+    os.makedirs(os.path.join(path, 'lookups'))
+
+    joblib.dump(estimator, os.path.join(path, _ESTIMATOR), compress=0)
+    lookup_meta = {}
+    for name, (table, key) in (lookups or {}).items():
+        table = table.reset_index() if key not in table.columns else table
+        fname = os.path.join('lookups', f'{name}.parquet')
+        table.to_parquet(os.path.join(path, fname), index=False)
+        lookup_meta[name] = {'file': fname, 'key': key,
+                             'columns': [c for c in table.columns if c != key]}
+
+    files = [_ESTIMATOR] + [m['file'] for m in lookup_meta.values()]
+    manifest = {
+        'version': version,
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'estimator': {'file': _ESTIMATOR, 'class': type(estimator).__name__,
+                      'sklearn': sklearn.__version__},
+        'target': target,
+        'features': list(features),
+        'lookups': lookup_meta,
+        'dummies': {c: list(map(str, v)) for c, v in (dummies or {}).items()},
+        'clip_bounds': clip_bounds or {},
+        'dtype_plan': dtype_plan or {},
+        'sha256': {f: _sha256(os.path.join(path, f)) for f in files},
+        'metadata': metadata or {},
+    }
+    with open(os.path.join(path, _MANIFEST), 'w') as fh:
+        json.dump(manifest, fh, indent=2, ensure_ascii=False, default=str)
+    return path
+
+
+def load_bundle(root, version='latest', verify=False, mmap=True):
+    """Carga un paquete: `root` puede ser el directorio de versiones o una versión.
+
+    verify=True compara el sha256 de cada archivo con el manifiesto (lee
+    todo el estimador; usar al desplegar, no en cada arranque).
+    mmap=True abre los arreglos del estimador con mmap_mode='r' (arranque en frío rápido).
+    """
+    path = root
+    if not os.path.exists(os.path.join(root, _MANIFEST)):
+        versions = _versions(root)
+        if not versions:
+            raise FileNotFoundError(f"No hay versiones de modelo en {root}")
+        number = versions[-1] if version == 'latest' else int(str(version).lstrip('v'))
+        path = os.path.join(root, f'v{number:04d}')
+    return ModelBundle(path, verify=verify, mmap=mmap)
+
+
+class ModelBundle:
+    """Estimador + preprocesamiento congelado de una versión del paquete."""
+
+    def __init__(self, path, verify=False, mmap=True):
+        self.path = path
+        with open(os.path.join(path, _MANIFEST)) as fh:
+            self.manifest = json.load(fh)
+        if verify:
+            self.verify()
+        self.estimator = joblib.load(os.path.join(path, self.manifest['estimator']['file']),
+                                     mmap_mode='r' if mmap else None)
+        self.features = self.manifest['features']
+        self.lookups = {name: (pd.read_parquet(os.path.join(path, meta['file'])), meta['key'])
+                        for name, meta in self.manifest['lookups'].items()}
+
+    def verify(self):
+        """Lanza ValueError si algún archivo no coincide con su sha256."""
+        for fname, digest in self.manifest['sha256'].items():
+            if _sha256(os.path.join(self.path, fname)) != digest:
+                raise ValueError(f"{fname} no coincide con el sha256 del manifiesto ({self.path})")
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    def prepare(self, df):
+        """Matriz de features en el orden y tipos del entrenamiento."""
+        m = self.manifest
+        return prepare_frame(df, self.features, self.lookups.values(), m['dummies'],
+                             m['clip_bounds'], m['dtype_plan'])
+
+    def predict_proba(self, df):
+        return self.estimator.predict_proba(self.prepare(df))[:, 1]
+
+    def predict(self, df):
+        return self.estimator.predict(self.prepare(df))
@@ -0,0 +1,200 @@
+"""
+================================================================================
+ENTRENAMIENTO OUT-OF-CORE - partial_fit SOBRE PARTICIONES MENSUALES
+================================================================================
+Propósito:
+    model.ipynb hace `X = df[features]` sobre un mes y `final_model.fit(X, y)`
+    en memoria. Con un año o más de vuelos BTS eso no cabe en RAM. Aquí los
+    archivos mensuales de features (X_2025-01.csv, ...) se leen en lotes y se
+    pasan a modelos incrementales:
+        • 'sgd'     SGDClassifier(loss='log_loss') sobre features numéricas
+        • 'nb'      BernoulliNB sobre features estandarizadas binarizadas
+        • 'hashed'  SGDClassifier(log_loss) + FeatureHasher de las columnas
+                    categóricas (ORIGIN, DEST, aerolínea, ...) sin diccionario
+
+Funcionamiento:
+    • Cada lote: estandarización incremental (StandardScaler.partial_fit),
+      nulos → 0 (la media), partial_fit del modelo.
+    • Al terminar cada partición se guarda un checkpoint (joblib); si el
+      proceso se interrumpe, fit() reanuda desde la última partición.
+    • La memoria depende de `batch_size`, no del número de meses.
+    • evaluate() mide AUC / log loss / Brier en un mes futuro reservado.
+
+Uso:
+    trainer = OutOfCoreTrainer(model='sgd', checkpoint_dir='checkpoints')
+    trainer.fit(['X_2025-01.csv', 'X_2025-02.csv', 'X_2025-03.csv'])
+    trainer.evaluate('X_2025-04.csv')
+
+    python out_of_core.py X_2025-0[1-3].csv --holdout X_2025-04.csv --model hashed
+================================================================================
+"""
+
+import argparse
+import glob
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import brier_score_loss, log_loss, roc_auc_score
+from sklearn.naive_bayes import BernoulliNB
+from sklearn.preprocessing import StandardScaler
+
+from multi_target import OUTCOME_COLS
+
+ID_COLS = ['FL_DATE', 'OP_UNIQUE_CARRIER', 'TAIL_NUM', 'ORIGIN', 'DEST']
+TARGET = 'DEP_DELAY_15'
+HASHED_COLS = ['OP_UNIQUE_CARRIER', 'ORIGIN', 'DEST']
+BATCH_SIZE = 50_000
+N_HASH_FEATURES = 2 ** 18
+RANDOM_STATE = 42
+CLASSES = np.array([0, 1])
+
+
+def iter_batches(path, batch_size=BATCH_SIZE, columns=None):
+    """Lee un archivo de features en DataFrames de a lo más batch_size filas."""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=batch_size, usecols=columns)
+
+
+class OutOfCoreTrainer:
+    """Entrenamiento incremental por particiones mensuales con checkpoints."""
+
+    def __init__(self, model='sgd', features=None, target=TARGET, id_cols=ID_COLS,
+                 outcome_cols=OUTCOME_COLS, hashed_cols=HASHED_COLS, batch_size=BATCH_SIZE, checkpoint_dir=None,
+                 random_state=RANDOM_STATE):
+        if model not in ('sgd', 'nb', 'hashed'):
+            raise ValueError("model debe ser 'sgd', 'nb' o 'hashed'")
+        self.model_name = model
+        self.features = list(features) if features is not None else None
+        self.target = target
+        self.id_cols = list(id_cols)
+        self.outcome_cols = list(outcome_cols)
+        self.hashed_cols = list(hashed_cols) if model == 'hashed' else []
+        self.batch_size = batch_size
+        self.checkpoint_dir = checkpoint_dir
+        self.random_state = random_state
+
+        self.scaler = StandardScaler()
+        self.hasher = FeatureHasher(n_features=N_HASH_FEATURES, input_type='string')
+        if model == 'nb':
+            self.model = BernoulliNB(binarize=0.0)
+        else:
+            # Tasa adaptativa + promedio de pesos: probabilidades estables entre lotes
+            self.model = SGDClassifier(loss='log_loss', alpha=1e-5, learning_rate='adaptive',
+                                       eta0=0.01, average=True, random_state=random_state)
+        self.partitions_done = []
+        self.n_seen = 0
+
+    # ── Transformación por lote ─────────────────────────────────────────────
+    def _infer_features(self, batch):
+        # DEP_DELAY/ARR_DELAY/CANCELLED vienen en el archivo pero definen los objetivos (leakage)
+        skip = set(self.id_cols) | set(self.outcome_cols) | {self.target}
+        return [c for c in batch.columns
+                if c not in skip and pd.api.types.is_numeric_dtype(batch[c])]
+
+    def _matrix(self, batch, fit_scaler):
+        num = batch.reindex(columns=self.features).to_numpy(dtype=np.float64)
+        if fit_scaler:
+            self.scaler.partial_fit(num)
+        num = np.nan_to_num(self.scaler.transform(num), nan=0.0, posinf=0.0, neginf=0.0)
+        if not self.hashed_cols:
+            return num
+        tokens = batch.reindex(columns=self.hashed_cols).astype(str).to_numpy()
+        rows = [[f'{c}={v}' for c, v in zip(self.hashed_cols, row)] for row in tokens]
+        return sparse.hstack([sparse.csr_matrix(num), self.hasher.transform(rows)]).tocsr()
+
+    # ── Entrenamiento ───────────────────────────────────────────────────────
+    def _checkpoint_path(self):
+        return os.path.join(self.checkpoint_dir, 'checkpoint.joblib')
+
+    def _save_checkpoint(self):
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        tmp = self._checkpoint_path() + '.tmp'
+        joblib.dump(self, tmp)
+        os.replace(tmp, self._checkpoint_path())
+
+    @classmethod
+    def resume(cls, checkpoint_dir):
+        """Carga el último checkpoint de checkpoint_dir."""
+        return joblib.load(os.path.join(checkpoint_dir, 'checkpoint.joblib'))
+
+    def fit(self, partitions):
+        """partial_fit sobre las particiones en orden cronológico.
+
+        Particiones ya registradas en el checkpoint se saltan (reanudación).
+        """
+        if self.checkpoint_dir and os.path.exists(self._checkpoint_path()):
+            state = self.resume(self.checkpoint_dir)
+            if state.model_name == self.model_name:
+                self.__dict__.update(state.__dict__)
+
+        for path in sorted(partitions):
+            name = os.path.basename(path)
+            if name in self.partitions_done:
+                continue
+            for batch in iter_batches(path, self.batch_size):
+                batch = batch[batch[self.target].notna()]
+                if not len(batch):
+                    continue
+                if self.features is None:
+                    self.features = self._infer_features(batch)
+                X = self._matrix(batch, fit_scaler=True)
+                y = batch[self.target].to_numpy(dtype=np.int64)
+                self.model.partial_fit(X, y, classes=CLASSES)
+                self.n_seen += len(batch)
+            self.partitions_done.append(name)
+            if self.checkpoint_dir:
+                self._save_checkpoint()
+        return self
+
+    # ── Predicción y evaluación ─────────────────────────────────────────────
+    def predict_proba(self, df):
+        return self.model.predict_proba(self._matrix(df, fit_scaler=False))[:, 1]
+
+    def evaluate(self, path):
+        """Métricas sobre un mes reservado (futuro), leído también por lotes."""
+        y_true, y_prob = [], []
+        for batch in iter_batches(path, self.batch_size):
+            batch = batch[batch[self.target].notna()]
+            if len(batch):
+                y_true.append(batch[self.target].to_numpy(dtype=np.int64))
+                y_prob.append(self.predict_proba(batch))
+        y_true, y_prob = np.concatenate(y_true), np.concatenate(y_prob)
+        return {
+            'particion': os.path.basename(path),
+            'n': len(y_true),
+            'roc_auc': roc_auc_score(y_true, y_prob) if len(np.unique(y_true)) > 1 else np.nan,
+            'log_loss': log_loss(y_true, np.clip(y_prob, 1e-15, 1 - 1e-15), labels=CLASSES),
+            'brier': brier_score_loss(y_true, y_prob),
+            'tasa_positivos': y_true.mean(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Entrenamiento out-of-core por particiones mensuales')
+    parser.add_argument('partitions', nargs='+', help='Archivos X_YYYY-MM.csv/.parquet (o patrones glob)')
+    parser.add_argument('--holdout', help='Mes futuro reservado para evaluación')
+    parser.add_argument('--model', default='sgd', choices=['sgd', 'nb', 'hashed'])
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--checkpoint-dir', default='checkpoints')
+    args = parser.parse_args()
+
+    paths = sorted(p for pattern in args.partitions for p in glob.glob(pattern))
+    trainer = OutOfCoreTrainer(model=args.model, batch_size=args.batch_size,
+                               checkpoint_dir=args.checkpoint_dir)
+    trainer.fit(paths)
+    print(f"Particiones entrenadas: {', '.join(trainer.partitions_done)} ({trainer.n_seen:,} filas)")
+    if args.holdout:
+        print(pd.Series(trainer.evaluate(args.holdout)).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+================================================================================
+PIVOTES DIMENSIÓN × TEMPORALIDAD EN PARALELO - FRAME EN MEMORIA COMPARTIDA
+================================================================================
+Propósito:
+    El notebook mensual recorre `for dimension in l_dimension: for
+    time_dimension in l_time_dimension:` y en cada combinación hace un
+    groupby (mean, o mean/std/median) seguido de un pivot_table, una
+    combinación a la vez en un solo núcleo. Aquí:
+        • Las columnas de valores del mes se copian UNA vez a un bloque de
+          memoria compartida (float64, n_columnas × n_filas) y las llaves,
+          ya factorizadas, a otro (int32). Los procesos se conectan por
+          nombre: el frame nunca se serializa.
+        • Cada tarea es (dimensión, temporalidad, bloque de columnas) y
+          regresa solo la tabla ancha, que es pequeña.
+        • Mismos nombres que el notebook:
+              {dimension}_{feature}_{time_dimension}_{valor}
+          con feature = {columna}_{estadístico}. El loop de flags usaba
+          `c[0]+'_'+c[1]` sobre columnas de un solo nivel (tomaba las dos
+          primeras letras: 'FLAG_EARLY_DEP' → 'F_L', con colisiones); aquí
+          queda 'FLAG_EARLY_DEP_mean'.
+
+Funcionamiento (por tarea):
+    grupo = código_dimensión · n_temporalidad + código_temporalidad
+    mean/std: np.bincount de suma, conteo y desviaciones (ddof=1, como pandas).
+    median:   rango global por columna (un argsort, también en memoria
+              compartida); dentro de la tarea un np.sort de grupo·n + rango
+              deja cada grupo contiguo y ordenado → los dos centros.
+    Los nulos se ignoran como en groupby; las llaves nulas se descartan.
+
+Uso:
+    pivots = pivot_features(df, ['OP_UNIQUE_CARRIER', 'ORIGIN'], ['DOW', 'IS_WEEKEND'],
+                            flags_cols, stats=['mean'], n_jobs=-1)
+    l_flag_frames = save_pivots(pivots, 'temp/flag')       # [(ruta, dimensión, temporalidad)]
+================================================================================
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+STATS = ('mean', 'std', 'median')
+
+
+# ============================================================================
+# MEMORIA COMPARTIDA
+# ============================================================================
+def _to_shared(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+# ============================================================================
+# KERNEL
+# ============================================================================
+def _group_stats(x, group, n_groups, stats, rank=None, order=None):
+    """(n_groups, len(stats)) para una columna; NaN donde el grupo no tiene datos.
+
+    `group` es -1 en filas con llave nula. Para la mediana: `order` es el
+    argsort global de x (nulos al final) y `rank` su inversa.
+    """
+    valid = ~np.isnan(x) & (group >= 0)
+    g, v = group[valid], x[valid]
+    count = np.bincount(g, minlength=n_groups).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(g, weights=v, minlength=n_groups) / count
+        out = []
+        for stat in stats:
+            if stat == 'mean':
+                out.append(mean)
+            elif stat == 'std':
+                ss = np.bincount(g, weights=(v - mean[g]) ** 2, minlength=n_groups)
+                out.append(np.sqrt(ss / (count - 1)))
+            elif stat == 'median':
+                # Llave grupo·n + rango: un solo np.sort de int64 ordena por (grupo, valor)
+                n = len(x)
+                key = np.sort(g * n + rank[valid])
+                starts = np.r_[0, np.cumsum(count[:-1])].astype(np.int64)
+                k = count.astype(np.int64)
+                has = k > 0
+                lo = key[np.where(has, starts + (k - 1) // 2, 0)] % n if len(key) else np.zeros(n_groups, np.int64)
+                hi = key[np.where(has, starts + k // 2, 0)] % n if len(key) else np.zeros(n_groups, np.int64)
+                out.append(np.where(has, (x[order[lo]] + x[order[hi]]) / 2, np.nan))
+            else:
+                raise ValueError(f"Estadístico no soportado: {stat}")
+    return np.column_stack(out)
+
+
+def _pivot_task(task):
+    values_spec, keys_spec, rank_spec, order_spec, d, t, n_dim, n_time, cols, stats = task
+    shm_v, values = _attach(values_spec)
+    shm_k, keys = _attach(keys_spec)
+    shm_r, ranks = _attach(rank_spec) if rank_spec else (None, None)
+    shm_o, orders = _attach(order_spec) if order_spec else (None, None)
+    try:
+        dim, time = keys[d].astype(np.int64), keys[t].astype(np.int64)
+        group = np.where((dim >= 0) & (time >= 0), dim * n_time + time, -1)
+        return np.stack([_group_stats(values[j], group, n_dim * n_time, stats,
+                                      None if ranks is None else ranks[j],
+                                      None if orders is None else orders[j]) for j in cols])
+    finally:
+        del values, keys, ranks, orders
+        for shm in (shm_v, shm_k, shm_r, shm_o):
+            if shm is not None:
+                shm.close()
+
+
+# ============================================================================
+# API
+# ============================================================================
+def pivot_features(df, dimensions, time_dimensions, value_cols, stats=('mean',), n_jobs=-1,
+                   dropna=True, combos=None):
+    """{(dimensión, temporalidad): tabla ancha indexada por la dimensión}.
+
+    Equivale a groupby([dimension, time_dimension]).agg(stats) + pivot_table
+    por cada combinación. Con dropna=True se eliminan las columnas totalmente
+    nulas (como pivot_table). `combos` limita las combinaciones a calcular
+    (p. ej. plan['pivots'] de feature_selection); por omisión, todas.
+    """
+    stats = [stats] if isinstance(stats, str) else list(stats)
+    key_cols = list(dict.fromkeys(list(dimensions) + list(time_dimensions)))
+    labels, codes = {}, []
+    for col in key_cols:
+        c, uniques = pd.factorize(df[col], sort=True)
+        labels[col] = uniques
+        codes.append(c.astype(np.int32))
+    # Una fila por columna: cada columna queda contigua en memoria
+    key_array = np.stack(codes)
+    value_array = np.stack([pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+                            for c in value_cols])
+
+    keep = None if combos is None else {tuple(c) for c in combos}
+    combos = [(d, t) for d in dimensions for t in time_dimensions if keep is None or (d, t) in keep]
+    if not combos:
+        return {}
+    n_jobs = os.cpu_count() if n_jobs in (None, -1) else max(1, n_jobs)
+    # Bloques de columnas para repartir mejor cuando hay pocas combinaciones
+    n_blocks = max(1, min(len(value_cols), -(-n_jobs // max(len(combos), 1))))
+    blocks = [b for b in np.array_split(np.arange(len(value_cols)), n_blocks) if len(b)]
+
+    shared = [_to_shared(value_array), _to_shared(key_array)]
+    if 'median' in stats:
+        # Un argsort por columna (y su inversa), compartido por todas las combinaciones
+        order = np.argsort(value_array, axis=1, kind='stable')
+        rank = np.empty_like(order)
+        np.put_along_axis(rank, order, np.arange(len(df))[None, :], axis=1)
+        shared += [_to_shared(rank), _to_shared(order)]
+        del order, rank
+    specs = [spec for _, spec in shared] + [None] * (4 - len(shared))
+    del value_array, key_array
+    try:
+        tasks = [(*specs, key_cols.index(d), key_cols.index(t),
+                  len(labels[d]), len(labels[t]), block, stats)
+                 for d, t in combos for block in blocks]
+        if n_jobs == 1 or len(tasks) == 1:
+            results = [_pivot_task(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(tasks))) as pool:
+                results = list(pool.map(_pivot_task, tasks))
+    finally:
+        for shm, _ in shared:
+            shm.close()
+            shm.unlink()
+
+    out = {}
+    for i, (d, t) in enumerate(combos):
+        parts = results[i * len(blocks):(i + 1) * len(blocks)]
+        cube = np.concatenate(parts)                       # (n_cols, n_dim·n_time, n_stats)
+        n_dim, n_time = len(labels[d]), len(labels[t])
+        # columnas: feature (columna_estadístico) × valor de temporalidad
+        wide = cube.reshape(len(value_cols), n_dim, n_time, len(stats)).transpose(1, 0, 3, 2)
+        wide = wide.reshape(n_dim, -1)
+        names = [f'{d}_{col}_{stat}_{t}_{value}' for col in value_cols for stat in stats
+                 for value in labels[t]]
+        table = pd.DataFrame(wide, index=pd.Index(labels[d], name=d), columns=names)
+        out[(d, t)] = table.dropna(axis=1, how='all') if dropna else table
+    return out
+
+
+def save_pivots(pivots, prefix):
+    """Escribe {prefix}_{dimension}_{time_dimension}.csv; regresa [(ruta, dimensión, temporalidad)]."""
+    os.makedirs(os.path.dirname(prefix) or '.', exist_ok=True)
+    frames = []
+    for (d, t), table in pivots.items():
+        path = f'{prefix}_{d}_{t}.csv'
+        table.to_csv(path, index=True)
+        frames.append((path, d, t))
+    return frames
@@ -0,0 +1,85 @@
+"""
+================================================================================
+LLAVE DE RUTA CODIFICADA (ROUTE_ID) - SIN CONCATENAR STRINGS
+================================================================================
+Propósito:
+    Reemplazar `df['ORIGIN'] + '-' + df['DEST']` (un string de Python nuevo por
+    fila, que luego cada groupby vuelve a hashear) por una llave entera
+    construida con los IDs de aeropuerto del DOT:
+
+        ROUTE_ID = ORIGIN_AIRPORT_ID * 100000 + DEST_AIRPORT_ID
+
+    Los IDs del DOT tienen 5 dígitos, así que la llave es legible en decimal
+    (1393012478 → 13930=ORD, 12478=JFK) y cabe en int64. Las etiquetas
+    'ORD-JFK' viven en una tabla de decodificación con una fila por ruta.
+
+    Archivos sin IDs del DOT (p. ej. X_YYYY-MM.csv): los códigos IATA de 3
+    caracteres se leen en base 36 (int('ORD', 36) = 31981 < 100000) y la
+    llave se guarda NEGATIVA:
+
+        ROUTE_ID = -(IATA36(ORIGIN) * 100000 + IATA36(DEST)) - 1
+
+    También es determinista entre frames, lotes y meses. Como el rango no se
+    cruza con el de IDs del DOT, un lookup entre frames con llaves de
+    distinto origen no encuentra la ruta (cae al respaldo) en vez de
+    encontrar otra ruta.
+
+Uso:
+    df['ROUTE_ID'] = route_id(df)
+    routes = route_table(df)                      # ROUTE_ID → ORIGIN, DEST, ROUTE
+    stats.rename(index=routes['ROUTE'])           # etiquetas solo para imprimir
+================================================================================
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+ROUTE_BASE = 100_000
+_IATA = re.compile(r'[0-9A-Z]{3}')
+
+
+def iata_code(codes):
+    """Códigos IATA de 3 caracteres → entero base 36 (una conversión por código distinto)."""
+    idx, uniques = pd.factorize(pd.Series(codes).astype(str).str.upper().to_numpy())
+    bad = [u for u in uniques if not _IATA.fullmatch(u)]
+    if bad or (idx < 0).any():
+        raise ValueError(f"Códigos de aeropuerto no válidos para ROUTE_ID: {bad[:5]}")
+    return np.array([int(u, 36) for u in uniques], dtype=np.int64)[idx]
+
+
+def route_id(df, origin_col='ORIGIN_AIRPORT_ID', dest_col='DEST_AIRPORT_ID'):
+    """Llave entera de ruta (int64) a partir de los IDs de aeropuerto.
+
+    Si el archivo no trae los IDs del DOT, la llave sale de los códigos
+    IATA de ORIGIN/DEST (negativa, ver encabezado).
+    """
+    if origin_col in df.columns and dest_col in df.columns:
+        o = df[origin_col].to_numpy(dtype=np.int64)
+        d = df[dest_col].to_numpy(dtype=np.int64)
+        return pd.Series(o * ROUTE_BASE + d, index=df.index, name='ROUTE_ID')
+    o, d = iata_code(df['ORIGIN']), iata_code(df['DEST'])
+    return pd.Series(-(o * ROUTE_BASE + d) - 1, index=df.index, name='ROUTE_ID')
+
+
+def decode_route_id(ids):
+    """ROUTE_ID → (ORIGIN_AIRPORT_ID, DEST_AIRPORT_ID); -1 en llaves de códigos IATA."""
+    ids = np.asarray(ids, dtype=np.int64)
+    dot = ids >= 0
+    return np.where(dot, ids // ROUTE_BASE, -1), np.where(dot, ids % ROUTE_BASE, -1)
+
+
+def route_table(df, key_col='ROUTE_ID'):
+    """Tabla de decodificación: una fila por ROUTE_ID con códigos y etiqueta."""
+    ids = df[key_col].to_numpy(dtype=np.int64) if key_col in df.columns else route_id(df).to_numpy()
+    uniq, first = np.unique(ids, return_index=True)
+    o_id, d_id = decode_route_id(uniq)
+    table = pd.DataFrame({
+        'ORIGIN_AIRPORT_ID': o_id,
+        'DEST_AIRPORT_ID': d_id,
+        'ORIGIN': df['ORIGIN'].to_numpy()[first],
+        'DEST': df['DEST'].to_numpy()[first],
+    }, index=pd.Index(uniq, name=key_col))
+    table['ROUTE'] = table['ORIGIN'].astype(str) + '-' + table['DEST'].astype(str)
+    return table
@@ -0,0 +1,289 @@
+"""
+================================================================================
+CACHÉ DE ETAPAS - RESULTADOS DIRECCIONADOS POR CONTENIDO
+================================================================================
+Propósito:
+    Evitar recalcular en cada corrida de EDA.py / feature_engineering.py las
+    etapas costosas (scorecards, Kruskal-Wallis, matrices de correlación)
+    cuando ni los datos que leen, ni el código de la etapa, ni sus
+    parámetros cambiaron.
+
+Funcionamiento:
+    • La llave de cada etapa es un hash de:
+        - huella (contenido) de los frames que lee la etapa: valores
+          (pd.util.hash_pandas_object), índice, columnas y dtypes. Así
+          cualquier transformación previa (recorte de outliers, dedup de
+          códigos compartidos, columnas derivadas) invalida la entrada.
+        - huella de archivos de entrada (para etapas que leen de disco)
+        - versión del código de la etapa: explícita + hash del código
+          fuente de `compute`, de las funciones del mismo script que llama
+          y de los módulos del proyecto que usa (delay_cube.py,
+          grouped_tests.py, ...), transitivo por sus importaciones. Corregir
+          kruskal_by_keys invalida la etapa aunque la lambda no cambie.
+        - parámetros de la etapa
+    • DataFrames/Series se guardan en Parquet; diccionarios de arreglos y
+      escalares en .npz.
+    • El directorio tiene un tamaño máximo; al excederlo se desalojan las
+      entradas usadas hace más tiempo (LRU).
+
+Uso:
+    cache = StageCache('cache', max_bytes=2 * 1024**3)
+    stats = cache.get_or_compute('carrier_scorecard', lambda: calcular(df),
+                                 frames=[df[[CARRIER_COL, TARGET]]])
+================================================================================
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sysconfig
+import time
+
+import numpy as np
+import pandas as pd
+
+_CHUNK = 8 * 1024 * 1024
+_MANIFEST = 'manifest.json'
+_LIBRARY_DIRS = tuple(sorted({os.path.abspath(p) for k, p in sysconfig.get_paths().items()
+                              if k in ('stdlib', 'platstdlib', 'purelib', 'platlib')}))
+
+
+def _parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        try:
+            import fastparquet  # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+
+def _source(fn):
+    try:
+        return inspect.getsource(fn).encode()
+    except (OSError, TypeError):
+        code = getattr(fn, '__code__', None)
+        return code.co_code if code is not None else repr(fn).encode()
+
+
+def _project_module(obj):
+    """Módulo del proyecto que define obj (None: biblioteca, script en ejecución o sin archivo)."""
+    module = obj if inspect.ismodule(obj) else inspect.getmodule(obj)
+    path = getattr(module, '__file__', None)
+    if path is None or module.__name__ == '__main__':
+        return None
+    return None if os.path.abspath(path).startswith(_LIBRARY_DIRS) else module
+
+
+def _references(fn):
+    """Objetos globales y de cierre que nombra fn (incluye lambdas/comprensiones anidadas)."""
+    code = getattr(fn, '__code__', None)
+    if code is None:
+        return []
+    names, stack = set(), [code]
+    while stack:
+        c = stack.pop()
+        names.update(c.co_names)
+        stack.extend(k for k in c.co_consts if inspect.iscode(k))
+    scope = getattr(fn, '__globals__', {})
+    refs = [scope[n] for n in names if n in scope]
+    for cell in fn.__closure__ or ():
+        try:
+            refs.append(cell.cell_contents)
+        except ValueError:                          # celda aún vacía
+            pass
+    return refs
+
+
+def _code_version(fn):
+    """Hash del código de la etapa: fuente de fn, funciones del script que llama y módulos del proyecto."""
+    h = hashlib.blake2b(digest_size=8)
+    modules, seen, stack = {}, set(), [fn]
+    while stack:
+        f = stack.pop()
+        if id(f) in seen:
+            continue
+        seen.add(id(f))
+        h.update(_source(f))
+        for obj in _references(f):
+            module = _project_module(obj)
+            if module is not None:
+                modules.setdefault(module.__name__, module)
+            elif inspect.isfunction(obj) and obj.__module__ == '__main__':
+                stack.append(obj)
+    pending = list(modules.values())
+    while pending:
+        for obj in list(vars(pending.pop()).values()):
+            module = _project_module(obj)
+            if module is not None and module.__name__ not in modules:
+                modules[module.__name__] = module
+                pending.append(module)
+    for name in sorted(modules):
+        with open(modules[name].__file__, 'rb') as fh:
+            h.update(name.encode() + fh.read())
+    return h.hexdigest()
+
+
+def frame_fingerprint(frame):
+    """Hash del contenido de un DataFrame/Series: valores, índice, columnas y dtypes."""
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([[str(c) for c in frame.columns], [str(t) for t in frame.dtypes]]).encode())
+    h.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+class StageCache:
+    """Caché en disco de resultados de etapas, acotado en tamaño (LRU)."""
+
+    def __init__(self, root='cache', max_bytes=2 * 1024**3, enabled=True):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        if enabled:
+            os.makedirs(root, exist_ok=True)
+        self._manifest = self._load_manifest()
+
+    # ── Manifiesto ──────────────────────────────────────────────────────────
+    def _manifest_path(self):
+        return os.path.join(self.root, _MANIFEST)
+
+    def _load_manifest(self):
+        path = self._manifest_path()
+        if self.enabled and os.path.exists(path):
+            with open(path) as fh:
+                return json.load(fh)
+        return {'entries': {}, 'files': {}}
+
+    def _save_manifest(self):
+        tmp = self._manifest_path() + '.tmp'
+        with open(tmp, 'w') as fh:
+            json.dump(self._manifest, fh, indent=1)
+        os.replace(tmp, self._manifest_path())
+
+    # ── Llaves ──────────────────────────────────────────────────────────────
+    def fingerprint(self, path):
+        """Hash del contenido del archivo; se memoriza por (tamaño, mtime)."""
+        st = os.stat(path)
+        abs_path = os.path.abspath(path)
+        memo = self._manifest['files'].get(abs_path)
+        if memo and memo['size'] == st.st_size and memo['mtime_ns'] == st.st_mtime_ns:
+            return memo['hash']
+
+        h = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(_CHUNK), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        self._manifest['files'][abs_path] = {
+            'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'hash': digest}
+        return digest
+
+    def key(self, stage, version='', inputs=(), params=None, frames=()):
+        payload = {
+            'stage': stage,
+            'version': version,
+            'inputs': [self.fingerprint(p) for p in inputs],
+            'frames': [frame_fingerprint(f) for f in frames],
+            'params': params or {},
+        }
+        raw = json.dumps(payload, sort_keys=True, default=str).encode()
+        return f"{stage}-{hashlib.blake2b(raw, digest_size=16).hexdigest()}"
+
+    # ── Serialización ───────────────────────────────────────────────────────
+    def _write(self, key, value):
+        if isinstance(value, pd.Series):
+            frame, kind = value.to_frame(), 'series'
+        elif isinstance(value, pd.DataFrame):
+            frame, kind = value, 'frame'
+        else:
+            frame, kind = None, 'arrays'
+
+        if frame is not None:
+            if _parquet_available():
+                fname = f'{key}.parquet'
+                frame.to_parquet(os.path.join(self.root, fname))
+            else:
+                fname = f'{key}.pkl'
+                frame.to_pickle(os.path.join(self.root, fname))
+        else:
+            if not isinstance(value, dict):
+                raise TypeError("StageCache solo almacena DataFrame, Series o dict de arreglos")
+            fname = f'{key}.npz'
+            np.savez(os.path.join(self.root, fname),
+                     **{k: np.asarray(v) for k, v in value.items()})
+        return fname, kind
+
+    def _read(self, entry):
+        path = os.path.join(self.root, entry['file'])
+        if entry['kind'] == 'arrays':
+            with np.load(path, allow_pickle=False) as npz:
+                return {k: (npz[k][()] if npz[k].ndim == 0 else npz[k]) for k in npz.files}
+        if path.endswith('.parquet'):
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_pickle(path)
+        return frame.iloc[:, 0] if entry['kind'] == 'series' else frame
+
+    # ── API principal ───────────────────────────────────────────────────────
+    def get_or_compute(self, stage, compute, version='', inputs=(), params=None, frames=()):
+        """Devuelve el resultado en caché de la etapa o lo calcula y guarda.
+
+        `compute` es una función sin argumentos que regresa un DataFrame,
+        una Series o un dict de arreglos/escalares. `frames` son las
+        columnas que `compute` lee (p. ej. df[[CARRIER_COL, TARGET]]).
+        """
+        if not self.enabled:
+            return compute()
+
+        full_version = f"{version}:{_code_version(compute)}"
+        key = self.key(stage, full_version, inputs, params, frames)
+        entry = self._manifest['entries'].get(key)
+
+        if entry and os.path.exists(os.path.join(self.root, entry['file'])):
+            entry['last_access'] = time.time()
+            self._save_manifest()
+            return self._read(entry)
+
+        value = compute()
+        fname, kind = self._write(key, value)
+        self._manifest['entries'][key] = {
+            'stage': stage,
+            'file': fname,
+            'kind': kind,
+            'bytes': os.path.getsize(os.path.join(self.root, fname)),
+            'last_access': time.time(),
+        }
+        self._evict()
+        self._save_manifest()
+        return value
+
+    def _evict(self):
+        entries = self._manifest['entries']
+        total = sum(e['bytes'] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]['last_access']):
+            if total <= self.max_bytes:
+                break
+            path = os.path.join(self.root, entries[key]['file'])
+            if os.path.exists(path):
+                os.remove(path)
+            total -= entries[key]['bytes']
+            del entries[key]
+
+    def clear(self, stage=None):
+        """Elimina todas las entradas (o solo las de una etapa)."""
+        entries = self._manifest['entries']
+        for key in [k for k, e in entries.items() if stage is None or e['stage'] == stage]:
+            path = os.path.join(self.root, entries[key]['file'])
+            if os.path.exists(path):
+                os.remove(path)
+            del entries[key]
+        if self.enabled:
+            self._save_manifest()
+
+    def size_bytes(self):
+        return sum(e['bytes'] for e in self._manifest['entries'].values())
@@ -0,0 +1,145 @@
+"""
+================================================================================
+TARGET ENCODING JERÁRQUICO - RUTA → ORIGEN → AEROLÍNEA → GLOBAL
+================================================================================
+Propósito:
+    El notebook representa aerolínea/origen/destino con una docena de tablas
+    pivote (FLAG_* × DOW/IS_WEEKEND): la matriz del modelo queda muy ancha.
+    Aquí cada combinación de llaves se resume en UNA columna: la tasa de
+    retraso suavizada hacia el nivel más general cuando hay pocos vuelos.
+
+Modelo (por fila, del nivel más general al más específico):
+    global = media del objetivo
+    nivel_k = (suma_k + m · nivel_{k+1}) / (n_k + m)
+    Una llave nunca vista tiene n_k = 0 y hereda el valor del nivel superior.
+    Los niveles no necesitan estar anidados (un origen tiene varias
+    aerolíneas): el nivel superior se evalúa por fila.
+
+Funcionamiento:
+    • Cada columna de llave se codifica a enteros con los valores vistos en
+      el ajuste; las combinaciones se empaquetan en un entero (base mixta).
+    • Suma y conteo por combinación: un np.bincount cada uno. Los niveles
+      compartidos entre encodings se calculan una sola vez.
+    • fit_transform_oof(): cada bloque de test de los folds temporales se
+      codifica con un encoder ajustado solo con su train (sin leakage). Las
+      filas que nunca son test (el primer bloque) quedan en NaN.
+
+Uso:
+    enc = HierarchicalTargetEncoder(smoothing=20)
+    X_te = enc.fit_transform_oof(df, df['DEP_DELAY_15'], shared_splits(len(df), df['FL_DATE']))
+    X_te_nuevo = enc.transform(df_nuevo)
+================================================================================
+"""
+
+import numpy as np
+import pandas as pd
+
+from route_keys import route_id
+from calendar_table import calendar_features
+
+CARRIER_COL = 'OP_UNIQUE_CARRIER'
+SMOOTHING = 20
+
+
+def default_encodings(carrier_col=CARRIER_COL):
+    """nombre → niveles de respaldo, del más específico al más general (después: global)."""
+    return {
+        'TE_ROUTE': [('ROUTE_ID',), ('ORIGIN',), (carrier_col,)],
+        'TE_ROUTE_CARRIER': [('ROUTE_ID', carrier_col), ('ROUTE_ID',), ('ORIGIN',), (carrier_col,)],
+        'TE_ORIGIN_HOUR': [('ORIGIN', 'DEP_HOUR'), ('ORIGIN',), (carrier_col,)],
+        'TE_DEST_HOUR': [('DEST', 'DEP_HOUR'), ('DEST',), (carrier_col,)],
+        'TE_CARRIER_HOUR_DOW': [(carrier_col, 'DEP_HOUR', 'DOW'), (carrier_col, 'DEP_HOUR'), (carrier_col,)],
+        'TE_ORIGIN_DOW': [('ORIGIN', 'DOW'), ('ORIGIN',), (carrier_col,)],
+    }
+
+
+ENCODINGS = default_encodings()
+
+
+def add_keys(frame):
+    """Agrega ROUTE_ID, DEP_HOUR y DOW si faltan (mismas definiciones que el FE)."""
+    out = {}
+    if 'ROUTE_ID' not in frame.columns and {'ORIGIN', 'DEST'} <= set(frame.columns):
+        out['ROUTE_ID'] = route_id(frame)
+    if 'DEP_HOUR' not in frame.columns and 'CRS_DEP_TIME' in frame.columns:
+        out['DEP_HOUR'] = (pd.to_numeric(frame['CRS_DEP_TIME'], errors='coerce') // 100) % 24
+    if 'DOW' not in frame.columns and 'FL_DATE' in frame.columns:
+        out['DOW'] = calendar_features(frame['FL_DATE'], columns=['DOW'])['DOW']
+    return frame.assign(**out) if out else frame
+
+
+class HierarchicalTargetEncoder:
+    """Tasas suavizadas con respaldo jerárquico para combinaciones de llaves."""
+
+    def __init__(self, encodings=None, smoothing=SMOOTHING):
+        self.encodings = encodings or ENCODINGS
+        self.smoothing = smoothing
+
+    def _levels(self):
+        return list(dict.fromkeys(level for levels in self.encodings.values() for level in levels))
+
+    def _column_codes(self, frame, col):
+        """Código por valor visto en el ajuste; no vistos → len(valores)."""
+        codes = self.values_[col].get_indexer(frame[col])
+        return np.where(codes < 0, len(self.values_[col]), codes).astype(np.int64)
+
+    def _combined(self, frame, level, column_codes):
+        code = np.zeros(len(frame), dtype=np.int64)
+        for col in level:
+            code = code * (len(self.values_[col]) + 1) + column_codes[col]
+        return code
+
+    def fit(self, df, y):
+        frame = add_keys(df)
+        y = np.asarray(y, dtype=np.float64)
+        keep = ~np.isnan(y)
+        frame, y = frame[keep], y[keep]
+        self.prior_ = float(y.mean()) if len(y) else np.nan
+
+        columns = list(dict.fromkeys(c for level in self._levels() for c in level))
+        self.values_ = {c: pd.Index(pd.unique(frame[c].dropna())) for c in columns}
+        column_codes = {c: self._column_codes(frame, c) for c in columns}
+
+        self.tables_ = {}
+        for level in self._levels():
+            keys, inverse = np.unique(self._combined(frame, level, column_codes), return_inverse=True)
+            self.tables_[level] = (keys,
+                                   np.bincount(inverse, weights=y, minlength=len(keys)),
+                                   np.bincount(inverse, minlength=len(keys)).astype(np.float64))
+        return self
+
+    def _level_stats(self, frame, level, column_codes):
+        keys, sums, counts = self.tables_[level]
+        code = self._combined(frame, level, column_codes)
+        pos = np.minimum(np.searchsorted(keys, code), len(keys) - 1)
+        found = keys[pos] == code
+        return np.where(found, sums[pos], 0.0), np.where(found, counts[pos], 0.0)
+
+    def transform(self, df):
+        frame = add_keys(df)
+        columns = list(self.values_)
+        column_codes = {c: self._column_codes(frame, c) for c in columns}
+        stats = {level: self._level_stats(frame, level, column_codes) for level in self._levels()}
+        out = {}
+        m = self.smoothing
+        for name, levels in self.encodings.items():
+            value = np.full(len(frame), self.prior_)
+            for level in reversed(levels):
+                s, n = stats[level]
+                value = (s + m * value) / (n + m)
+            out[name] = value
+        return pd.DataFrame(out, index=df.index)
+
+    def fit_transform_oof(self, df, y, splits):
+        """Encoding fuera de fold con splits temporales [(train_idx, test_idx), ...].
+
+        Al final el encoder queda ajustado con todas las filas (para datos nuevos).
+        """
+        frame = add_keys(df)
+        y = np.asarray(y, dtype=np.float64)
+        out = np.full((len(frame), len(self.encodings)), np.nan)
+        for train, test in splits:
+            fold = HierarchicalTargetEncoder(self.encodings, self.smoothing).fit(frame.iloc[train], y[train])
+            out[test] = fold.transform(frame.iloc[test]).to_numpy()
+        self.fit(frame, y)
+        return pd.DataFrame(out, index=df.index, columns=list(self.encodings))
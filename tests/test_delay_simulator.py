@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from delay_simulator import DelaySimulator  # noqa: E402
+
+
+def _day():
+    # Dos matrículas: ORD → DFW → LAX y LAX → DFW, un día
+    return pd.DataFrame({
+        'FL_DATE': ['2025-01-15'] * 3,
+        'ORIGIN': ['ORD', 'DFW', 'LAX'],
+        'DEST': ['DFW', 'LAX', 'DFW'],
+        'CRS_DEP_TIME': [800, 1200, 1500],
+        'CRS_ARR_TIME': [1030, 1330, 2000],
+        'TAIL_NUM': ['N1', 'N1', 'N2'],
+        'DEP_DELAY': [0.0, 0.0, 0.0],
+    })
+
+
+def test_airport_closed_all_day_strands_its_flights():
+    sim = DelaySimulator(_day())
+    base = sim.replay()
+    closed = sim.replay([('DFW', 0, 24, 0.0)])
+
+    assert np.isfinite(base['SIM_ARR_DELAY']).all()
+    # todos los vuelos tocan DFW (o dependen de un avión que no sale de ahí)
+    assert np.isinf(closed['SIM_ARR_DELAY']).all()
+    diff = sim.compare(base, closed, airports=['DFW'])
+    assert diff['varados'] == 3
+    assert diff['tarde_escenario'] == 3
+
+
+def test_partial_closure_delays_until_reopening():
+    sim = DelaySimulator(_day())
+    out = sim.replay([('ORD', 0, 10, 0.0)])
+    # el despegue en ORD (08:00 + taxi) espera a las 10:00 locales; la rotación hereda el retraso
+    assert out['SIM_DEP_QUEUE'].iloc[0] >= 100
+    assert np.isfinite(out['SIM_ARR_DELAY']).all()
+    assert out['SIM_ROTATION_DELAY'].iloc[1] > 0